@@ -62,7 +62,11 @@ const VITE_API_URL_PYTHON = import.meta.env.VITE_API_URL_PYTHON;
   const handleJoinLeave = async (channelId) => {
     try {
       // Call the custom API endpoint
-      const res = await axios.post(`${API_URL}${channelId}/join_leave/`, { user_id: 1 });
+      // The server joins whoever the token belongs to
+      const token = localStorage.getItem("token");
+      const res = await axios.post(`${API_URL}${channelId}/join_leave/`, {}, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
       
       const { status, totalParticipants } = res.data;
       
@@ -7,9 +7,6 @@ import {
 import { useNavigate } from 'react-router-dom';
 
 // --- CONSTANTS ---
-// In a real app, replace '1' with the actual logged-in User ID from your Auth Context
-const CURRENT_USER_ID = 1; 
-
 const VITE_API_URL_PYTHON = import.meta.env.VITE_API_URL_PYTHON;
 const API_URL = `${VITE_API_URL_PYTHON}/rescue-channels/`;
 
@@ -167,8 +164,10 @@ export default function RescueView() {
   const handleJoinSession = async (channelId, isVideo = true) => {
     try {
       // 1. Call API to add user to "Active Participants" list in DB
-      const response = await axios.post(`${API_URL}${channelId}/join_leave/`, {
-        user_id: CURRENT_USER_ID 
+      // The server joins whoever the token belongs to
+      const token = localStorage.getItem("token");
+      const response = await axios.post(`${API_URL}${channelId}/join_leave/`, {}, {
+        headers: { Authorization: `Bearer ${token}` }
       });
 
       const { status, totalParticipants, participants } = response.data;
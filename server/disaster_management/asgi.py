@@ -13,4 +13,22 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'disaster_management.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up (they touch models/settings)
+from notification.stream import STREAM_PATH, notification_stream  # noqa: E402
+from rescue.stream import STREAM_PATH as CHANNEL_STREAM_PATH, channel_stream  # noqa: E402
+
+# Long-lived streams bypass Django's buffering request handler
+STREAM_ROUTES = {
+    STREAM_PATH: notification_stream,
+    CHANNEL_STREAM_PATH: channel_stream,
+}
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http":
+        handler = STREAM_ROUTES.get(scope["path"])
+        if handler is not None:
+            return await handler(scope, receive, send)
+    return await django_application(scope, receive, send)
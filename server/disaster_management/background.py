@@ -0,0 +1,61 @@
+"""
+Request-triggered maintenance that runs off the request thread.
+
+Caches that refresh themselves (location index, popularity ranking,
+presence counts, password rehashes) kick the work off from whichever
+request notices it's due; the request never waits for it.
+"""
+import logging
+import threading
+
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+
+def with_own_connection(fn, *args):
+    """
+    Call `fn(*args)` on a non-request thread: it gets its own DB connection,
+    closed when done, and failures are logged rather than raised.
+    """
+    close_old_connections()
+    try:
+        return fn(*args)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(fn, "__qualname__", fn))
+    finally:
+        connection.close()
+
+
+class BackgroundTask:
+    """
+    `fn` on a daemon thread, at most one run at a time: start() while a run
+    is in flight is a no-op, so callers can kick it from every request.
+    """
+
+    def __init__(self, fn, name):
+        self.fn = fn
+        self.name = name
+        self._running = False
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self, *args):
+        """Returns True if this call started a run."""
+        if self._running:
+            return False
+        with self._lock:
+            if self._running:
+                return False
+            self._running = True
+        threading.Thread(target=self._run, args=args, name=self.name, daemon=True).start()
+        return True
+
+    def _run(self, *args):
+        try:
+            with_own_connection(self.fn, *args)
+        finally:
+            self._running = False
@@ -42,6 +42,47 @@ load_dotenv()
 JWT_SECRET = "your_secret_key_here"
 JWT_ALGORITHM = "HS256"
 
+# Verified-token cache used by middleware.jwt_auth (entries never outlive `exp`)
+JWT_CACHE_SIZE = 10000
+JWT_CACHE_TTL = 300
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        # Reuses the claims the JWT middleware already verified
+        'middleware.jwt_auth.JWTAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+}
+
+# Real-time notification stream (ASGI). Leave the broker unset for a single
+# worker; with several workers run `manage.py run_notification_broker` and
+# point every worker at it, e.g. tcp://127.0.0.1:7878
+NOTIFICATION_BROKER_URL = os.environ.get("NOTIFICATION_BROKER_URL")
+NOTIFICATION_STREAM_KEEPALIVE = 25
+# Browsers open streams with ?ticket= from POST notifications/stream-ticket/
+# (never the JWT itself); a ticket must be used within this many seconds
+STREAM_TICKET_TTL = 30
+
+# Rescue-channel presence (rescue.presence): a client that hasn't sent a
+# heartbeat for PRESENCE_TTL seconds is offline; live counts are written to
+# RescueChannel.online_count at most every PRESENCE_FLUSH_INTERVAL seconds
+PRESENCE_TTL = 45
+PRESENCE_FLUSH_INTERVAL = 30
+
+# Rescue-channel event bus (rescue.events): each channel keeps its last
+# RESCUE_EVENTS_BUFFER events for replay; a stream more than
+# RESCUE_EVENTS_QUEUE events behind is disconnected and resumes from there
+RESCUE_EVENTS_SHARDS = 16
+RESCUE_EVENTS_BUFFER = 100
+RESCUE_EVENTS_QUEUE = 256
+RESCUE_EVENTS_MAX_CHANNELS = 10000
+
+# ?sort=popular on rescue channels (rescue.ranking): scores are recomputed
+# at most every RESCUE_POPULARITY_INTERVAL seconds and halve with each
+# RESCUE_POPULARITY_HALF_LIFE_HOURS of channel age
+RESCUE_POPULARITY_INTERVAL = 300
+RESCUE_POPULARITY_HALF_LIFE_HOURS = 24
+
 
 CORS_ALLOW_CREDENTIALS = True
 
@@ -106,6 +147,14 @@ PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
 ]
 
+# Login/register hashing runs on a bounded pool (users/hashing.py).
+# Workers default to the CPU count; requests beyond workers + queue get 429.
+# To move from bcrypt to PBKDF2, put PBKDF2PasswordHasher first above:
+# existing hashes are upgraded in the background on the next login.
+AUTH_HASH_WORKERS = None
+AUTH_HASH_QUEUE = None
+AUTH_HASH_TIMEOUT = 10
+
 # AUTH_USER_MODEL = 'users.User'
 AUTH_USER_MODEL = 'users.User'
 
@@ -131,6 +180,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'disaster_management.wsgi.application'
+ASGI_APPLICATION = 'disaster_management.asgi.application'
 
 
 # Database
@@ -155,6 +205,24 @@ DATABASES = {
     }
 }
 
+# Cache
+# Local memory per process by default; set REDIS_URL to share cached data
+# (e.g. the notification banner) across workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+if os.environ.get("REDIS_URL"):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ["REDIS_URL"],
+    }
+
+NOTIFICATION_CACHE_ALIAS = 'default'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,159 @@
+"""
+Minimal Server-Sent Events plumbing on raw ASGI.
+
+Django's ASGI handler buffers a whole response per request, which doesn't
+work for long-lived streams, so stream endpoints are routed around it in
+asgi.py and talk ASGI directly. One open stream costs one coroutine plus
+its subscriber queue, which is what lets a worker hold thousands of idle
+connections.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+import jwt
+from django.conf import settings
+from django.core import signing
+
+from middleware.jwt_auth import verify_token
+
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream"),
+    (b"cache-control", b"no-cache"),
+    (b"x-accel-buffering", b"no"),  # stop nginx/render proxies from buffering
+]
+
+
+def query_params(scope):
+    return {k: v[-1] for k, v in parse_qs(scope.get("query_string", b"").decode()).items()}
+
+
+def header(scope, name):
+    name = name.lower().encode()
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+# =====================================================
+# 🎟️ STREAM TICKETS
+# =====================================================
+#
+# EventSource can't send an Authorization header, and a JWT in the query
+# string ends up in proxy/access logs. Clients instead POST (with their
+# bearer token) for a ticket: a signed, short-lived `user_id` that is only
+# good for opening a stream. Stateless, so any worker can check it.
+
+TICKET_SALT = "disaster_management.streaming.ticket"
+
+
+def issue_ticket(user_id):
+    return signing.dumps({"user_id": user_id}, salt=TICKET_SALT, compress=True)
+
+
+def ticket_ttl():
+    return getattr(settings, "STREAM_TICKET_TTL", 30)
+
+
+def read_ticket(ticket):
+    """The ticket's user id, or None if it's forged or expired."""
+    try:
+        return signing.loads(ticket, salt=TICKET_SALT, max_age=ticket_ttl())["user_id"]
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+
+
+class StreamAuthError(Exception):
+    """Bad credentials on a stream request; the message goes in the 401."""
+
+
+def stream_user_id(scope):
+    """
+    The caller's user id from ?ticket= or a bearer header (non-browser
+    clients), None when neither is sent. Raises StreamAuthError.
+    """
+    ticket = query_params(scope).get("ticket")
+    if ticket:
+        user_id = read_ticket(ticket)
+        if user_id is None:
+            raise StreamAuthError("Invalid or expired stream ticket")
+        return user_id
+
+    auth = header(scope, "authorization")
+    if not auth or not auth.startswith("Bearer "):
+        return None
+    try:
+        return verify_token(auth.split(" ")[1])["user_id"]
+    except jwt.ExpiredSignatureError:
+        raise StreamAuthError("Token expired")
+    except (jwt.InvalidTokenError, KeyError):
+        raise StreamAuthError("Invalid token")
+
+
+def format_event(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    payload = data if isinstance(data, str) else json.dumps(data, separators=(",", ":"), default=str)
+    for line in payload.splitlines() or [""]:
+        lines.append(f"data: {line}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+async def send_json_error(send, status, message):
+    body = json.dumps({"detail": message}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def stream(receive, send, queue, keepalive=25, initial=()):
+    """
+    Pump events from `queue` to the client until it disconnects.
+
+    Items on the queue are (event_name, data, event_id) tuples, or bytes
+    already run through format_event (so a fan-out can encode an event once
+    for all its subscribers); a `None` item closes the stream from the
+    server side (e.g. a slow consumer that was cut off). A comment line is written every `keepalive` seconds so
+    proxies don't reap idle connections.
+    """
+    await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+    await send({"type": "http.response.body", "body": b": connected\n\n", "more_body": True})
+    for event, data, event_id in initial:
+        await send({"type": "http.response.body", "body": format_event(data, event, event_id), "more_body": True})
+
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, disconnected}, timeout=keepalive,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                getter.cancel()
+                return
+            if getter not in done:
+                getter.cancel()
+                await send({"type": "http.response.body", "body": b": keepalive\n\n", "more_body": True})
+                continue
+
+            item = getter.result()
+            if item is None:
+                break
+            body = item if isinstance(item, bytes) else format_event(item[1], item[0], item[2])
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+    finally:
+        disconnected.cancel()
+
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
@@ -1,6 +1,113 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
 import jwt
 from django.conf import settings
 from django.http import JsonResponse
+from rest_framework.authentication import BaseAuthentication
+
+
+# =====================================================
+# 🔑 VERIFIED-TOKEN CACHE
+# =====================================================
+
+class TokenCache:
+    """
+    Bounded LRU of verified claims keyed by sha256(token).
+
+    Entries live until the token's own `exp` (capped at `ttl` seconds), so a
+    client polling with the same bearer token pays for one signature check,
+    not one per request.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def set(self, key, claims):
+        expires_at = time.time() + self.ttl
+        if "exp" in claims:
+            expires_at = min(expires_at, float(claims["exp"]))
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    maxsize=getattr(settings, "JWT_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "JWT_CACHE_TTL", 300),
+)
+
+
+def _verify_keys():
+    # Express-issued tokens use JWT_SECRET; tokens minted by Django's own
+    # login (simplejwt) are signed with SECRET_KEY. Accept both.
+    return getattr(settings, "JWT_VERIFY_KEYS", None) or [settings.JWT_SECRET, settings.SECRET_KEY]
+
+
+def verify_token(token):
+    """
+    Returns the verified claims for `token`, from cache when possible.
+    Raises jwt.ExpiredSignatureError / jwt.InvalidTokenError like jwt.decode.
+    """
+    key = hashlib.sha256(token.encode()).hexdigest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+
+    error = jwt.InvalidTokenError("No verification key configured")
+    for secret in _verify_keys():
+        try:
+            claims = jwt.decode(token, secret, algorithms=[settings.JWT_ALGORITHM])
+            break
+        except jwt.InvalidSignatureError as e:
+            error = e
+    else:
+        raise error
+
+    if claims.get("token_type") == "refresh":
+        raise jwt.InvalidTokenError("Refresh tokens can't be used for API access")
+
+    # Express register tokens carry `id`, everything else `user_id`
+    if "user_id" not in claims and "id" in claims:
+        claims = {**claims, "user_id": claims["id"]}
+
+    token_cache.set(key, claims)
+    return claims
+
+
+def bearer_token(request):
+    auth = request.headers.get("Authorization")
+    if auth and auth.startswith("Bearer "):
+        return auth.split(" ")[1]
+    return None
+
+
+# =====================================================
+# 🧩 DJANGO MIDDLEWARE (decode once per request)
+# =====================================================
 
 class JWTAuthenticationMiddleware:
     def __init__(self, get_response):
@@ -9,23 +116,40 @@ class JWTAuthenticationMiddleware:
     def __call__(self, request):
         request.user_jwt = None
 
-        auth = request.headers.get("Authorization")
-        if auth and auth.startswith("Bearer "):
-            token = auth.split(" ")[1]
-
+        token = bearer_token(request)
+        if token:
             try:
-                decoded = jwt.decode(
-                    token,
-                    settings.JWT_SECRET,
-                    algorithms=[settings.JWT_ALGORITHM]
-                )
-                request.user_jwt = decoded
-                print("DECODED JWT:", request.user_jwt)
-
-
+                request.user_jwt = verify_token(token)
             except jwt.ExpiredSignatureError:
                 return JsonResponse({"message": "Token expired"}, status=401)
             except jwt.InvalidTokenError:
                 return JsonResponse({"message": "Invalid token"}, status=401)
 
         return self.get_response(request)
+
+
+# =====================================================
+# 🛡️ DRF AUTHENTICATION (reuses the middleware's claims)
+# =====================================================
+
+class JWTAuthentication(BaseAuthentication):
+    """
+    Exposes the claims verified by JWTAuthenticationMiddleware as
+    `request.auth` and a claims-backed `request.user` (users.principal),
+    so DRF views don't decode the token a second time and role checks
+    don't touch the users table.
+    """
+
+    def authenticate(self, request):
+        from users.principal import JWTPrincipal
+
+        claims = getattr(request._request, "user_jwt", None)
+        if not claims or claims.get("user_id") is None:
+            return None
+        try:
+            return JWTPrincipal(claims), claims
+        except (TypeError, ValueError):
+            return None
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="api"'
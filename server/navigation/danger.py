@@ -0,0 +1,156 @@
+import threading
+
+import numpy as np
+
+from .geo import EARTH_RADIUS_M
+from .index import location_index
+
+# Keep each (points x zones) dot-product matrix around ~32 MB of float64
+MAX_CELLS_PER_CHUNK = 4_000_000
+
+
+class DangerZones:
+    """
+    Every `danger` MapLocation as parallel NumPy arrays (center as a unit
+    vector, radius in meters), so containment for a batch of points is one
+    matrix product per chunk instead of a Python loop per pair: a point is
+    inside a zone when the dot product of their unit vectors is at least
+    cos(radius / R).
+
+    The arrays are rebuilt from the in-memory location index whenever its
+    version moves, which the MapLocation signals do on every write.
+    """
+
+    def __init__(self, index=location_index):
+        self.index = index
+        self._lock = threading.Lock()
+        self._version = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.titles = []
+        self.lat = self.lng = self.radius = self.min_dot = np.empty(0)
+        self.centers = np.empty((0, 3))
+
+    def refresh(self):
+        self.index.ensure_fresh()
+        if self.index.version == self._version:
+            return
+        with self._lock:
+            version = self.index.version
+            if version == self._version:
+                return
+            zones = [p for p in self.index.points('danger') if p.radius and p.radius > 0]
+            self.ids = np.array([z.id for z in zones], dtype=np.int64)
+            self.titles = [z.title for z in zones]
+            self.lat = np.array([z.latitude for z in zones], dtype=np.float64)
+            self.lng = np.array([z.longitude for z in zones], dtype=np.float64)
+            self.radius = np.array([z.radius for z in zones], dtype=np.float64)
+            self.centers = _unit_vectors([z.latitude for z in zones], [z.longitude for z in zones])
+            # Inside <=> dot(point, center) >= cos(radius / R)
+            self.min_dot = np.cos(np.minimum(self.radius / EARTH_RADIUS_M, np.pi))
+            self._version = version
+
+    def __len__(self):
+        self.refresh()
+        return len(self.ids)
+
+    def classify(self, lats, lngs):
+        """
+        For N points, returns (inside, zone_ids): a bool array, and the id of
+        the containing zone the point is deepest inside (-1 when safe).
+        """
+        self.refresh()
+        points = _unit_vectors(lats, lngs)
+        zone_ids = np.full(len(points), -1, dtype=np.int64)
+        if not len(self.ids) or not len(points):
+            return zone_ids >= 0, zone_ids
+
+        step = max(1, MAX_CELLS_PER_CHUNK // len(self.ids))
+        for start in range(0, len(points), step):
+            dots = points[start:start + step] @ self.centers.T
+            hits = dots >= self.min_dot
+            rows = np.nonzero(hits.any(axis=1))[0]
+            if not len(rows):
+                continue
+            # Only points inside something pay for arccos: meters inside each zone
+            distance = EARTH_RADIUS_M * np.arccos(np.clip(dots[rows], -1.0, 1.0))
+            depth = np.where(hits[rows], self.radius - distance, -np.inf)
+            zone_ids[start + rows] = self.ids[depth.argmax(axis=1)]
+        return zone_ids >= 0, zone_ids
+
+    def zones_at(self, lat, lng):
+        """Every danger zone containing the point: [(zone_id, title, distance_m)]."""
+        self.refresh()
+        if not len(self.ids):
+            return []
+        dots = self.centers @ _unit_vectors([lat], [lng])[0]
+        hits = np.nonzero(dots >= self.min_dot)[0]
+        distance = EARTH_RADIUS_M * np.arccos(np.clip(dots[hits], -1.0, 1.0))
+        order = np.argsort(distance)
+        return [(int(self.ids[hits[i]]), self.titles[hits[i]], float(distance[i])) for i in order]
+
+    def crossed_by(self, lat0, lng0, lat1, lng1):
+        """
+        Ids of the danger zones the straight path from (lat0, lng0) to
+        (lat1, lng1) passes through. Zones containing the start point are
+        ignored: you're already in them, the path is how you get out.
+        Uses a local flat projection, fine for evacuation-scale distances.
+        """
+        self.refresh()
+        if not len(self.ids):
+            return []
+        meters_per_deg = np.pi * EARTH_RADIUS_M / 180
+        coslat = np.cos(np.radians(lat0))
+        bx, by = (lng1 - lng0) * coslat * meters_per_deg, (lat1 - lat0) * meters_per_deg
+        cx = (self.lng - lng0) * coslat * meters_per_deg
+        cy = (self.lat - lat0) * meters_per_deg
+
+        length2 = bx * bx + by * by
+        t = np.clip((cx * bx + cy * by) / length2, 0.0, 1.0) if length2 else np.zeros(len(cx))
+        to_segment = np.hypot(cx - t * bx, cy - t * by)
+        crossed = (to_segment < self.radius) & (np.hypot(cx, cy) >= self.radius)
+        return self.ids[crossed].tolist()
+
+
+def _unit_vectors(lats, lngs):
+    lat = np.radians(np.asarray(lats, dtype=np.float64).reshape(-1))
+    lng = np.radians(np.asarray(lngs, dtype=np.float64).reshape(-1))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)))
+
+
+danger_zones = DangerZones()
+
+
+# =====================================================
+# 👥 USERS AT RISK
+# =====================================================
+
+def _coords(location):
+    """(lat, lng) from a User.location blob, or None if it has no coordinates."""
+    if not isinstance(location, dict):
+        return None
+    lat = location.get('lat', location.get('latitude'))
+    lng = location.get('lng', location.get('lon', location.get('longitude')))
+    try:
+        return float(lat), float(lng)
+    except (TypeError, ValueError):
+        return None
+
+
+def users_at_risk():
+    """
+    [(user_id, zone_id)] for every user whose stored location falls inside
+    a danger zone. Users with an address-only location are skipped.
+    """
+    from users.models import User
+
+    ids, lats, lngs = [], [], []
+    for user_id, location in User.objects.filter(location__isnull=False).values_list('id', 'location'):
+        coords = _coords(location)
+        if coords is not None:
+            ids.append(user_id)
+            lats.append(coords[0])
+            lngs.append(coords[1])
+
+    inside, zone_ids = danger_zones.classify(lats, lngs)
+    return [(ids[i], int(zone_ids[i])) for i in np.nonzero(inside)[0]]
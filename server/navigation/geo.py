@@ -0,0 +1,100 @@
+import math
+
+EARTH_RADIUS_M = 6371008.8
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in meters."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def geohash(lat, lng, precision=9):
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                ch = (ch << 1) | 1
+                lng_lo = mid
+            else:
+                ch <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def geohash_center(code):
+    """(lat, lng) at the middle of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for c in code:
+        value = BASE32.index(c)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                lng_lo, lng_hi = (mid, lng_hi) if bit else (lng_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return (lat_lo + lat_hi) / 2, (lng_lo + lng_hi) / 2
+
+
+def cell_size_deg(precision):
+    """(lat_height, lng_width) of a geohash cell in degrees."""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def bounding_box(lat, lng, radius_m):
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    coslat = max(math.cos(math.radians(lat)), 1e-6)
+    dlng = min(180.0, math.degrees(radius_m / (EARTH_RADIUS_M * coslat)))
+    return lat - dlat, lng - dlng, lat + dlat, lng + dlng
+
+
+def covering_cells(lat, lng, radius_m, precision):
+    """Geohash cells (at `precision`) overlapping the circle's bounding box."""
+    return box_cells(*bounding_box(lat, lng, radius_m), precision)
+
+
+def box_cells(min_lat, min_lng, max_lat, max_lng, precision):
+    """Geohash cells (at `precision`) overlapping a lat/lng box."""
+    min_lat, max_lat = max(-90.0, min_lat), min(90.0, max_lat)
+    h, w = cell_size_deg(precision)
+    cells = set()
+    y = min_lat
+    while True:
+        x = min_lng
+        while True:
+            cells.add(geohash(max(-90.0, min(89.999999, y)), ((x + 180.0) % 360.0) - 180.0, precision))
+            if x >= max_lng:
+                break
+            x = min(x + w, max_lng)
+        if y >= max_lat:
+            break
+        y = min(y + h, max_lat)
+    return cells
@@ -0,0 +1,180 @@
+import heapq
+import itertools
+import math
+import threading
+from collections import OrderedDict
+
+from .danger import danger_zones
+from .geo import EARTH_RADIUS_M, cell_size_deg, geohash, geohash_center, haversine_m
+from .index import location_index
+
+LEAF_SIZE = 8
+# ~150 m cells: everyone on the same block shares a cached answer
+CACHE_PRECISION = 7
+CACHE_SIZE = 10000
+# Candidates cached per cell, as a multiple of k (headroom for ones a
+# danger zone rules out from the caller's exact position)
+CANDIDATE_FACTOR = 4
+
+
+def _unit(lat, lng):
+    lat, lng = math.radians(lat), math.radians(lng)
+    return (math.cos(lat) * math.cos(lng), math.cos(lat) * math.sin(lng), math.sin(lat))
+
+
+def _chord_to_m(chord2):
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(chord2) / 2))
+
+
+class _Node:
+    __slots__ = ('lo', 'hi', 'left', 'right', 'items')
+
+    def __init__(self, items):
+        self.lo = [min(v[i] for v, _ in items) for i in range(3)]
+        self.hi = [max(v[i] for v, _ in items) for i in range(3)]
+        self.left = self.right = None
+        self.items = None
+        if len(items) <= LEAF_SIZE:
+            self.items = items
+            return
+        axis = max(range(3), key=lambda i: self.hi[i] - self.lo[i])
+        items.sort(key=lambda item: item[0][axis])
+        mid = len(items) // 2
+        self.left, self.right = _Node(items[:mid]), _Node(items[mid:])
+
+    def box_dist2(self, q):
+        d = 0.0
+        for i in range(3):
+            if q[i] < self.lo[i]:
+                d += (self.lo[i] - q[i]) ** 2
+            elif q[i] > self.hi[i]:
+                d += (q[i] - self.hi[i]) ** 2
+        return d
+
+
+class SafeHavens:
+    """
+    k-nearest `safe` MapLocations, skipping any whose straight-line path
+    crosses a danger circle.
+
+    Havens live in a KD-tree over 3D unit vectors: chord length orders
+    points exactly like great-circle distance, with no antimeridian or pole
+    special cases. The tree and the per-cell candidate cache are rebuilt when
+    the location index version moves.
+    """
+
+    def __init__(self, index=location_index):
+        self.index = index
+        self._lock = threading.Lock()
+        self._version = None
+        self._root = None
+        self._cache = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'fallbacks': 0}
+
+    def refresh(self):
+        self.index.ensure_fresh()
+        if self.index.version == self._version:
+            return
+        with self._lock:
+            version = self.index.version
+            if version == self._version:
+                return
+            items = [(_unit(p.latitude, p.longitude), p) for p in self.index.points('safe')]
+            self._root = _Node(items) if items else None
+            self._cache.clear()
+            self._version = version
+
+    def nearest(self, lat, lng):
+        """Yields (distance_m, Point) for every haven, nearest first (best-first search)."""
+        self.refresh()
+        root = self._root
+        if root is None:
+            return
+        q = _unit(lat, lng)
+        seq = itertools.count()
+        heap = [(0.0, next(seq), root, None)]
+        while heap:
+            d2, _, node, point = heapq.heappop(heap)
+            if point is not None:
+                yield _chord_to_m(d2), point
+            elif node.items is not None:
+                for v, p in node.items:
+                    heapq.heappush(heap, (sum((v[i] - q[i]) ** 2 for i in range(3)), next(seq), None, p))
+            else:
+                for child in (node.left, node.right):
+                    heapq.heappush(heap, (child.box_dist2(q), next(seq), child, None))
+
+    def reachable(self, lat, lng, k):
+        """The k nearest havens whose straight path avoids every danger zone."""
+        found = []
+        for distance, point in self.nearest(lat, lng):
+            if not danger_zones.crossed_by(lat, lng, point.latitude, point.longitude):
+                found.append((distance, point))
+                if len(found) == k:
+                    break
+        return found
+
+    def lookup(self, lat, lng, k):
+        """
+        `reachable` with the expensive part cached per geohash cell.
+
+        The cache holds the havens nearest the cell center (k *
+        CANDIDATE_FACTOR of them, danger ignored). Safety is always judged
+        from the caller's exact position: candidates are re-ranked by real
+        distance and re-checked against the danger zones. A candidate can
+        only be trusted while it is nearer than `bound - slack`, where
+        `bound` is how far the last cached candidate is from the center and
+        `slack` is the center-to-corner distance; past that, an uncached
+        haven might be nearer, so the answer is topped up with an exact
+        search from the caller's position.
+        """
+        self.refresh()
+        cell = geohash(lat, lng, CACHE_PRECISION)
+        key = (cell, k)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.stats['hits'] += 1
+        if entry is None:
+            self.stats['misses'] += 1
+            entry = self._candidates(cell, k * CANDIDATE_FACTOR)
+            with self._lock:
+                self._cache[key] = entry
+                while len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+
+        candidates, trusted_within = entry
+        ranked = sorted(
+            ((haversine_m(lat, lng, p.latitude, p.longitude), p) for p in candidates), key=lambda r: r[0]
+        )
+        found = []
+        for distance, point in ranked:
+            if distance > trusted_within:
+                break
+            if not danger_zones.crossed_by(lat, lng, point.latitude, point.longitude):
+                found.append((distance, point))
+                if len(found) == k:
+                    return found
+
+        if trusted_within == math.inf:
+            return found  # every haven was a candidate; fewer than k are reachable
+        # Ran out of candidates we can vouch for: exact search from here
+        self.stats['fallbacks'] += 1
+        return self.reachable(lat, lng, k)
+
+    def _candidates(self, cell, count):
+        """(nearest `count` havens to the cell center, distance they're trustworthy up to)."""
+        center_lat, center_lng = geohash_center(cell)
+        candidates, bound = [], math.inf
+        for distance, point in self.nearest(center_lat, center_lng):
+            candidates.append(point)
+            if len(candidates) == count:
+                bound = distance
+                break
+        h, w = cell_size_deg(CACHE_PRECISION)
+        slack = haversine_m(center_lat, center_lng, center_lat + h / 2, center_lng + w / 2)
+        return candidates, bound - slack
+
+
+safe_havens = SafeHavens()
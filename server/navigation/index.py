@@ -0,0 +1,203 @@
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from disaster_management.background import BackgroundTask
+
+from .geo import box_cells, cell_size_deg, covering_cells, haversine_m
+from .models import MapLocation
+
+# ~4.9 km cells: small enough to prune, big enough that a typical query
+# touches only a few buckets
+BUCKET_PRECISION = 5
+
+Point = namedtuple('Point', 'id title location_type latitude longitude radius geohash')
+
+
+class LocationIndex:
+    """
+    In-memory grid over every MapLocation, bucketed by geohash prefix.
+
+    Kept current in this process by the post_save/post_delete signals
+    (incremental upsert/remove). Writes made by other workers are picked up
+    every `max_age` seconds by refresh(), on a background thread so no
+    request waits for it: rows whose updated_at moved, plus a COUNT to spot
+    deletions (only then are the ids listed). Only the very first read
+    loads everything synchronously. `version` changes on every mutation, so
+    derived caches can key on it.
+    """
+
+    def __init__(self, max_age=60):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._points = {}
+        self._buckets = defaultdict(dict)
+        self._loaded_at = None
+        self._synced_until = None
+        self._refresher = BackgroundTask(self.refresh, 'location-index-refresh')
+        self._max_danger_radius = 0.0
+        self._caught_up_to = 0
+        self.version = 0
+
+    # --- maintenance ---
+
+    def reload(self):
+        """Full rebuild from the DB."""
+        rows = MapLocation.objects.values_list(*Point._fields, 'updated_at')
+        with self._lock:
+            self._points = {}
+            self._buckets = defaultdict(dict)
+            self._max_danger_radius = 0.0
+            synced_until = None
+            for *fields, updated_at in rows:
+                self._add(Point(*fields))
+                synced_until = updated_at if synced_until is None else max(synced_until, updated_at)
+            self._synced_until = synced_until
+            self._loaded_at = time.monotonic()
+            self.version += 1
+
+    def refresh(self):
+        """
+        Catch up with writes made elsewhere. Re-reads a `max_age` window
+        before the newest change seen, since rows can commit a little after
+        their updated_at (and other workers' clocks drift); re-applying a
+        row is harmless.
+        """
+        rows = MapLocation.objects.values_list(*Point._fields, 'updated_at')
+        if self._synced_until is not None:
+            rows = rows.filter(updated_at__gte=self._synced_until - timedelta(seconds=self.max_age))
+        rows = list(rows)
+        total = MapLocation.objects.count()
+
+        with self._lock:
+            changed = False
+            for *fields, updated_at in rows:
+                point = Point(*fields)
+                if self._points.get(point.id) != point:
+                    self._remove(point.id)
+                    self._add(point)
+                    changed = True
+                if self._synced_until is None or updated_at > self._synced_until:
+                    self._synced_until = updated_at
+            if len(self._points) != total:
+                live = set(MapLocation.objects.values_list('id', flat=True))
+                for pk in [pk for pk in self._points if pk not in live]:
+                    self._remove(pk)
+                    changed = True
+            self._loaded_at = time.monotonic()
+            if changed:
+                self.version += 1
+
+    def upsert(self, location):
+        with self._lock:
+            if self._loaded_at is None:
+                return  # not built yet; the first read loads everything
+            self._remove(location.pk)
+            self._add(Point(*(getattr(location, f) for f in Point._fields)))
+            self.version += 1
+
+    def remove(self, pk):
+        with self._lock:
+            if self._loaded_at is not None and self._remove(pk):
+                self.version += 1
+
+    def ensure_fresh(self):
+        if self._loaded_at is None:
+            with self._lock:
+                if self._loaded_at is None:
+                    self.reload()
+            return
+        if time.monotonic() - self._loaded_at > self.max_age:
+            self._refresher.start()
+
+    def catch_up(self, map_version):
+        """
+        Make sure every edit up to map change-log `map_version` (see
+        navigation.tiles) is in the index, refreshing now if this process
+        hasn't read the DB since that version was seen.
+        """
+        if self._loaded_at is not None and self._caught_up_to >= map_version:
+            return
+        if self._loaded_at is None:
+            self.ensure_fresh()
+        else:
+            self.refresh()
+        self._caught_up_to = max(self._caught_up_to, map_version)
+
+    def _add(self, point):
+        self._points[point.id] = point
+        if point.location_type == 'danger' and point.radius:
+            # Only grows between reloads; an overestimate just widens queries
+            self._max_danger_radius = max(self._max_danger_radius, point.radius)
+        self._buckets[point.geohash[:BUCKET_PRECISION]][point.id] = point
+
+    def _remove(self, pk):
+        point = self._points.pop(pk, None)
+        if point is None:
+            return False
+        bucket = self._buckets.get(point.geohash[:BUCKET_PRECISION])
+        if bucket is not None:
+            bucket.pop(pk, None)
+            if not bucket:
+                del self._buckets[point.geohash[:BUCKET_PRECISION]]
+        return True
+
+    # --- queries ---
+
+    def points(self, location_type=None):
+        self.ensure_fresh()
+        with self._lock:
+            values = list(self._points.values())
+        if location_type:
+            values = [p for p in values if p.location_type == location_type]
+        return values
+
+    def max_danger_radius(self):
+        """Largest danger-zone radius in meters (how far a zone reaches past its center)."""
+        self.ensure_fresh()
+        return self._max_danger_radius
+
+    def candidates(self, lat, lng, radius_m):
+        """Points in the buckets overlapping the circle's bounding box (unfiltered)."""
+        self.ensure_fresh()
+        return self._collect(covering_cells(lat, lng, radius_m, BUCKET_PRECISION))
+
+    def in_box(self, min_lat, min_lng, max_lat, max_lng):
+        """Points inside a lat/lng box."""
+        self.ensure_fresh()
+        h, w = cell_size_deg(BUCKET_PRECISION)
+        if (max_lat - min_lat) * (max_lng - min_lng) / (h * w) > len(self._buckets):
+            found = self.points()  # box spans more cells than we have buckets
+        else:
+            found = self._collect(box_cells(min_lat, min_lng, max_lat, max_lng, BUCKET_PRECISION))
+        return [
+            p for p in found
+            if min_lat <= p.latitude <= max_lat and min_lng <= p.longitude <= max_lng
+        ]
+
+    def _collect(self, cells):
+        with self._lock:
+            if len(cells) > len(self._buckets):
+                return list(self._points.values())
+            found = []
+            for cell in cells:
+                bucket = self._buckets.get(cell)
+                if bucket:
+                    found.extend(bucket.values())
+            return found
+
+    def nearby(self, lat, lng, radius_m, location_type=None, limit=None):
+        """[(distance_m, Point)] within radius_m of (lat, lng), nearest first."""
+        results = []
+        for point in self.candidates(lat, lng, radius_m):
+            if location_type and point.location_type != location_type:
+                continue
+            distance = haversine_m(lat, lng, point.latitude, point.longitude)
+            if distance <= radius_m:
+                results.append((distance, point))
+        results.sort(key=lambda r: r[0])
+        return results[:limit] if limit else results
+
+
+location_index = LocationIndex()
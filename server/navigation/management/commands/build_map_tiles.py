@@ -0,0 +1,58 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from navigation.index import location_index
+from navigation.tiles import MAX_ZOOM, get_tile, tile_key, tiles_between
+
+
+class Command(BaseCommand):
+    help = ('Pre-builds map tiles over the area covered by MapLocations into the shared cache '
+            '(needs e.g. REDIS_URL; a per-process cache would only warm this command)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-zoom', type=int, default=0)
+        parser.add_argument('--max-zoom', type=int, default=12)
+        parser.add_argument('--max-tiles', type=int, default=50000, help='Stop after this many tiles')
+        parser.add_argument('--rebuild', action='store_true', help='Drop cached tiles before building')
+
+    def handle(self, *args, **opts):
+        backend = settings.CACHES['default']['BACKEND']
+        if backend.endswith(('LocMemCache', 'DummyCache')):
+            raise CommandError(f'{backend} is private to this process, so the server would never see these tiles')
+
+        location_index.reload()
+        points = location_index.points()
+        if not points:
+            self.stdout.write('No map locations; nothing to build.')
+            return
+
+        min_lat = min(p.latitude for p in points)
+        max_lat = max(p.latitude for p in points)
+        min_lng = min(p.longitude for p in points)
+        max_lng = max(p.longitude for p in points)
+
+        built, total_bytes = 0, 0
+        start = time.perf_counter()
+        for z in range(opts['min_zoom'], min(opts['max_zoom'], MAX_ZOOM) + 1):
+            x0, y0, x1, y1 = tiles_between(min_lat, min_lng, max_lat, max_lng, z)
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    if built >= opts['max_tiles']:
+                        self.stdout.write(self.style.WARNING(f'Stopped at --max-tiles={built} (zoom {z})'))
+                        return self._report(built, total_bytes, start)
+                    if opts['rebuild']:
+                        cache.delete(tile_key(z, x, y))
+                    body, _ = get_tile(z, x, y)
+                    built += 1
+                    total_bytes += len(body)
+        self._report(built, total_bytes, start)
+
+    def _report(self, built, total_bytes, start):
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{built} tiles ready in {elapsed:.2f}s ({total_bytes / 1024:.1f} KiB, '
+            f'{total_bytes / max(built, 1):.0f} B/tile avg)'
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:17
+
+from django.db import migrations, models
+
+from navigation.geo import geohash
+
+
+def backfill_geohash(apps, schema_editor):
+    MapLocation = apps.get_model('navigation', 'MapLocation')
+    rows = list(MapLocation.objects.only('id', 'latitude', 'longitude'))
+    for row in rows:
+        row.geohash = geohash(row.latitude, row.longitude, 9)
+    MapLocation.objects.bulk_update(rows, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('navigation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='maplocation',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
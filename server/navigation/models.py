@@ -1,5 +1,11 @@
 from django.db import models
 
+from .geo import geohash
+
+# Stored geohash length; prefixes of it are used for spatial bucketing
+GEOHASH_PRECISION = 9
+
+
 class MapLocation(models.Model):
     TYPE_CHOICES = [
         ('danger', 'Danger Zone'),
@@ -12,8 +18,39 @@ class MapLocation(models.Model):
     longitude = models.FloatField()
     location_type = models.CharField(max_length=10, choices=TYPE_CHOICES)
     radius = models.FloatField(default=1000, help_text="Radius in meters (for Danger Zones)")
-    
+
+    # Derived from latitude/longitude on save; its prefixes are the
+    # in-memory index's buckets (navigation.index), so it isn't a DB index
+    geohash = models.CharField(max_length=12, editable=False, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Lets other workers' indexes pick up just the rows that changed
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def save(self, *args, **kwargs):
+        self.geohash = geohash(self.latitude, self.longitude, GEOHASH_PRECISION)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.title} ({self.location_type})"
+
+
+class MapChangeLog(models.Model):
+    """
+    Append-only log of map edits; the id is the version map tiles are
+    stamped with (navigation.tiles). Each row is the box one location
+    covered before or after an edit, so a cached tile can tell whether any
+    edit since its stamp reached it.
+    """
+    id = models.BigAutoField(primary_key=True)
+    min_lat = models.FloatField()
+    min_lng = models.FloatField()
+    max_lat = models.FloatField()
+    max_lng = models.FloatField()
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.title} ({self.location_type})"
\ No newline at end of file
+        return f"Map change #{self.id}"
@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .index import location_index
+from .models import MapLocation
+from .tiles import record_footprint
+
+
+def _footprint(lat, lng, radius, location_type):
+    # Only danger zones are drawn as circles reaching into other tiles
+    return lat, lng, (radius or 0) if location_type == 'danger' else 0
+
+
+def _footprint_of(location):
+    return _footprint(location.latitude, location.longitude, location.radius, location.location_type)
+
+
+@receiver(pre_save, sender=MapLocation)
+def remember_position(sender, instance, **kwargs):
+    # A moved (or shrunk) location has to leave its old tiles as well
+    instance._previous_footprint = None
+    if instance.pk:
+        instance._previous_footprint = (
+            MapLocation.objects.filter(pk=instance.pk).values_list('latitude', 'longitude', 'radius', 'location_type')
+            .first()
+        )
+
+
+@receiver(post_save, sender=MapLocation)
+def location_saved(sender, instance, **kwargs):
+    footprints = {_footprint_of(instance)}
+    previous = getattr(instance, '_previous_footprint', None)
+    if previous:
+        footprints.add(_footprint(*previous))
+
+    def on_commit():
+        location_index.upsert(instance)
+        for lat, lng, reach in footprints:
+            record_footprint(lat, lng, reach)
+
+    transaction.on_commit(on_commit)
+
+
+@receiver(post_delete, sender=MapLocation)
+def location_deleted(sender, instance, **kwargs):
+    pk, footprint = instance.pk, _footprint_of(instance)
+
+    def on_commit():
+        location_index.remove(pk)
+        record_footprint(*footprint)
+
+    transaction.on_commit(on_commit)
@@ -1,3 +1,254 @@
+import json
+import math
+import random
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .danger import danger_zones, users_at_risk
+from .geo import EARTH_RADIUS_M, cell_size_deg, geohash, geohash_center, haversine_m
+from .havens import CACHE_PRECISION, safe_havens
+from .index import location_index
+from .models import MapLocation
+from .tiles import build_tile, get_tile, record_footprint, tile_bounds, tile_for
+
+M_PER_DEG = math.pi * EARTH_RADIUS_M / 180
+
+
+def offset(lat, lng, north_m=0.0, east_m=0.0):
+    return lat + north_m / M_PER_DEG, lng + east_m / (M_PER_DEG * math.cos(math.radians(lat)))
+
+
+def place(title, location_type, lat, lng, radius=1000):
+    return MapLocation.objects.create(
+        title=title, location_type=location_type, latitude=lat, longitude=lng, radius=radius
+    )
+
+
+class SafeHavenTests(TestCase):
+    def setUp(self):
+        # User in the south-west corner of a cache cell, so the cell center
+        # (~75 m north-east) sees a different path to each haven
+        clat, clng = geohash_center(geohash(23.8, 90.4, CACHE_PRECISION))
+        h, w = cell_size_deg(CACHE_PRECISION)
+        self.user = (clat - h / 2 + 1e-6, clng - w / 2 + 1e-6)
+
+        self.blocked = place('North haven', 'safe', *offset(*self.user, north_m=250))
+        self.clear = place('South haven', 'safe', *offset(*self.user, north_m=-500))
+        # Sits on the user's straight path north, but clear of the center's
+        place('Fire', 'danger', *offset(*self.user, north_m=120), radius=25)
+        location_index.reload()
+
+    def test_danger_is_judged_from_the_callers_position(self):
+        for _ in range(2):  # miss, then cached candidates
+            havens = safe_havens.lookup(*self.user, 1)
+            self.assertEqual([p.id for _, p in havens], [self.clear.pk])
+
+        # From the cell center the north haven really is reachable
+        center = geohash_center(geohash(*self.user, CACHE_PRECISION))
+        self.assertEqual([p.id for _, p in safe_havens.reachable(*center, 1)], [self.blocked.pk])
+
+    def test_cached_lookup_matches_exact_search(self):
+        rng = random.Random(3)
+        for n in range(60):
+            place(f'Haven {n}', 'safe', *offset(*self.user, rng.uniform(-3000, 3000), rng.uniform(-3000, 3000)))
+        for n in range(15):
+            place(f'Zone {n}', 'danger', *offset(*self.user, rng.uniform(-3000, 3000), rng.uniform(-3000, 3000)),
+                  radius=rng.uniform(50, 400))
+        location_index.reload()
+
+        for _ in range(200):
+            lat, lng = offset(*self.user, rng.uniform(-2500, 2500), rng.uniform(-2500, 2500))
+            expected = [p.id for _, p in safe_havens.reachable(lat, lng, 3)]
+            self.assertEqual([p.id for _, p in safe_havens.lookup(lat, lng, 3)], expected)
+
+
+class MapTileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.z = 14
+        self.x, self.y = tile_for(23.8, 90.4, self.z)
+        min_lat, self.west, max_lat, _ = tile_bounds(self.z, self.x, self.y)
+        self.mid_lat = (min_lat + max_lat) / 2
+
+    def ids(self, payload):
+        return {point[0] for point in payload['points']}
+
+    def test_zones_reaching_in_from_a_neighbour_tile_are_included(self):
+        inside = place('Shelter', 'safe', *offset(self.mid_lat, self.west, east_m=200))
+        reaching = place('Flood', 'danger', *offset(self.mid_lat, self.west, east_m=-300), radius=500)
+        short = place('Fire', 'danger', *offset(self.mid_lat, self.west, east_m=-300), radius=100)
+        far_safe = place('Far shelter', 'safe', *offset(self.mid_lat, self.west, east_m=-300), radius=5000)
+        location_index.reload()
+
+        tile = build_tile(self.z, self.x, self.y)
+        self.assertEqual(self.ids(tile), {inside.pk, reaching.pk})
+        self.assertNotIn(short.pk, self.ids(tile))
+        self.assertNotIn(far_safe.pk, self.ids(tile))
+        self.assertEqual(tile['clusters'], [])
+
+    def test_saving_a_zone_refreshes_every_tile_it_touches(self):
+        location_index.reload()
+        self.assertEqual(self.ids(json.loads(get_tile(self.z, self.x, self.y)[0])), set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            zone = place('Flood', 'danger', *offset(self.mid_lat, self.west, east_m=-300), radius=500)
+        self.assertEqual(self.ids(json.loads(get_tile(self.z, self.x, self.y)[0])), {zone.pk})
+
+        # Shrinking it back out of the tile drops it there too
+        zone.radius = 100
+        with self.captureOnCommitCallbacks(execute=True):
+            zone.save()
+        self.assertEqual(self.ids(json.loads(get_tile(self.z, self.x, self.y)[0])), set())
+
+    def test_huge_zone_reaches_deep_zoom_tiles(self):
+        location_index.reload()
+        x, y = tile_for(23.8, 90.4, 20)
+        get_tile(20, x, y)
+        with self.captureOnCommitCallbacks(execute=True):
+            zone = place('Cyclone', 'danger', 23.9, 90.5, radius=50000)
+        self.assertIn(zone.pk, self.ids(json.loads(get_tile(20, x, y)[0])))
+
+    def test_edits_elsewhere_keep_the_cached_tile(self):
+        location_index.reload()
+        _, etag = get_tile(self.z, self.x, self.y)
+        with self.captureOnCommitCallbacks(execute=True):
+            place('Far fire', 'danger', 24.5, 91.0, radius=500)
+        with mock.patch('navigation.tiles.build_tile') as build:
+            self.assertEqual(get_tile(self.z, self.x, self.y)[1], etag)
+        build.assert_not_called()
+
+    def test_another_workers_edit_is_never_served_stale(self):
+        location_index.reload()
+        get_tile(self.z, self.x, self.y)
+
+        # Written by another worker: no signals here, this index hasn't seen
+        # it, only the change-log row is shared
+        lat, lng = offset(self.mid_lat, self.west, east_m=200)
+        shelter = MapLocation.objects.bulk_create([
+            MapLocation(title='Shelter', location_type='safe', latitude=lat, longitude=lng,
+                        geohash=geohash(lat, lng, 9)),
+        ])[0]
+        record_footprint(lat, lng)
+
+        self.assertEqual(self.ids(json.loads(get_tile(self.z, self.x, self.y)[0])), {shelter.pk})
+
+
+class DangerZoneTests(TestCase):
+    def setUp(self):
+        self.center = (23.8, 90.4)
+        self.big = place('Flood', 'danger', *self.center, radius=1000)
+        self.small = place('Fire', 'danger', *offset(*self.center, east_m=1100), radius=300)
+        place('Shelter', 'safe', *offset(*self.center, north_m=100), radius=5000)
+        location_index.reload()
+
+    def test_classify_picks_the_zone_a_point_is_deepest_in(self):
+        points = [
+            offset(*self.center, east_m=100),   # only the big zone
+            offset(*self.center, east_m=850),   # both; 150 m left in big, 50 m in small
+            offset(*self.center, east_m=950),   # both; 50 m left in big, 150 m in small
+            offset(*self.center, east_m=1200),  # only the small one
+            offset(*self.center, north_m=2000),  # neither (the safe place doesn't count)
+        ]
+        inside, zone_ids = danger_zones.classify([p[0] for p in points], [p[1] for p in points])
+        self.assertEqual(inside.tolist(), [True, True, True, True, False])
+        self.assertEqual(zone_ids.tolist(), [self.big.pk, self.big.pk, self.small.pk, self.small.pk, -1])
+
+    def test_classify_matches_haversine_in_chunks(self):
+        rng = random.Random(5)
+        for n in range(20):
+            place(f'Zone {n}', 'danger', *offset(*self.center, rng.uniform(-3000, 3000), rng.uniform(-3000, 3000)),
+                  radius=rng.uniform(50, 800))
+        location_index.reload()
+        zones = location_index.points('danger')
+        points = [offset(*self.center, rng.uniform(-4000, 4000), rng.uniform(-4000, 4000)) for _ in range(300)]
+
+        with mock.patch('navigation.danger.MAX_CELLS_PER_CHUNK', 50):
+            inside, _ = danger_zones.classify([p[0] for p in points], [p[1] for p in points])
+        expected = [
+            any(haversine_m(lat, lng, z.latitude, z.longitude) <= z.radius - 0.01 for z in zones)
+            for lat, lng in points
+        ]
+        edge = [
+            any(abs(haversine_m(lat, lng, z.latitude, z.longitude) - z.radius) < 0.01 for z in zones)
+            for lat, lng in points
+        ]
+        self.assertEqual([i for i, e in zip(inside.tolist(), edge) if not e],
+                         [x for x, e in zip(expected, edge) if not e])
+
+    def test_zones_at_lists_containing_zones_nearest_first(self):
+        lat, lng = offset(*self.center, east_m=900)
+        found = danger_zones.zones_at(lat, lng)
+        self.assertEqual([(zone_id, title) for zone_id, title, _ in found],
+                         [(self.small.pk, 'Fire'), (self.big.pk, 'Flood')])
+        self.assertAlmostEqual(found[0][2], 200, delta=1)
+        self.assertAlmostEqual(found[1][2], 900, delta=1)
+        self.assertEqual(danger_zones.zones_at(*offset(*self.center, north_m=2000)), [])
+
+    def test_new_zones_are_picked_up(self):
+        far = offset(*self.center, north_m=5000)
+        self.assertEqual(danger_zones.zones_at(*far), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            zone = place('Landslide', 'danger', *far, radius=200)
+        self.assertEqual([z[0] for z in danger_zones.zones_at(*far)], [zone.pk])
+
+    def test_users_at_risk_reads_any_coordinate_spelling(self):
+        User = get_user_model()
+
+        def user(name, location):
+            return User.objects.create_user(email=f'{name}@example.com', username=name, full_name=name,
+                                            location=location)
+
+        lat, lng = offset(*self.center, east_m=100)
+        short = user('short', {'lat': lat, 'lng': lng})
+        long_keys = user('long', {'latitude': str(lat), 'longitude': str(lng), 'address': 'Dhaka'})
+        fire_lat, fire_lng = offset(*self.center, east_m=1200)
+        in_fire = user('fire', {'lat': fire_lat, 'lon': fire_lng})
+        user('safe', {'lat': 25.0, 'lng': 89.0})
+        user('address', {'address': 'Mirpur 10'})
+        user('nowhere', None)
+
+        self.assertEqual(sorted(users_at_risk()), sorted([
+            (short.pk, self.big.pk), (long_keys.pk, self.big.pk), (in_fire.pk, self.small.pk),
+        ]))
+
+
+class LocationIndexTests(TestCase):
+    def test_refresh_picks_up_other_workers_writes(self):
+        kept = place('Shelter', 'safe', 23.8, 90.4)
+        gone = place('Old fire', 'danger', 23.81, 90.41)
+        location_index.reload()
+        version = location_index.version
+
+        # Written behind this process's back (no signals), as another worker would
+        MapLocation.objects.filter(pk=kept.pk).update(
+            latitude=23.9, geohash=geohash(23.9, 90.4, 9), updated_at=timezone.now()
+        )
+        MapLocation.objects.filter(pk=gone.pk)._raw_delete('default')
+        added = MapLocation.objects.bulk_create([
+            MapLocation(title='New fire', location_type='danger', latitude=23.7, longitude=90.3,
+                        geohash=geohash(23.7, 90.3, 9)),
+        ])[0]
+
+        location_index.refresh()
+        self.assertGreater(location_index.version, version)
+        points = {p.id: p for p in location_index.points()}
+        self.assertEqual(set(points), {kept.pk, added.pk})
+        self.assertEqual(points[kept.pk].latitude, 23.9)
+        self.assertEqual([p.id for _, p in location_index.nearby(23.9, 90.4, 100)], [kept.pk])
+
+        version = location_index.version
+        location_index.refresh()
+        self.assertEqual(location_index.version, version)  # nothing new
 
-# Create your tests here.
+    def test_danger_check_validates_coordinates(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/v1/map-locations/danger-check/?lat=91&lng=0').status_code, 400)
+        response = client.post('/api/v1/map-locations/danger-check/', {'points': [[1, 2], [0, 200]]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('points[1]', response.json()['error'])
+        self.assertEqual(client.get('/api/v1/map-locations/danger-check/?lat=nan&lng=0').status_code, 400)
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import math
+
+from django.core.cache import cache
+from django.db.models import Max
+
+from .geo import EARTH_RADIUS_M, bounding_box, haversine_m
+from .index import location_index
+from .models import MapChangeLog
+
+MAX_ZOOM = 20
+# From this zoom on, tiles carry every point; below it nearby points merge
+CLUSTER_UNTIL_ZOOM = 15
+# Cluster cells per tile side: 8 px cells on a 256 px tile
+GRID = 32
+TILE_TTL = 300
+MAX_LAT = 85.05112878
+
+
+# =====================================================
+# 🗺️ WEB MERCATOR TILE MATH (slippy-map z/x/y)
+# =====================================================
+
+def tile_bounds(z, x, y):
+    """(min_lat, min_lng, max_lat, max_lng) of a tile."""
+    n = 1 << z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0
+
+
+def tile_for(lat, lng, z):
+    n = 1 << z
+    lat = math.radians(max(-MAX_LAT, min(MAX_LAT, lat)))
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+
+def tiles_between(min_lat, min_lng, max_lat, max_lng, z):
+    """(x0, y0, x1, y1): the range of tiles at zoom z covering a lat/lng box."""
+    x0, y0 = tile_for(max_lat, min_lng, z)  # north-west corner
+    x1, y1 = tile_for(min_lat, max_lng, z)  # south-east corner
+    return x0, y0, x1, y1
+
+
+def tile_key(z, x, y):
+    return f"map:tile:{z}:{x}:{y}"
+
+
+# =====================================================
+# 🔢 VERSIONS (shared by every worker through the DB)
+# =====================================================
+
+def current_version():
+    return MapChangeLog.objects.aggregate(v=Max('id'))['v'] or 0
+
+
+def record_footprint(lat, lng, radius=0):
+    """Log an edit to whatever is drawn at (lat, lng) with this radius."""
+    min_lat, min_lng, max_lat, max_lng = bounding_box(lat, lng, radius or 0)
+    MapChangeLog.objects.create(min_lat=min_lat, min_lng=min_lng, max_lat=max_lat, max_lng=max_lng)
+
+
+def _touched(z, x, y, since, until):
+    """Whether any edit logged in (since, until] reaches the tile."""
+    min_lat, min_lng, max_lat, max_lng = tile_bounds(z, x, y)
+    return MapChangeLog.objects.filter(
+        id__gt=since, id__lte=until,
+        min_lat__lte=max_lat, max_lat__gte=min_lat,
+        min_lng__lte=max_lng, max_lng__gte=min_lng,
+    ).exists()
+
+
+# =====================================================
+# 🧱 BUILD / CACHE
+# =====================================================
+
+def build_tile(z, x, y):
+    """
+    Compact tile payload:
+      points:   [[id, type, lat, lng, radius], ...]
+      clusters: [[lat, lng, count, danger_count], ...]
+
+    Danger zones centered outside the tile whose circle reaches into it are
+    listed as points too, so circles aren't cut off at tile edges.
+    """
+    min_lat, min_lng, max_lat, max_lng = tile_bounds(z, x, y)
+    # Widen the query by the biggest zone's reach; a radius spans the most
+    # longitude at the tile's pole-most edge
+    reach = location_index.max_danger_radius()
+    dlat = math.degrees(reach / EARTH_RADIUS_M)
+    dlng = bounding_box(max(abs(min_lat), abs(max_lat)), 0.0, reach)[3]
+    found = location_index.in_box(min_lat - dlat, min_lng - dlng, max_lat + dlat, max_lng + dlng)
+
+    inside, overhanging = [], []
+    for p in found:
+        if min_lat <= p.latitude <= max_lat and min_lng <= p.longitude <= max_lng:
+            inside.append(p)
+        elif p.location_type == 'danger' and _reaches(p, min_lat, min_lng, max_lat, max_lng):
+            overhanging.append(p)
+
+    singles, clusters = inside, []
+    if z < CLUSTER_UNTIL_ZOOM and len(inside) > GRID:
+        cells = {}
+        for p in inside:
+            col = min(GRID - 1, int((p.longitude - min_lng) / (max_lng - min_lng) * GRID))
+            row = min(GRID - 1, int((max_lat - p.latitude) / (max_lat - min_lat) * GRID))
+            cells.setdefault((col, row), []).append(p)
+        singles = []
+        for members in cells.values():
+            if len(members) == 1:
+                singles.append(members[0])
+                continue
+            clusters.append([
+                round(sum(p.latitude for p in members) / len(members), 6),
+                round(sum(p.longitude for p in members) / len(members), 6),
+                len(members),
+                sum(1 for p in members if p.location_type == 'danger'),
+            ])
+
+    return {
+        'z': z, 'x': x, 'y': y,
+        'points': [
+            [p.id, p.location_type, round(p.latitude, 6), round(p.longitude, 6), p.radius]
+            for p in singles + overhanging
+        ],
+        'clusters': clusters,
+    }
+
+
+def _reaches(zone, min_lat, min_lng, max_lat, max_lng):
+    """Whether the zone's circle covers any of the box (distance to its nearest point)."""
+    nearest_lat = min(max(zone.latitude, min_lat), max_lat)
+    nearest_lng = min(max(zone.longitude, min_lng), max_lng)
+    return bool(zone.radius) and haversine_m(zone.latitude, zone.longitude, nearest_lat, nearest_lng) <= zone.radius
+
+
+def get_tile(z, x, y):
+    """
+    (json_bytes, etag) for a tile. Cached entries carry the map version they
+    were built at: one that's behind is still served (and re-stamped) if no
+    edit logged since reaches the tile, and rebuilt otherwise.
+    """
+    version = current_version()
+    key = tile_key(z, x, y)
+    entry = cache.get(key)
+    if entry is not None and entry['version'] < version:
+        if _touched(z, x, y, entry['version'], version):
+            entry = None
+        else:
+            entry['version'] = version
+            cache.set(key, entry, TILE_TTL)
+    if entry is None:
+        # This worker's index can lag other workers' edits by up to a minute
+        location_index.catch_up(version)
+        body = json.dumps(build_tile(z, x, y), separators=(',', ':')).encode()
+        entry = {'body': body, 'etag': '"' + hashlib.sha1(body).hexdigest()[:16] + '"', 'version': version}
+        cache.set(key, entry, TILE_TTL)
+    return entry['body'], entry['etag']
@@ -1,7 +1,153 @@
+from django.http import Http404, HttpResponse
+from django.utils.http import parse_etags
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from notification.permissions import IsAdminRole
+
+from .danger import danger_zones, users_at_risk
+from .havens import safe_havens
+from .index import location_index
 from .models import MapLocation
 from .serializers import MapLocationSerializer
+from .tiles import get_tile, valid_tile
+
+MAX_NEARBY_RADIUS_M = 100000
+MAX_DANGER_BATCH = 10000
+MAX_HAVENS = 20
+
+
+def _float_param(params, name, default=None):
+    value = params.get(name, default)
+    if value is None:
+        raise ValueError(f"{name} is required")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+
 
 class MapLocationViewSet(viewsets.ModelViewSet):
     queryset = MapLocation.objects.all()
-    serializer_class = MapLocationSerializer
\ No newline at end of file
+    serializer_class = MapLocationSerializer
+
+    # GET /map-locations/nearby/?lat=&lng=&radius=<meters>&type=danger|safe&limit=
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        params = request.query_params
+        try:
+            lat = _float_param(params, 'lat')
+            lng = _float_param(params, 'lng')
+            radius = _float_param(params, 'radius', 5000)
+            limit = int(params.get('limit', 100))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return Response({'error': 'lat/lng out of range'}, status=400)
+        radius = min(max(radius, 0), MAX_NEARBY_RADIUS_M)
+
+        results = location_index.nearby(lat, lng, radius, params.get('type'), max(1, min(limit, 500)))
+        return Response([
+            {
+                'id': p.id,
+                'title': p.title,
+                'location_type': p.location_type,
+                'latitude': p.latitude,
+                'longitude': p.longitude,
+                'radius': p.radius,
+                'distance_m': round(distance, 1),
+            }
+            for distance, p in results
+        ])
+
+    # GET /map-locations/tiles/<z>/<x>/<y>/  -> compact clustered tile (see navigation.tiles)
+    @action(detail=False, methods=['get'], url_path=r'tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)')
+    def tiles(self, request, z, x, y):
+        z, x, y = int(z), int(x), int(y)
+        if not valid_tile(z, x, y):
+            raise Http404
+        body, etag = get_tile(z, x, y)
+
+        header = request.headers.get('If-None-Match')
+        if header and etag in parse_etags(header):
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age=60'
+        return response
+
+    # GET /map-locations/safe-havens/?lat=&lng=&k=5
+    @action(detail=False, methods=['get'], url_path='safe-havens')
+    def safe_havens(self, request):
+        params = request.query_params
+        try:
+            lat = _float_param(params, 'lat')
+            lng = _float_param(params, 'lng')
+            k = int(params.get('k', 5))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return Response({'error': 'lat/lng out of range'}, status=400)
+
+        havens = safe_havens.lookup(lat, lng, max(1, min(k, MAX_HAVENS)))
+        return Response([
+            {
+                'id': p.id,
+                'title': p.title,
+                'latitude': p.latitude,
+                'longitude': p.longitude,
+                'distance_m': round(distance, 1),
+            }
+            for distance, p in havens
+        ])
+
+    # GET  /map-locations/danger-check/?lat=&lng=   -> zones containing one point
+    # POST /map-locations/danger-check/ {"points": [[lat, lng], ...]} -> batch
+    @action(detail=False, methods=['get', 'post'], url_path='danger-check')
+    def danger_check(self, request):
+        if request.method == 'GET':
+            try:
+                lat = _float_param(request.query_params, 'lat')
+                lng = _float_param(request.query_params, 'lng')
+            except ValueError as e:
+                return Response({'error': str(e)}, status=400)
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                return Response({'error': 'lat/lng out of range'}, status=400)
+            zones = danger_zones.zones_at(lat, lng)
+            return Response({
+                'in_danger': bool(zones),
+                'zones': [
+                    {'id': zone_id, 'title': title, 'distance_m': round(distance, 1)}
+                    for zone_id, title, distance in zones
+                ],
+            })
+
+        points = request.data.get('points')
+        if not isinstance(points, list) or len(points) > MAX_DANGER_BATCH:
+            return Response({'error': f'points must be a list of at most {MAX_DANGER_BATCH} [lat, lng] pairs'}, status=400)
+        try:
+            lats = [float(p[0]) for p in points]
+            lngs = [float(p[1]) for p in points]
+        except (TypeError, ValueError, IndexError, KeyError):
+            return Response({'error': 'points must be [lat, lng] pairs'}, status=400)
+        # Also rejects nan/inf, which compare False both ways
+        bad = next((n for n, (lat, lng) in enumerate(zip(lats, lngs))
+                    if not (-90 <= lat <= 90 and -180 <= lng <= 180)), None)
+        if bad is not None:
+            return Response({'error': f'points[{bad}]: lat/lng out of range'}, status=400)
+
+        _, zone_ids = danger_zones.classify(lats, lngs)
+        # One entry per input point: the zone id, or null when safe
+        return Response({'zones': [int(z) if z >= 0 else None for z in zone_ids]})
+
+    # GET /map-locations/at-risk/  (admin) -> users whose location is inside a danger zone
+    @action(detail=False, methods=['get'], url_path='at-risk', permission_classes=[IsAdminRole])
+    def at_risk(self, request):
+        at_risk = users_at_risk()
+        return Response({
+            'count': len(at_risk),
+            'results': [{'user_id': user_id, 'zone_id': zone_id} for user_id, zone_id in at_risk],
+        })
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Drop a subscriber once this many bytes are stuck in its socket buffer
+MAX_SUBSCRIBER_BACKLOG = 4 * 1024 * 1024
+
+
+class RelayBroker:
+    """
+    Local stand-in for a real pub/sub broker (Redis etc.).
+
+    Line protocol over TCP: a client sends "PUB" or "SUB" as its first line.
+    Every line from a PUB connection is relayed verbatim to all SUB
+    connections (one per ASGI worker).
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.relayed = 0
+
+    async def handle(self, reader, writer):
+        role = (await reader.readline()).strip().upper()
+        if role == b"SUB":
+            self.subscribers.add(writer)
+            try:
+                await reader.read()  # park until the worker goes away
+            finally:
+                self.subscribers.discard(writer)
+                writer.close()
+        elif role == b"PUB":
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.relay(line)
+            writer.close()
+        else:
+            writer.close()
+
+    def relay(self, line):
+        self.relayed += 1
+        for writer in tuple(self.subscribers):
+            if writer.transport.get_write_buffer_size() > MAX_SUBSCRIBER_BACKLOG:
+                logger.warning("Dropping stalled broker subscriber")
+                self.subscribers.discard(writer)
+                writer.close()
+                continue
+            writer.write(line)
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Notification
+from . import versioning
+
+
+class BannerCache:
+    """
+    Two-level cache for the active banner, keyed by feed version.
+
+    Each lookup first reads the audience's FeedVersion counter, which every
+    notification write bumps in the same transaction. The counters are
+    memoized per process for NOTIFICATION_VERSION_TTL seconds (see
+    versioning.recent_versions_for), so a warm lookup runs no query at all.
+    Entries are stored under that version, so once a write commits this
+    process misses and reloads at once and every other one within that TTL;
+    a stale banner can't outlive its write by more, whatever the cache
+    backend. L1 is a per-process dict, L2 the configured Django cache
+    (shared when CACHES points at Redis); both only ever serve the current
+    version, so their TTLs just bound memory. Entries are
+    {"data": <serialized banner or None>, "etag": ...} so "no banner" is
+    cached too.
+    """
+
+    def __init__(self, local_ttl=60, shared_ttl=300, local_size=10000):
+        self.local_ttl = local_ttl
+        self.shared_ttl = shared_ttl
+        self.local_size = local_size
+        self._local = {}
+        self._lock = threading.Lock()
+        self.stats = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+
+    @property
+    def shared(self):
+        return caches[getattr(settings, "NOTIFICATION_CACHE_ALIAS", "default")]
+
+    @staticmethod
+    def public_key(version):
+        return f"notif:banner:public:v{version}"
+
+    @staticmethod
+    def user_key(user_id, version):
+        return f"notif:banner:user:{int(user_id)}:v{version}"
+
+    # --- lookups ---
+
+    def public_banner(self, version):
+        return self._get(self.public_key(version), lambda: Notification.objects.filter(
+            is_broadcast=True,
+            is_banner=True
+        ).order_by("-created_at", "-id").first())
+
+    def personal_banner(self, user_id, version):
+        return self._get(self.user_key(user_id, version), lambda: Notification.objects.filter(
+            recipient_id=user_id,
+            is_banner=True
+        ).order_by("-created_at", "-id").first())
+
+    def banner_for(self, user_id=None):
+        """
+        Latest banner visible to the caller: the public one, or the user's
+        personal banner if that is newer. Returns (data, etag).
+        """
+        versions = versioning.recent_versions_for(user_id)
+        public = self.public_banner(versions[versioning.BROADCAST])
+        if user_id is None:
+            return public["data"], public["etag"]
+
+        personal = self.personal_banner(user_id, versions[versioning.user_audience(user_id)])
+        candidates = [e["data"] for e in (public, personal) if e["data"]]
+        data = max(candidates, key=lambda d: (d["created_at"], d["id"])) if candidates else None
+        etag = '"' + hashlib.sha1((public["etag"] + personal["etag"]).encode()).hexdigest()[:16] + '"'
+        return data, etag
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        hits = lookups - stats["misses"]
+        return {**stats, "hit_ratio": round(hits / lookups, 4) if lookups else None}
+
+    # --- internals ---
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _get(self, key, load):
+        now = time.monotonic()
+        entry = self._local.get(key)
+        if entry and entry[0] > now:
+            self._count("local_hits")
+            return entry[1]
+
+        value = self.shared.get(key)
+        if value is not None:
+            self._count("shared_hits")
+        else:
+            self._count("misses")
+            value = self._entry(load())
+            self.shared.set(key, value, self.shared_ttl)
+
+        with self._lock:
+            if len(self._local) >= self.local_size:
+                # Superseded versions pile up here; start over rather than track them
+                self._local.clear()
+            self._local[key] = (now + self.local_ttl, value)
+        return value
+
+    @staticmethod
+    def _entry(notification):
+        from .serializers import NotificationSerializer
+
+        data = NotificationSerializer(notification).data if notification else None
+        data = json.loads(json.dumps(data, default=str)) if data else None  # plain, picklable dict
+        digest = hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+        return {"data": data, "etag": f'"{digest}"'}
+
+
+banner_cache = BannerCache()
@@ -0,0 +1,201 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import Notification, NotificationJob
+from . import readstate, realtime, versioning
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+CHUNK_SIZE = 1000
+# A pending/running job untouched for this long lost its worker (restart,
+# crash); resume_stale() takes it over
+STALE_AFTER = 300
+# Unknown recipient ids listed in a validation error, at most
+MAX_REPORTED_IDS = 20
+
+# Keys accepted in a job's {"filter": {...}} and the User lookup they map to.
+# city/state/district/pincode live inside the JSON `location` column.
+USER_FILTERS = {
+    "role": "role",
+    "blood_group": "blood_group",
+    "city": "location__city",
+    "state": "location__state",
+    "district": "location__district",
+    "pincode": "location__pincode",
+}
+
+# Small on purpose: bulk sends are rare and shouldn't starve the DB
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="notification-jobs")
+
+
+def validate_target(data):
+    """
+    Returns (target, error). `target` is what gets stored on the job.
+    """
+    recipients = data.get("recipients")
+    user_filter = data.get("filter")
+
+    if recipients is not None:
+        if not isinstance(recipients, list) or not recipients:
+            return None, "recipients must be a non-empty list of user ids"
+        if any(isinstance(r, bool) for r in recipients):
+            return None, "recipients must be a list of user ids"
+        try:
+            ids = sorted({int(r) for r in recipients})
+        except (TypeError, ValueError):
+            return None, "recipients must be a list of user ids"
+        missing = sorted(set(ids) - set(User.objects.filter(id__in=ids).values_list("id", flat=True)))
+        if missing:
+            shown = ", ".join(str(pk) for pk in missing[:MAX_REPORTED_IDS])
+            more = f" (and {len(missing) - MAX_REPORTED_IDS} more)" if len(missing) > MAX_REPORTED_IDS else ""
+            return None, f"unknown recipients: {shown}{more}"
+        return {"recipients": ids}, None
+
+    if user_filter is not None:
+        if not isinstance(user_filter, dict) or not user_filter:
+            return None, "filter must be a non-empty object"
+        unknown = set(user_filter) - set(USER_FILTERS)
+        if unknown:
+            return None, f"unsupported filter keys: {', '.join(sorted(unknown))}"
+        # Lists/objects would turn into JSON containment or `__in` lookups
+        nested = [k for k, v in user_filter.items() if isinstance(v, bool) or not isinstance(v, (str, int, float))]
+        if nested:
+            return None, f"filter values must be strings or numbers: {', '.join(sorted(nested))}"
+        return {"filter": user_filter}, None
+
+    return None, "either recipients or filter is required"
+
+
+def recipient_queryset(target):
+    qs = User.objects.filter(is_active=True)
+    if "recipients" in target:
+        qs = qs.filter(id__in=target["recipients"])
+    else:
+        qs = qs.filter(**{USER_FILTERS[k]: v for k, v in target["filter"].items()})
+    return qs.order_by("id").values_list("id", flat=True)
+
+
+def enqueue(job):
+    # Only hand the job to a worker once its row is committed
+    transaction.on_commit(lambda: _executor.submit(run, job.pk))
+
+
+def run(job_id):
+    """Executor entry point; a no-op if the job was already claimed (e.g. by resume_stale)."""
+    close_old_connections()
+    try:
+        claimed = NotificationJob.objects.filter(pk=job_id, status="pending").update(
+            status="running", updated_at=timezone.now()
+        )
+    finally:
+        connection.close()
+    if claimed:
+        execute(job_id)
+
+
+def resume_stale(stale_after=STALE_AFTER):
+    """
+    Claim pending/running jobs that haven't moved for `stale_after`
+    seconds, i.e. whose process went away before finishing them, and
+    return their ids for execute(). The claim is a compare-and-set on
+    updated_at, so two sweeps never take the same job.
+    """
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    stale = NotificationJob.objects.filter(status__in=("pending", "running"), updated_at__lt=cutoff)
+    claimed = []
+    for job_id, job_status, updated_at in stale.values_list("id", "status", "updated_at"):
+        if NotificationJob.objects.filter(pk=job_id, status=job_status, updated_at=updated_at).update(
+            status="running", updated_at=timezone.now()
+        ):
+            claimed.append(job_id)
+    return claimed
+
+
+def execute(job_id):
+    """Run (or resume) a job this process has claimed."""
+    close_old_connections()
+    try:
+        _run(job_id)
+    except Exception as e:
+        logger.exception("Notification job %s failed", job_id)
+        NotificationJob.objects.filter(pk=job_id).update(
+            status="failed", error=str(e), finished_at=timezone.now(), updated_at=timezone.now()
+        )
+    finally:
+        connection.close()
+
+
+def _run(job_id):
+    job = NotificationJob.objects.get(pk=job_id)
+    ids = recipient_queryset(job.target)
+
+    # On a resume, `processed` already counts the chunks committed earlier
+    NotificationJob.objects.filter(pk=job_id).update(total=ids.count(), updated_at=timezone.now())
+
+    last_id = job.last_recipient_id
+    while True:
+        # Seek by id rather than OFFSET so late chunks cost the same as early ones
+        chunk = list(ids.filter(id__gt=last_id)[:CHUNK_SIZE])
+        if not chunk:
+            break
+        last_id = chunk[-1]
+
+        with transaction.atomic():
+            before = Notification.objects.aggregate(last=Max("id"))["last"] or 0
+            created = Notification.objects.bulk_create([
+                Notification(
+                    title=job.title,
+                    message=job.message,
+                    notification_type=job.notification_type,
+                    is_banner=job.is_banner,
+                    is_broadcast=False,
+                    recipient_id=user_id,
+                )
+                for user_id in chunk
+            ], batch_size=CHUNK_SIZE)
+            # bulk_create skips post_save, so do the signal's work in bulk
+            versioning.bump_many(versioning.user_audience(user_id) for user_id in chunk)
+            readstate.personal_unread_changed(chunk, +1)
+            # Same transaction as the rows: a resume never sends this chunk twice
+            NotificationJob.objects.filter(pk=job_id).update(
+                processed=F("processed") + len(chunk), last_recipient_id=last_id, updated_at=timezone.now()
+            )
+
+        _push(job, _created_ids(job, chunk, created, before))
+
+    NotificationJob.objects.filter(pk=job_id).update(
+        status="done", finished_at=timezone.now(), updated_at=timezone.now()
+    )
+
+
+def _created_ids(job, chunk, created, before):
+    """{recipient_id: notification id} for a chunk just inserted."""
+    if all(n.pk is not None for n in created):
+        return {n.recipient_id: n.pk for n in created}
+    # MySQL's bulk INSERT doesn't return ids; they're all above `before`
+    return dict(
+        Notification.objects.filter(recipient_id__in=chunk, id__gt=before, title=job.title, is_broadcast=False)
+        .values_list("recipient_id", "id")
+    )
+
+
+def _push(job, ids_by_user):
+    payload = {
+        "title": job.title,
+        "message": job.message,
+        "notification_type": job.notification_type,
+        "is_banner": job.is_banner,
+        "is_broadcast": False,
+    }
+    for user_id, notification_id in ids_by_user.items():
+        realtime.publish(
+            versioning.user_audience(user_id), {**payload, "id": notification_id, "recipient": user_id}
+        )
@@ -0,0 +1,85 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from notification.models import Notification
+from notification.pagination import encode_cursor
+from notification.views import NotificationViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks keyset-paginated notification feed latency (p50/p99) as the table grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma separated table sizes to measure at')
+        parser.add_argument('--requests', type=int, default=200, help='Pages fetched per size')
+        parser.add_argument('--limit', type=int, default=20, help='Page size')
+
+    def handle(self, *args, **opts):
+        sizes = sorted(int(s) for s in opts['sizes'].split(','))
+        self.factory = APIRequestFactory()
+        self.view = NotificationViewSet.as_view({'get': 'list'})
+
+        # Everything is seeded inside one transaction and rolled back at the end,
+        # so this is safe to point at a dev database.
+        try:
+            with transaction.atomic():
+                inserted = 0
+                for size in sizes:
+                    self._seed(size - inserted)
+                    inserted = size
+                    self._measure(size, opts['requests'], opts['limit'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (seed data rolled back).'))
+
+    def _seed(self, count, batch=5000):
+        self.stdout.write(f'Seeding {count} broadcasts...')
+        while count > 0:
+            n = min(batch, count)
+            Notification.objects.bulk_create([
+                Notification(
+                    title='Benchmark alert',
+                    message='Synthetic notification for feed benchmark',
+                    notification_type=random.choice(['info', 'warning', 'alert']),
+                    is_broadcast=True,
+                )
+                for _ in range(n)
+            ])
+            count -= n
+
+    def _measure(self, size, requests, limit):
+        # Random anchors simulate clients scrolled deep into the history
+        anchors = list(
+            Notification.objects.order_by('?').values_list('created_at', 'id')[:requests]
+        )
+        timings = []
+        for i in range(requests):
+            params = {'limit': limit}
+            if i % 2 and anchors:
+                ts, pk = anchors[i % len(anchors)]
+                params['cursor'] = encode_cursor(ts, pk)
+
+            request = self.factory.get('/api/v1/notifications/', params)
+            request.user_jwt = None
+
+            start = time.perf_counter()
+            response = self.view(request)
+            response.render()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        p50 = statistics.median(timings)
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(f'rows={size:>9}  p50={p50:7.2f} ms  p99={p99:7.2f} ms')
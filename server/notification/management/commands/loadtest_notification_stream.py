@@ -0,0 +1,97 @@
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlparse
+
+from django.core.management.base import BaseCommand, CommandError
+
+from notification.realtime import BrokerPublisher
+from notification.versioning import BROADCAST
+
+
+class Command(BaseCommand):
+    help = 'Opens many idle notification streams against a running ASGI server and measures push delivery latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/v1/notifications/stream/')
+        parser.add_argument('--broker', default='tcp://127.0.0.1:7878',
+                            help='Broker the server workers are subscribed to (events are injected here)')
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--events', type=int, default=20)
+        parser.add_argument('--interval', type=float, default=0.5, help='Seconds between events')
+
+    def handle(self, *args, **opts):
+        # Raise `ulimit -n` first when going past ~1000 connections
+        asyncio.run(self._run(opts))
+
+    async def _run(self, opts):
+        url = urlparse(opts['url'])
+        host, port = url.hostname, url.port or 80
+        path = url.path + (f'?{url.query}' if url.query else '')
+
+        latencies = []
+        received = [0] * opts['connections']
+
+        async def client(n, ready):
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+                writer.write(f'GET {path} HTTP/1.0\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n'.encode())
+                await writer.drain()
+                status = await reader.readline()
+                if b' 200 ' not in status:
+                    raise CommandError(f'Stream returned {status!r}')
+            except BaseException as e:
+                # Settle `ready` either way, or gather(readies) waits forever
+                ready.set_exception(e)
+                raise
+            ready.set_result(None)
+            while received[n] < opts['events']:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.startswith(b'data: {'):
+                    payload = json.loads(line[6:])
+                    if 'sent_at' in payload:
+                        latencies.append(time.time() - payload['sent_at'])
+                        received[n] += 1
+            writer.close()
+
+        self.stdout.write(f"Opening {opts['connections']} streams to {opts['url']}...")
+        readies, tasks = [], []
+        loop = asyncio.get_running_loop()
+        for n in range(opts['connections']):
+            ready = loop.create_future()
+            readies.append(ready)
+            tasks.append(asyncio.ensure_future(client(n, ready)))
+        results = await asyncio.gather(*readies, return_exceptions=True)
+        failures = [r for r in results if isinstance(r, BaseException)]
+        if len(failures) == len(results):
+            raise CommandError(f'No stream connected: {failures[0]!r}')
+        if failures:
+            self.stdout.write(self.style.WARNING(f'{len(failures)} streams failed to connect, e.g. {failures[0]!r}'))
+        self.stdout.write(f'{len(results) - len(failures)} streams connected; publishing events.')
+
+        broker = urlparse(opts['broker'])
+        publisher = BrokerPublisher((broker.hostname, broker.port or 7878))
+        for i in range(opts['events']):
+            payload = {'id': f'loadtest-{i}', 'sent_at': time.time()}
+            # Synchronous socket send; fine for a handful of events
+            publisher.send({'audience': BROADCAST, 'data': payload, 'published_at': payload['sent_at']})
+            await asyncio.sleep(opts['interval'])
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=opts['interval'] * 4 + 5)
+        except asyncio.TimeoutError:
+            for task in tasks:
+                task.cancel()
+
+        expected = (opts['connections'] - len(failures)) * opts['events']
+        self.stdout.write(f'Delivered {len(latencies)}/{expected} events')
+        if latencies:
+            latencies.sort()
+            ms = [x * 1000 for x in latencies]
+            p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+            self.stdout.write(self.style.SUCCESS(
+                f'latency p50={statistics.median(ms):.1f} ms  p99={p99:.1f} ms  max={ms[-1]:.1f} ms'
+            ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from notification import jobs
+
+
+class Command(BaseCommand):
+    help = ('Re-runs bulk notification jobs left pending/running by a restarted or crashed worker '
+            '(run after deploys, or from cron)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-after', type=int, default=jobs.STALE_AFTER,
+                            help='Seconds without progress before a job counts as abandoned')
+
+    def handle(self, *args, **opts):
+        claimed = jobs.resume_stale(opts['stale_after'])
+        if not claimed:
+            self.stdout.write('No stale jobs.')
+            return
+        for job_id in claimed:
+            self.stdout.write(f'Resuming job #{job_id}...')
+            jobs.execute(job_id)
+        self.stdout.write(self.style.SUCCESS(f'Resumed {len(claimed)} job(s).'))
@@ -0,0 +1,21 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from notification.broker import RelayBroker
+
+
+class Command(BaseCommand):
+    help = 'Runs the local pub/sub relay that fans notification events out to every ASGI worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=7878)
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"Notification broker listening on {opts['host']}:{opts['port']}")
+        self.stdout.write(f"Set NOTIFICATION_BROKER_URL=tcp://{opts['host']}:{opts['port']} on the web workers.")
+        try:
+            asyncio.run(RelayBroker().serve(opts['host'], opts['port']))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Broker stopped.'))
@@ -1,26 +1,3 @@
-import jwt
-from django.conf import settings
-
-class JWTMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
-        request.user_jwt = None
-
-        auth_header = request.headers.get("Authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            token = auth_header.split(" ")[1]
-            try:
-                payload = jwt.decode(
-                    token,
-                    settings.SECRET_KEY,
-                    algorithms=["HS256"]
-                )
-                request.user_jwt = payload
-            except jwt.ExpiredSignatureError:
-                pass
-            except jwt.InvalidTokenError:
-                pass
-
-        return self.get_response(request)
+# Kept for old imports: the project has a single JWT middleware now, which
+# verifies once per request and caches the verified claims.
+from middleware.jwt_auth import JWTAuthenticationMiddleware as JWTMiddleware  # noqa: F401
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0007_notificationjob_resume'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_id', models.PositiveBigIntegerField()),
+                ('recipient_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('is_broadcast', models.BooleanField(default=False)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_broadcast', 'deleted_at'], name='notif_tomb_broadcast_idx'), models.Index(fields=['recipient_id', 'deleted_at'], name='notif_tomb_recipient_idx')],
+            },
+        ),
+    ]
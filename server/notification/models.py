@@ -35,13 +35,150 @@ class Notification(models.Model):
     is_banner = models.BooleanField(default=False)
     location = models.CharField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
-
+    # Drives the incremental `?since=` sync (new OR changed rows)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset feed: WHERE is_broadcast / recipient ... ORDER BY created_at, id
+            models.Index(fields=['is_broadcast', 'created_at', 'id'], name='notif_broadcast_feed_idx'),
+            models.Index(fields=['recipient', 'created_at', 'id'], name='notif_recipient_feed_idx'),
+            # Delta sync: WHERE ... AND (updated_at, id) > since
+            models.Index(fields=['is_broadcast', 'updated_at', 'id'], name='notif_broadcast_sync_idx'),
+            models.Index(fields=['recipient', 'updated_at', 'id'], name='notif_recipient_sync_idx'),
+        ]
 
     def __str__(self):
         if self.is_broadcast:
             return f"[Broadcast] {self.title}"
         return f"{self.title} → {self.recipient}"
+
+
+
+class NotificationTombstone(models.Model):
+    """
+    A deleted notification, kept for NOTIFICATION_TOMBSTONE_DAYS so a
+    `?since=` sync can tell clients to drop it. Plain ids, no foreign keys:
+    the row (and maybe its recipient) are already gone.
+    """
+    notification_id = models.PositiveBigIntegerField()
+    recipient_id = models.PositiveBigIntegerField(null=True, blank=True)
+    is_broadcast = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_broadcast', 'deleted_at'], name='notif_tomb_broadcast_idx'),
+            models.Index(fields=['recipient_id', 'deleted_at'], name='notif_tomb_recipient_idx'),
+        ]
+
+    def __str__(self):
+        return f"Deleted notification #{self.notification_id}"
+
+
+class FeedVersion(models.Model):
+    """
+    Monotonic version counter per audience ("broadcast" or "user:<id>").
+    Bumped on every notification write; used to build cheap feed ETags.
+    """
+    audience = models.CharField(max_length=64, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.audience} @ {self.version}"
+
+
+class NotificationJob(models.Model):
+    """
+    One admin "send to many" request, fanned out in the background.
+    Clients poll it for progress instead of holding a request open.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='notification_jobs',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True)
+
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20, choices=Notification.TYPE_CHOICES, default='info')
+    is_banner = models.BooleanField(default=False)
+
+    # Either {"recipients": [ids]} or {"filter": {"role": ..., "blood_group": ..., "city": ...}}
+    target = models.JSONField(default=dict)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    # Resume point: recipients are processed in id order, one committed
+    # chunk at a time, so a restarted job skips everyone up to here
+    last_recipient_id = models.PositiveBigIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Touched on every claim and chunk (explicitly: update() skips auto_now);
+    # a pending/running job that stops moving is picked up by
+    # `manage.py resume_notification_jobs`
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Job #{self.pk} {self.status} ({self.processed}/{self.total})"
+
+
+class NotificationReadState(models.Model):
+    """
+    Compact per-user read state.
+
+    Broadcasts are read if their id <= broadcast_hwm (set by "mark all read"),
+    or if a BroadcastReceipt exists for them (sparse, only above the mark).
+    The counters let unread_count be answered without counting Notification.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        related_name='notification_read_state',
+        on_delete=models.CASCADE,
+        primary_key=True)
+
+    broadcast_hwm = models.PositiveBigIntegerField(default=0)
+    broadcasts_read_above_hwm = models.PositiveIntegerField(default=0)
+    personal_unread = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Read state for {self.user_id}"
+
+
+class BroadcastReceipt(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='broadcast_receipts',
+        on_delete=models.CASCADE)
+    notification = models.ForeignKey(
+        Notification,
+        related_name='receipts',
+        on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'notification'], name='unique_broadcast_receipt'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} read {self.notification_id}"
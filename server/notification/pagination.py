@@ -0,0 +1,155 @@
+import base64
+import heapq
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(timestamp, pk):
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Returns (timestamp, pk) or raises ValueError for anything we didn't issue.
+    """
+    padded = cursor + "=" * (-len(cursor) % 4)
+    raw = base64.urlsafe_b64decode(padded.encode()).decode()
+    ts_str, pk_str = raw.rsplit("|", 1)
+    timestamp = parse_datetime(ts_str)
+    if timestamp is None:
+        raise ValueError("bad cursor timestamp")
+    return timestamp, int(pk_str)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination on (timestamp_field, id), newest first.
+
+    Each page is a single range scan on a (…, timestamp_field, id) index:
+    `WHERE (ts, id) < (cursor_ts, cursor_id) ORDER BY ts DESC, id DESC LIMIT n`
+    so page cost doesn't grow with table size the way OFFSET does.
+
+    Existing clients expect a bare list, so paging only kicks in when the
+    request sends `?limit=` or `?cursor=` (unless always_paginate is set).
+    Set unpaged_limit to cap that bare list at its newest N rows.
+
+    Views whose feed is an OR of two audiences can define
+    `get_keyset_branches()` returning one queryset per audience; each branch
+    is seeked on its own index and the pages are merged in Python, instead
+    of letting MySQL index-merge and filesort the whole OR.
+    """
+    timestamp_field = "created_at"
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    always_paginate = False
+    unpaged_limit = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        self.bare = not self.always_paginate and not (
+            self.cursor_query_param in params or self.limit_query_param in params
+        )
+        if self.bare and self.unpaged_limit is None:
+            return None
+
+        self.request = request
+        # A bare list for old clients is just the first page, never the whole table
+        self.limit = self.unpaged_limit if self.bare else self.get_limit(request)
+
+        cursor = None if self.bare else params.get(self.cursor_query_param)
+        position = None
+        if cursor:
+            try:
+                position = decode_cursor(cursor)
+            except (ValueError, UnicodeDecodeError):
+                raise NotFound("Invalid cursor")
+
+        get_branches = getattr(view, "get_keyset_branches", None)
+        branches = get_branches() if get_branches else [queryset]
+
+        # Fetch one extra row to know whether another page exists
+        rows = self._merge([self._seek(qs, position) for qs in branches])
+        self.has_next = len(rows) > self.limit
+        page = rows[:self.limit]
+
+        self.next_cursor = None
+        if self.has_next and page:
+            last = page[-1]
+            self.next_cursor = encode_cursor(getattr(last, self.timestamp_field), last.pk)
+        return page
+
+    def _seek(self, queryset, position):
+        queryset = queryset.order_by(f"-{self.timestamp_field}", "-id")
+        if position is not None:
+            ts, pk = position
+            # (ts, id) < (cursor_ts, cursor_id), spelled so the leading
+            # `ts <= cursor_ts` gives the planner a plain range bound
+            queryset = queryset.filter(
+                Q(**{f"{self.timestamp_field}__lte": ts}),
+                Q(**{f"{self.timestamp_field}__lt": ts}) | Q(id__lt=pk),
+            )
+        return list(queryset[:self.limit + 1])
+
+    def _merge(self, pages):
+        if len(pages) == 1:
+            return pages[0]
+        key = lambda obj: (getattr(obj, self.timestamp_field), obj.pk)
+        rows, seen = [], set()
+        for obj in heapq.merge(*pages, key=key, reverse=True):
+            if obj.pk in seen:
+                continue
+            seen.add(obj.pk)
+            rows.append(obj)
+            if len(rows) > self.limit:
+                break
+        return rows
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if limit <= 0:
+            return self.page_size
+        return min(limit, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        if self.bare:
+            return Response(data)
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("next_cursor", self.next_cursor),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "next_cursor": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+
+class NotificationFeedPagination(KeysetPagination):
+    page_size = 20
+    max_page_size = 100
@@ -2,7 +2,12 @@ from rest_framework.permissions import BasePermission
 
 class IsAdminRole(BasePermission):
     def has_permission(self, request, view):
-        return (
-            request.user_jwt
-            and request.user_jwt.get("role") == "admin"
+        # request.user is the JWT principal: role / is_active are checked
+        # against the users table, not the token's (possibly stale) claims
+        user = request.user
+        return bool(
+            user
+            and user.is_authenticated
+            and user.is_active
+            and user.role == "admin"
         )
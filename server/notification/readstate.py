@@ -0,0 +1,166 @@
+import bisect
+import threading
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BroadcastReceipt, FeedVersion, Notification, NotificationReadState
+from . import versioning
+
+
+class BroadcastIds:
+    """
+    Sorted ids of every broadcast, cached per process and reloaded only when
+    the broadcast feed version moves. Thousands of ints; answering "how many
+    broadcasts are newer than X" is then a bisect instead of a COUNT.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._ids = []
+
+    def _current(self):
+        version = (
+            FeedVersion.objects.filter(audience=versioning.BROADCAST)
+            .values_list("version", flat=True).first()
+        ) or 0
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._ids = sorted(
+                        Notification.objects.filter(is_broadcast=True).values_list("id", flat=True)
+                    )
+                    self._version = version
+        return self._ids
+
+    def count_above(self, hwm):
+        ids = self._current()
+        return len(ids) - bisect.bisect_right(ids, hwm)
+
+    def latest(self):
+        ids = self._current()
+        return ids[-1] if ids else 0
+
+
+broadcast_ids = BroadcastIds()
+
+
+def get_state(user_id):
+    state = NotificationReadState.objects.filter(user_id=user_id).first()
+    if state is not None:
+        return state
+    # First touch for this user: seed the personal counter once
+    unread = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+    try:
+        with transaction.atomic():
+            return NotificationReadState.objects.create(user_id=user_id, personal_unread=unread)
+    except IntegrityError:
+        return NotificationReadState.objects.get(user_id=user_id)
+
+
+def unread_counts(user_id):
+    state = get_state(user_id)
+    broadcast = max(0, broadcast_ids.count_above(state.broadcast_hwm) - state.broadcasts_read_above_hwm)
+    return {
+        "unread": state.personal_unread + broadcast,
+        "personal": state.personal_unread,
+        "broadcast": broadcast,
+    }
+
+
+def mark_broadcast_read(user_id, notification):
+    state = get_state(user_id)
+    if notification.id <= state.broadcast_hwm:
+        return False
+    try:
+        with transaction.atomic():
+            BroadcastReceipt.objects.create(user_id=user_id, notification=notification)
+            NotificationReadState.objects.filter(user_id=user_id).update(
+                broadcasts_read_above_hwm=F("broadcasts_read_above_hwm") + 1
+            )
+    except IntegrityError:
+        return False  # already read
+    versioning.bump(versioning.user_audience(user_id))
+    return True
+
+
+def mark_personal_read(notification):
+    if notification.is_read:
+        return False
+    with transaction.atomic():
+        notification.is_read = True
+        notification.save(update_fields=["is_read", "updated_at"])
+        personal_unread_changed([notification.recipient_id], -1)
+    return True
+
+
+def mark_all_read(user_id):
+    get_state(user_id)
+    with transaction.atomic():
+        # update() skips auto_now; delta sync needs these rows to look changed
+        Notification.objects.filter(recipient_id=user_id, is_read=False).update(
+            is_read=True, updated_at=timezone.now()
+        )
+        BroadcastReceipt.objects.filter(user_id=user_id).delete()
+        NotificationReadState.objects.filter(user_id=user_id).update(
+            broadcast_hwm=broadcast_ids.latest(),
+            broadcasts_read_above_hwm=0,
+            personal_unread=0,
+        )
+        versioning.bump(versioning.user_audience(user_id))
+
+
+def personal_unread_changed(user_ids, delta):
+    """
+    Keep the denormalized counter in step with personal notification writes.
+    Users without a state row are skipped; it's seeded from the DB on first read.
+    """
+    qs = NotificationReadState.objects.filter(user_id__in=list(user_ids))
+    if delta < 0:
+        qs = qs.filter(personal_unread__gte=-delta)
+    qs.update(personal_unread=F("personal_unread") + delta)
+
+
+def broadcast_deleted(notification):
+    """Receipts for it are about to cascade away; keep the counters honest."""
+    readers = BroadcastReceipt.objects.filter(notification=notification).values("user_id")
+    NotificationReadState.objects.filter(
+        user_id__in=readers, broadcasts_read_above_hwm__gt=0
+    ).update(broadcasts_read_above_hwm=F("broadcasts_read_above_hwm") - 1)
+
+
+class ReadStateView:
+    """
+    Lazily-loaded read state for rendering `is_read` on broadcasts in a feed.
+    Costs two small queries, and only if a broadcast is actually serialized.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._loaded = False
+
+    def _load(self):
+        state = NotificationReadState.objects.filter(user_id=self.user_id).first()
+        self.hwm = state.broadcast_hwm if state else 0
+        self.receipts = set(
+            BroadcastReceipt.objects.filter(user_id=self.user_id, notification_id__gt=self.hwm)
+            .values_list("notification_id", flat=True)
+        )
+        self._loaded = True
+
+    def has_read(self, notification_id):
+        if not self._loaded:
+            self._load()
+        return notification_id <= self.hwm or notification_id in self.receipts
+
+    def summary(self):
+        """
+        Which broadcasts are read, for delta sync: everything up to
+        `read_up_to` plus `read_ids`. Broadcast rows are shared, so reading
+        one doesn't change its updated_at; clients apply this instead.
+        """
+        if not self._loaded:
+            self._load()
+        return {"read_up_to": self.hwm, "read_ids": sorted(self.receipts)}
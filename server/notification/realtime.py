@@ -0,0 +1,209 @@
+import asyncio
+import json
+import logging
+import queue
+import socket
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 64
+PUBLISH_QUEUE_SIZE = 1000
+
+
+# =====================================================
+# 📡 IN-PROCESS FAN-OUT
+# =====================================================
+
+class Hub:
+    """
+    Per-process registry of open notification streams, keyed by audience
+    ("broadcast" or "user:<id>"). Lives on the ASGI event loop; other
+    threads hand events over with dispatch_threadsafe().
+    """
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._loop = None
+        self.dropped = 0
+
+    @property
+    def connections(self):
+        return len(set().union(*self._subscribers.values())) if self._subscribers else 0
+
+    def subscribe(self, audiences):
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        queue.audiences = tuple(audiences)
+        for audience in queue.audiences:
+            self._subscribers[audience].add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        for audience in queue.audiences:
+            subs = self._subscribers.get(audience)
+            if subs is not None:
+                subs.discard(queue)
+                if not subs:
+                    del self._subscribers[audience]
+
+    def dispatch(self, event):
+        """Must run on the hub's loop."""
+        item = ("notification", event["data"], event["data"].get("id"))
+        for queue in tuple(self._subscribers.get(event["audience"], ())):
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                # Client isn't reading; cut it off rather than buffer forever.
+                # It reconnects and catches up via ?since= on the REST feed.
+                self.dropped += 1
+                self.unsubscribe(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def dispatch_threadsafe(self, event):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return  # nobody has ever subscribed in this process
+        loop.call_soon_threadsafe(self.dispatch, event)
+
+
+hub = Hub()
+
+
+# =====================================================
+# 🔁 LOCAL STAND-IN BROKER (multi-worker fan-out)
+# =====================================================
+#
+# With several workers, an event published in worker A must reach streams
+# held by worker B. When NOTIFICATION_BROKER_URL is set, publishers send
+# events to a tiny line-oriented relay (`manage.py run_notification_broker`)
+# and every ASGI worker keeps one subscriber connection to it. Without it,
+# fan-out stays in-process.
+
+def broker_address():
+    url = getattr(settings, "NOTIFICATION_BROKER_URL", None)
+    if not url:
+        return None
+    parsed = urlparse(url)
+    return parsed.hostname or "127.0.0.1", parsed.port or 7878
+
+
+class BrokerPublisher:
+    """
+    send() writes synchronously (2 s socket timeout). Request code uses
+    enqueue() instead, so a slow or dead broker never holds up the
+    on_commit that published: a daemon thread drains a bounded queue, and
+    events are dropped (clients catch up via ?since=) once it's full.
+    """
+
+    def __init__(self, address, queue_size=PUBLISH_QUEUE_SIZE):
+        self.address = address
+        self._sock = None
+        self._lock = threading.Lock()
+        self._pending = queue.Queue(maxsize=queue_size)
+        self._worker = None
+        self.dropped = 0
+
+    def enqueue(self, payload):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._drain, name="notification-publish", daemon=True)
+                    self._worker.start()
+        try:
+            self._pending.put_nowait(payload)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Notification publish queue full, dropping event")
+
+    def _drain(self):
+        while True:
+            self.send(self._pending.get())
+
+    def send(self, payload):
+        line = json.dumps(payload, separators=(",", ":"), default=str).encode() + b"\n"
+        with self._lock:
+            for _ in range(2):  # one reconnect attempt
+                try:
+                    if self._sock is None:
+                        self._sock = socket.create_connection(self.address, timeout=2)
+                        self._sock.sendall(b"PUB\n")
+                    self._sock.sendall(line)
+                    return True
+                except OSError:
+                    self._close()
+        logger.warning("Notification broker unreachable at %s:%s", *self.address)
+        return False
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+
+
+_publisher = None
+_subscriber_task = None
+
+
+async def ensure_broker_subscription():
+    """Start (once per process) the task relaying broker events into the hub."""
+    global _subscriber_task
+    address = broker_address()
+    if address is None or (_subscriber_task and not _subscriber_task.done()):
+        return
+    _subscriber_task = asyncio.ensure_future(_relay_from_broker(address))
+
+
+async def _relay_from_broker(address):
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(*address)
+            writer.write(b"SUB\n")
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    hub.dispatch(json.loads(line))
+                except (ValueError, KeyError):
+                    logger.warning("Dropping malformed broker event")
+        except OSError:
+            logger.warning("Lost notification broker at %s:%s, retrying", *address)
+        await asyncio.sleep(1)
+
+
+# =====================================================
+# 🚀 PUBLISH (called from sync Django code)
+# =====================================================
+
+def publish(audience, data):
+    global _publisher
+    event = {"audience": audience, "data": data, "published_at": time.time()}
+
+    address = broker_address()
+    if address is None:
+        hub.dispatch_threadsafe(event)
+        return
+
+    if _publisher is None:
+        _publisher = BrokerPublisher(address)
+    _publisher.enqueue(event)
+
+
+def publish_notification(notification):
+    from .serializers import NotificationSerializer
+    from .versioning import audience_for
+
+    publish(audience_for(notification), NotificationSerializer(notification).data)
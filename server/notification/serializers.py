@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model  # <--- FIXED IMPORT
-from .models import Notification
+from .models import Notification, NotificationJob
 
 # Get the correct user model
 User = get_user_model() 
@@ -10,8 +10,24 @@ class NotificationSerializer(serializers.ModelSerializer):
         model = Notification
         fields = '__all__'
 
+    def to_representation(self, instance):
+        ret = super().to_representation(instance)
+        # Broadcast rows are shared, so per-user read state comes from the view
+        read_state = self.context.get('read_state')
+        if instance.is_broadcast and read_state is not None:
+            ret['is_read'] = read_state.has_read(instance.id)
+        return ret
+
 # Simple serializer for the User dropdown
 class UserMinimalSerializer(serializers.ModelSerializer):
     class Meta:
         model = User  # <--- Now uses the correct Custom User
-        fields = ['id', 'username', 'email']
\ No newline at end of file
+        fields = ['id', 'username', 'email']
+
+class NotificationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = NotificationJob
+        fields = [
+            'id', 'title', 'notification_type', 'is_banner', 'target',
+            'status', 'total', 'processed', 'error', 'created_at', 'finished_at',
+        ]
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Notification, NotificationTombstone
+from . import readstate, realtime, versioning
+
+
+@receiver(post_save, sender=Notification)
+def notification_saved(sender, instance, created, **kwargs):
+    versioning.bump(versioning.audience_for(instance))
+    if created:
+        if instance.recipient_id and not instance.is_read:
+            readstate.personal_unread_changed([instance.recipient_id], +1)
+        # Push only once the row is really there for the REST feed too
+        transaction.on_commit(lambda: realtime.publish_notification(instance))
+
+
+@receiver(pre_delete, sender=Notification)
+def notification_deleting(sender, instance, **kwargs):
+    if instance.is_broadcast:
+        readstate.broadcast_deleted(instance)
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    versioning.bump(versioning.audience_for(instance))
+    # Delta syncs learn about deletions from these; old ones are pruned as
+    # new ones arrive (deletes are rare admin actions)
+    NotificationTombstone.objects.create(
+        notification_id=instance.pk,
+        recipient_id=instance.recipient_id,
+        is_broadcast=instance.is_broadcast,
+    )
+    keep_days = getattr(settings, "NOTIFICATION_TOMBSTONE_DAYS", 30)
+    NotificationTombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=keep_days)).delete()
+    if instance.recipient_id and not instance.is_read:
+        readstate.personal_unread_changed([instance.recipient_id], -1)
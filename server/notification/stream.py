@@ -0,0 +1,40 @@
+from django.conf import settings
+
+from disaster_management import streaming
+
+from .realtime import ensure_broker_subscription, hub
+from .versioning import BROADCAST, user_audience
+
+STREAM_PATH = "/api/v1/notifications/stream/"
+
+
+async def notification_stream(scope, receive, send):
+    """
+    GET /api/v1/notifications/stream/  (text/event-stream)
+
+    Pushes each new broadcast, plus the caller's personal notifications when
+    a ?ticket= (POST notifications/stream-ticket/) or bearer header is
+    supplied, as `event: notification` with the same JSON shape
+    as the REST feed.
+    """
+    if scope["method"] != "GET":
+        await streaming.send_json_error(send, 405, "Method not allowed")
+        return
+
+    try:
+        user_id = streaming.stream_user_id(scope)
+    except streaming.StreamAuthError as e:
+        await streaming.send_json_error(send, 401, str(e))
+        return
+
+    audiences = [BROADCAST]
+    if user_id is not None:
+        audiences.append(user_audience(user_id))
+
+    await ensure_broker_subscription()
+    queue = hub.subscribe(audiences)
+    try:
+        await streaming.stream(receive, send, queue,
+                               keepalive=getattr(settings, "NOTIFICATION_STREAM_KEEPALIVE", 25))
+    finally:
+        hub.unsubscribe(queue)
@@ -1,3 +1,318 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from disaster_management import streaming
+
+from . import jobs, versioning
+from .cache import banner_cache
+from .models import Notification, NotificationJob
+
+
+def bearer(user_id, role='people'):
+    token = jwt.encode(
+        {'user_id': user_id, 'role': role, 'exp': int(time.time()) + 3600},
+        settings.JWT_SECRET,
+        algorithm=settings.JWT_ALGORITHM,
+    )
+    return f'Bearer {token}'
+
+
+def scope(query='', auth=None):
+    headers = [(b'authorization', auth.encode())] if auth else []
+    return {'type': 'http', 'method': 'GET', 'query_string': query.encode(), 'headers': headers}
+
+
+class StreamTicketTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_ticket_opens_the_callers_stream(self):
+        self.assertEqual(self.client.post('/api/v1/notifications/stream-ticket/').status_code, 401)
+
+        body = self.client.post('/api/v1/notifications/stream-ticket/', HTTP_AUTHORIZATION=bearer(7)).json()
+        self.assertEqual(body['expires_in'], streaming.ticket_ttl())
+        self.assertEqual(streaming.stream_user_id(scope(f"ticket={body['ticket']}")), 7)
+        self.assertEqual(streaming.stream_user_id(scope(auth=bearer(8))), 8)
+        self.assertIsNone(streaming.stream_user_id(scope()))
+
+    def test_forged_expired_and_raw_jwt_tickets_are_refused(self):
+        ticket = streaming.issue_ticket(7)
+        with self.assertRaises(streaming.StreamAuthError):
+            streaming.stream_user_id(scope(f'ticket={ticket[:-2]}xx'))
+        with self.assertRaises(streaming.StreamAuthError):
+            streaming.stream_user_id(scope(f"ticket={bearer(7).split(' ')[1]}"))
+        with override_settings(STREAM_TICKET_TTL=-1), self.assertRaises(streaming.StreamAuthError):
+            streaming.stream_user_id(scope(f'ticket={ticket}'))
+        # The old ?token= is simply ignored
+        self.assertIsNone(streaming.stream_user_id(scope(f"token={bearer(7).split(' ')[1]}")))
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='f@example.com', username='f', full_name='F')
+        other = User.objects.create_user(email='o@example.com', username='o', full_name='O')
+        self.client = APIClient(HTTP_AUTHORIZATION=bearer(self.user.pk))
+        self.visible = []
+        for n in range(7):
+            self.visible.append(Notification.objects.create(is_broadcast=True, title=f'All {n}', message='-').pk)
+            self.visible.append(Notification.objects.create(recipient=self.user, title=f'Mine {n}', message='-').pk)
+            Notification.objects.create(recipient=other, title=f'Theirs {n}', message='-')
+
+    def test_cursor_pages_cover_the_feed_once_newest_first(self):
+        seen, url = [], '/api/v1/notifications/?limit=4'
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page['results']), 4)
+            seen += [n['id'] for n in page['results']]
+            url = page['next']
+        self.assertEqual(seen, sorted(self.visible, reverse=True))
+
+        # No ?limit=/?cursor=: the bare list existing clients expect
+        self.assertEqual(len(self.client.get('/api/v1/notifications/').json()), len(self.visible))
+        self.assertEqual(self.client.get('/api/v1/notifications/?cursor=nope').status_code, 404)
+
+    def test_etag_revalidation(self):
+        first = self.client.get('/api/v1/notifications/')
+        etag = first['ETag']
+        self.assertEqual(self.client.get('/api/v1/notifications/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Another user's feed doesn't share the tag, and a write moves it
+        self.assertNotEqual(APIClient().get('/api/v1/notifications/')['ETag'], etag)
+        Notification.objects.create(recipient=self.user, title='New', message='-')
+        again = self.client.get('/api/v1/notifications/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 200)
+        self.assertNotEqual(again['ETag'], etag)
+
+
+@override_settings(NOTIFICATION_SYNC_SETTLE=0)
+class ReadStateSyncTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='r@example.com', username='r', full_name='R')
+        self.client = APIClient(HTTP_AUTHORIZATION=bearer(self.user.pk))
+        self.personal = Notification.objects.create(recipient=self.user, title='Yours', message='-')
+        self.broadcasts = [
+            Notification.objects.create(is_broadcast=True, title=f'All {n}', message='-') for n in range(3)
+        ]
+
+    def sync(self, since):
+        return self.client.get('/api/v1/notifications/', {'since': since}).json()
+
+    def test_mark_all_read_shows_up_in_delta_sync(self):
+        first = self.sync('0')
+        self.assertEqual(len(first['results']), 4)
+        self.assertEqual(first['broadcast_reads'], {'read_up_to': 0, 'read_ids': []})
+
+        self.client.post(f'/api/v1/notifications/{self.broadcasts[1].pk}/mark_read/')
+        self.assertEqual(self.sync(first['since'])['broadcast_reads']['read_ids'], [self.broadcasts[1].pk])
+
+        self.client.post('/api/v1/notifications/mark_all_read/')
+        delta = self.sync(first['since'])
+        self.assertEqual([(n['id'], n['is_read']) for n in delta['results']], [(self.personal.pk, True)])
+        self.assertEqual(delta['broadcast_reads'], {'read_up_to': self.broadcasts[-1].pk, 'read_ids': []})
+        self.assertEqual(self.client.get('/api/v1/notifications/unread_count/').json()['unread'], 0)
+
+    def test_anonymous_sync_has_no_read_state(self):
+        self.assertNotIn('broadcast_reads', APIClient().get('/api/v1/notifications/', {'since': '0'}).json())
+
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='d@example.com', username='d', full_name='D')
+        self.client = APIClient(HTTP_AUTHORIZATION=bearer(self.user.pk))
+        self.rows = [Notification.objects.create(recipient=self.user, title=f'N{n}', message='-') for n in range(3)]
+        # Old enough to have settled
+        Notification.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+
+    def sync(self, since):
+        return self.client.get('/api/v1/notifications/', {'since': since}).json()
+
+    def test_deletions_come_back_as_tombstones(self):
+        first = self.sync('0')
+        self.assertEqual(first['deleted'], [])
+        other = get_user_model().objects.create_user(email='o@example.com', username='o', full_name='O')
+        theirs = Notification.objects.create(recipient=other, title='Not yours', message='-')
+
+        gone = self.rows[1].pk
+        self.rows[1].delete()
+        theirs.delete()
+        delta = self.sync(first['since'])
+        self.assertEqual(delta['results'], [])
+        self.assertEqual(delta['deleted'], [gone])
+        self.assertEqual(self.sync('0')['deleted'], [])
+
+    def test_cursor_waits_for_slow_commits(self):
+        first = self.sync('0')
+        self.assertEqual(len(first['results']), 3)
+
+        fresh = Notification.objects.create(recipient=self.user, title='Fresh', message='-')
+        delta = self.sync(first['since'])
+        self.assertEqual([n['id'] for n in delta['results']], [fresh.pk])
+
+        # A transaction that stamped its row before `fresh` but committed after
+        # it: still ahead of the cursor, because `fresh` hasn't settled yet
+        late = Notification.objects.create(recipient=self.user, title='Late', message='-')
+        Notification.objects.filter(pk=late.pk).update(updated_at=fresh.updated_at - timedelta(milliseconds=1))
+        again = self.sync(delta['since'])
+        self.assertEqual([n['id'] for n in again['results']], [late.pk, fresh.pk])
+
+        with override_settings(NOTIFICATION_SYNC_SETTLE=0):
+            settled = self.sync(again['since'])['since']
+        self.assertEqual(self.sync(settled)['results'], [])
+
+    def test_expired_token_asks_for_a_full_resync(self):
+        since = self.sync('0')['since']
+        self.assertEqual(self.client.get('/api/v1/notifications/', {'since': since}).status_code, 200)
+        with override_settings(NOTIFICATION_TOMBSTONE_DAYS=0):
+            self.assertEqual(self.client.get('/api/v1/notifications/', {'since': since}).status_code, 410)
+
+
+class BannerCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        banner_cache.clear_local()
+        versioning.clear_recent()
+        self.user = get_user_model().objects.create_user(email='b@example.com', username='b', full_name='B')
+
+    def test_warm_lookup_runs_no_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(is_broadcast=True, is_banner=True, title='Storm', message='-')
+        banner_cache.banner_for(self.user.pk)
+        with self.assertNumQueries(0):
+            data, _ = banner_cache.banner_for(self.user.pk)
+        self.assertEqual(data['title'], 'Storm')
+
+    def test_own_writes_are_seen_at_once(self):
+        self.assertIsNone(banner_cache.banner_for(self.user.pk)[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(recipient=self.user, is_banner=True, title='Evacuate', message='-')
+        self.assertEqual(banner_cache.banner_for(self.user.pk)[0]['title'], 'Evacuate')
+
+    def test_other_workers_writes_are_seen_within_the_version_ttl(self):
+        self.assertEqual(banner_cache.banner_for(self.user.pk)[0], None)
+
+        # What another worker does: rows + a version bump, nothing that
+        # reaches this process
+        Notification.objects.bulk_create([
+            Notification(recipient=self.user, is_banner=True, title='Evacuate', message='-'),
+        ])
+        versioning.bump(versioning.user_audience(self.user.pk))  # its on_commit never runs here
+        self.assertIsNone(banner_cache.banner_for(self.user.pk)[0])
+
+        later = time.monotonic() + 3
+        with mock.patch('notification.versioning.time.monotonic', return_value=later), \
+                mock.patch('notification.cache.time.monotonic', return_value=later):
+            self.assertEqual(banner_cache.banner_for(self.user.pk)[0]['title'], 'Evacuate')
+            self.assertIsNone(banner_cache.banner_for(None)[0])
+
+
+class BulkSendTests(TransactionTestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_user(email='ops@example.com', username='ops', full_name='Ops', role='admin')
+        self.users = [
+            User.objects.create_user(email=f'k{n}@example.com', username=f'k{n}', full_name=f'K {n}',
+                                     blood_group='O+' if n % 2 else 'A-').pk
+            for n in range(4)
+        ]
+        self.client = APIClient(HTTP_AUTHORIZATION=bearer(self.admin.pk, 'admin'))
+        # Jobs are run by hand below, not by the executor
+        patcher = mock.patch('notification.jobs.enqueue')
+        self.enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def bulk(self, **target):
+        return self.client.post('/api/v1/admin/notifications/bulk/',
+                                {'title': 'Flood', 'message': 'Move uphill', **target}, format='json')
+
+    def test_bad_targets_are_rejected(self):
+        missing = max(self.users) + 100
+        cases = [
+            ({}, 'either recipients or filter is required'),
+            ({'recipients': []}, 'recipients must be a non-empty list of user ids'),
+            ({'recipients': [self.users[0], True]}, 'recipients must be a list of user ids'),
+            ({'recipients': [self.users[0], 'x']}, 'recipients must be a list of user ids'),
+            ({'recipients': [self.users[0], missing]}, f'unknown recipients: {missing}'),
+            ({'filter': {'planet': 'Mars'}}, 'unsupported filter keys: planet'),
+            ({'filter': {'role': ['admin', 'people']}}, 'filter values must be strings or numbers: role'),
+            ({'filter': {'city': {'contains': 'Dha'}}}, 'filter values must be strings or numbers: city'),
+        ]
+        for target, error in cases:
+            response = self.bulk(**target)
+            self.assertEqual((response.status_code, response.json()), (400, {'error': error}), target)
+        self.assertEqual(self.client.post('/api/v1/admin/notifications/bulk/', {'title': 'Flood'},
+                                          format='json').status_code, 400)
+        self.assertEqual(NotificationJob.objects.count(), 0)
+        self.enqueue.assert_not_called()
+
+    def test_unknown_ids_are_reported_up_to_a_limit(self):
+        extra = list(range(max(self.users) + 1, max(self.users) + 1 + jobs.MAX_REPORTED_IDS + 5))
+        error = self.bulk(recipients=self.users + extra).json()['error']
+        self.assertTrue(error.endswith('(and 5 more)'), error)
+
+    def test_job_progress_is_reported(self):
+        accepted = self.bulk(filter={'blood_group': 'O+'})
+        self.assertEqual(accepted.status_code, 202)
+        job_id = accepted.json()['job_id']
+        self.enqueue.assert_called_once()
+
+        url = f'/api/v1/admin/notifications/jobs/{job_id}/'
+        pending = self.client.get(url).json()
+        self.assertEqual((pending['status'], pending['processed']), ('pending', 0))
+        self.assertEqual(pending['target'], {'filter': {'blood_group': 'O+'}})
+
+        with mock.patch('notification.jobs.realtime.publish'):
+            jobs.run(job_id)
+        done = self.client.get(url).json()
+        self.assertEqual((done['status'], done['processed'], done['total']), ('done', 2, 2))
+        self.assertIsNotNone(done['finished_at'])
+
+        self.assertEqual(self.client.get('/api/v1/admin/notifications/jobs/999999/').status_code, 404)
+        people = APIClient(HTTP_AUTHORIZATION=bearer(self.users[0]))
+        self.assertEqual(people.get(url).status_code, 403)
+
+
+class StaleJobTests(TransactionTestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.users = [
+            User.objects.create_user(email=f'j{n}@example.com', username=f'j{n}', full_name=f'J {n}').pk
+            for n in range(3)
+        ]
+
+    def test_abandoned_job_resumes_after_its_last_committed_chunk(self):
+        # The worker died after delivering to the first user
+        job = NotificationJob.objects.create(
+            title='Flood', message='-', target={'recipients': self.users}, status='running',
+            processed=1, last_recipient_id=self.users[0],
+        )
+        Notification.objects.create(recipient_id=self.users[0], title='Flood', message='-')
+        NotificationJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        NotificationJob.objects.create(title='New', message='-', target={'recipients': self.users})
+
+        self.assertEqual(jobs.resume_stale(), [job.pk])
+        self.assertEqual(jobs.resume_stale(), [])  # claimed, and the new job isn't stale yet
+        with mock.patch('notification.jobs.realtime.publish') as publish:
+            jobs.execute(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.total), ('done', 3, 3))
+        flood = Notification.objects.filter(title='Flood')
+        self.assertEqual(sorted(flood.values_list('recipient_id', flat=True)), self.users)
+        pushed = {call.args[1]['recipient']: call.args[1]['id'] for call in publish.call_args_list}
+        self.assertEqual(pushed, dict(flood.exclude(recipient_id=self.users[0]).values_list('recipient_id', 'id')))
+
+    def test_a_claimed_job_is_not_run_twice(self):
+        job = NotificationJob.objects.create(title='Heat', message='-', target={'recipients': self.users})
+        self.assertEqual(jobs.resume_stale(stale_after=0), [job.pk])
+        jobs.run(job.pk)  # the original executor submission arrives late
+        self.assertEqual(Notification.objects.filter(title='Heat').count(), 0)
@@ -0,0 +1,124 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import FeedVersion
+
+# Audience keys for the per-audience version counters. Every write to a
+# notification bumps the counter of whoever can see it; feed/banner ETags are
+# built from these counters instead of from the queryset itself.
+BROADCAST = "broadcast"
+
+# Per-process memo behind recent_versions_for(); bounded, cleared when full
+RECENT_SIZE = 10000
+_recent = {}
+_recent_lock = threading.Lock()
+
+
+def user_audience(user_id):
+    return f"user:{int(user_id)}"
+
+
+def audience_for(notification):
+    if notification.is_broadcast or notification.recipient_id is None:
+        return BROADCAST
+    return user_audience(notification.recipient_id)
+
+
+def bump(audience):
+    transaction.on_commit(lambda: _forget([audience]))
+    updated = FeedVersion.objects.filter(audience=audience).update(version=F("version") + 1)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            FeedVersion.objects.create(audience=audience, version=1)
+    except IntegrityError:
+        # Someone created the row between our UPDATE and INSERT
+        FeedVersion.objects.filter(audience=audience).update(version=F("version") + 1)
+
+
+def bump_many(audiences):
+    """
+    Bump a batch of audiences with one UPDATE plus one INSERT for the ones
+    that don't have a counter yet (used by the bulk send path).
+    """
+    audiences = set(audiences)
+    if not audiences:
+        return
+    transaction.on_commit(lambda: _forget(audiences))
+    existing = set(
+        FeedVersion.objects.filter(audience__in=audiences).values_list("audience", flat=True)
+    )
+    FeedVersion.objects.filter(audience__in=existing).update(version=F("version") + 1)
+    missing = audiences - existing
+    if missing:
+        FeedVersion.objects.bulk_create(
+            [FeedVersion(audience=a, version=1) for a in missing],
+            ignore_conflicts=True,
+        )
+
+
+def versions_for(user_id=None):
+    """
+    {audience: version} for the broadcast audience (and the user's, if
+    given), 0 for audiences never written to. One primary-key lookup.
+    """
+    audiences = [BROADCAST]
+    if user_id is not None:
+        audiences.append(user_audience(user_id))
+    versions = dict(
+        FeedVersion.objects.filter(audience__in=audiences).values_list("audience", "version")
+    )
+    return {audience: versions.get(audience, 0) for audience in audiences}
+
+
+def recent_versions_for(user_id=None):
+    """
+    versions_for(), remembered in this process for NOTIFICATION_VERSION_TTL
+    seconds (default 2), so hot read paths skip the query in steady state.
+    This process's own bumps drop their entries as they commit; another
+    process's bumps show up once the entry expires.
+    """
+    audiences = [BROADCAST]
+    if user_id is not None:
+        audiences.append(user_audience(user_id))
+    now = time.monotonic()
+    with _recent_lock:
+        cached = {a: _recent.get(a) for a in audiences}
+    if all(entry and entry[0] > now for entry in cached.values()):
+        return {a: entry[1] for a, entry in cached.items()}
+
+    versions = versions_for(user_id)
+    expires = now + getattr(settings, "NOTIFICATION_VERSION_TTL", 2)
+    with _recent_lock:
+        if len(_recent) >= RECENT_SIZE:
+            _recent.clear()
+        _recent.update((a, (expires, v)) for a, v in versions.items())
+    return versions
+
+
+def _forget(audiences):
+    with _recent_lock:
+        for audience in audiences:
+            _recent.pop(audience, None)
+
+
+def clear_recent():
+    with _recent_lock:
+        _recent.clear()
+
+
+def feed_etag(user_id=None):
+    """
+    Strong ETag for the feed/banner as seen by `user_id` (None = public).
+    One primary-key lookup, no matter how big the feed is.
+    """
+    versions = versions_for(user_id)
+    parts = [f"b{versions[BROADCAST]}"]
+    if user_id is not None:
+        parts.append(f"u{user_id}.{versions[user_audience(user_id)]}")
+    return '"' + "-".join(parts) + '"'
@@ -3,16 +3,51 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework.serializers import ModelSerializer
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.db.models import Q
-
-from .models import Notification
-from .serializers import NotificationSerializer
+from django.utils import timezone
+from django.utils.http import parse_etags
+
+from disaster_management import streaming
+from users.filters import filter_users, search_branches, search_term
+from users.pagination import UserDropdownPagination
+
+from .models import Notification, NotificationJob, NotificationTombstone
+from .serializers import NotificationSerializer, NotificationJobSerializer
+from . import jobs, readstate
+from .cache import banner_cache
+from .pagination import NotificationFeedPagination, encode_cursor, decode_cursor
 from .permissions import IsAdminRole
+from .versioning import feed_etag
 
 User = get_user_model()
 
+SYNC_PAGE_SIZE = 100
+
+
+def _not_modified(request, etag):
+    """
+    304 response if the client's If-None-Match already covers `etag`.
+    """
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return None
+    tags = parse_etags(header)
+    if "*" in tags or etag in tags:
+        return _with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+    return None
+
+
+def _with_etag(response, etag):
+    response["ETag"] = etag
+    response["Vary"] = "Authorization"
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
 
 # =====================================================
 # 🔔 PUBLIC + AUTHENTICATED NOTIFICATIONS (JWT BASED)
@@ -21,11 +56,10 @@ User = get_user_model()
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [AllowAny]
+    pagination_class = NotificationFeedPagination
 
     def get_queryset(self):
         jwt_user = getattr(self.request, "user_jwt", None)
-        print("VIEW USER:", getattr(self.request, "user_jwt", None))
-
 
         # ✅ AUTHENTICATED USER
         if jwt_user:
@@ -40,27 +74,133 @@ class NotificationViewSet(viewsets.ModelViewSet):
             notification_type__in=["alert", "warning", "info"]
         ).order_by("-created_at")
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        jwt_user = getattr(self.request, "user_jwt", None)
+        if jwt_user:
+            context["read_state"] = readstate.ReadStateView(jwt_user["user_id"])
+        return context
+
+    def get_keyset_branches(self):
+        """
+        Split the authenticated feed into its two audiences so the paginator
+        can seek each one on its own index (broadcast / recipient).
+        """
+        jwt_user = getattr(self.request, "user_jwt", None)
+        if not jwt_user:
+            return [self.get_queryset()]
+        return [
+            Notification.objects.filter(is_broadcast=True),
+            Notification.objects.filter(recipient_id=jwt_user["user_id"]),
+        ]
+
+    def _etag(self):
+        jwt_user = getattr(self.request, "user_jwt", None)
+        return feed_etag(jwt_user["user_id"] if jwt_user else None)
+
+    def list(self, request, *args, **kwargs):
+        etag = self._etag()
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+
+        if "since" in request.query_params:
+            response = self._sync(request.query_params["since"])
+        else:
+            response = super().list(request, *args, **kwargs)
+        return _with_etag(response, etag)
+
+    def _sync(self, since):
+        """
+        Delta mode: rows created or changed after the `since` token, oldest
+        first, plus the ids `deleted` since then. An empty/"0" token starts
+        from the beginning; keep calling with the returned `since` until
+        `has_more` is false.
+
+        updated_at is stamped before commit, so a slow transaction can land
+        behind a cursor that has already moved past it. The returned token
+        therefore never moves past rows younger than NOTIFICATION_SYNC_SETTLE
+        seconds: the next sync reads that window again (clients upsert by id)
+        and picks up anything that committed late.
+
+        Personal read flags travel on the rows (updated_at moves). Broadcast
+        reads are per user and don't touch the shared row, so an
+        authenticated sync also returns the caller's current
+        `broadcast_reads` (see ReadStateView.summary) to apply on top.
+        """
+        branches = self.get_keyset_branches()
+        deleted = []
+        if since not in ("", "0"):
+            try:
+                ts, pk = decode_cursor(since)
+            except (ValueError, UnicodeDecodeError):
+                return Response({"detail": "Invalid since token"}, status=status.HTTP_400_BAD_REQUEST)
+            keep_days = getattr(settings, "NOTIFICATION_TOMBSTONE_DAYS", 30)
+            if ts < timezone.now() - timedelta(days=keep_days):
+                # Deletions that old are pruned; only a full resync is safe
+                return Response(
+                    {"detail": "since token expired, resync from 0"}, status=status.HTTP_410_GONE
+                )
+            branches = [
+                qs.filter(Q(updated_at__gte=ts), Q(updated_at__gt=ts) | Q(id__gt=pk))
+                for qs in branches
+            ]
+            deleted = self._deleted_since(ts)
+
+        rows = sorted(
+            {
+                obj.pk: obj
+                for qs in branches
+                for obj in qs.order_by("updated_at", "id")[:SYNC_PAGE_SIZE + 1]
+            }.values(),
+            key=lambda obj: (obj.updated_at, obj.pk),
+        )
+        has_more = len(rows) > SYNC_PAGE_SIZE
+        rows = rows[:SYNC_PAGE_SIZE]
+
+        settled = timezone.now() - timedelta(seconds=getattr(settings, "NOTIFICATION_SYNC_SETTLE", 5))
+        anchor = next((obj for obj in reversed(rows) if obj.updated_at <= settled), None)
+        if anchor is None and has_more:
+            # A full page of brand-new rows: move on anyway or paging never ends
+            anchor = rows[-1]
+        next_since = encode_cursor(anchor.updated_at, anchor.pk) if anchor else since
+
+        context = self.get_serializer_context()
+        payload = {
+            "since": next_since,
+            "has_more": has_more,
+            "results": self.get_serializer_class()(rows, many=True, context=context).data,
+            "deleted": deleted,
+        }
+        if "read_state" in context:
+            payload["broadcast_reads"] = context["read_state"].summary()
+        return Response(payload)
+
+    def _deleted_since(self, ts):
+        # Same settle window as the rows; repeats are harmless to the client
+        settle = timedelta(seconds=getattr(settings, "NOTIFICATION_SYNC_SETTLE", 5))
+        audience = Q(is_broadcast=True)
+        jwt_user = getattr(self.request, "user_jwt", None)
+        if jwt_user:
+            audience |= Q(recipient_id=jwt_user["user_id"])
+        return list(
+            NotificationTombstone.objects.filter(audience, deleted_at__gte=ts - settle)
+            .order_by("notification_id")
+            .values_list("notification_id", flat=True)
+            .distinct()
+        )
+
     @action(detail=False, methods=["get"])
     def banner(self, request):
+        # Served from the banner cache: no queries in steady state
         jwt_user = getattr(request, "user_jwt", None)
+        data, etag = banner_cache.banner_for(jwt_user["user_id"] if jwt_user else None)
 
-        if jwt_user:
-            banner = Notification.objects.filter(
-                Q(is_broadcast=True) |
-                Q(recipient_id=jwt_user["user_id"]),
-                is_banner=True
-            ).order_by("-created_at").first()
-        else:
-            banner = Notification.objects.filter(
-                is_broadcast=True,
-                is_banner=True
-            ).order_by("-created_at").first()
-
-        if not banner:
-            return Response(None)
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
 
-        serializer = self.get_serializer(banner)
-        return Response(serializer.data)
+        return _with_etag(Response(data), etag)
 
     @action(detail=True, methods=["post"])
     def mark_read(self, request, pk=None):
@@ -74,22 +214,60 @@ class NotificationViewSet(viewsets.ModelViewSet):
 
         notification = self.get_object()
 
-        # 🚫 Broadcast read handled separately (future improvement)
+        # 📣 Broadcasts: per-user receipt above the "mark all" high-water mark
         if notification.is_broadcast:
-            return Response({"status": "broadcast read ignored"})
+            readstate.mark_broadcast_read(jwt_user["user_id"], notification)
+            return Response({"status": "marked as read"})
 
         # 🔒 OWNER CHECK
-        if notification.recipient_id != jwt_user["user_id"]:
+        if str(notification.recipient_id) != str(jwt_user["user_id"]):
             return Response(
                 {"detail": "Forbidden"},
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        notification.is_read = True
-        notification.save()
+        readstate.mark_personal_read(notification)
 
         return Response({"status": "marked as read"})
 
+    @action(detail=False, methods=["post"])
+    def mark_all_read(self, request):
+        jwt_user = getattr(request, "user_jwt", None)
+        if not jwt_user:
+            return Response(
+                {"detail": "Authentication required"},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        readstate.mark_all_read(jwt_user["user_id"])
+        return Response({"status": "all marked as read"})
+
+    @action(detail=False, methods=["get"])
+    def unread_count(self, request):
+        jwt_user = getattr(request, "user_jwt", None)
+        if not jwt_user:
+            return Response(
+                {"detail": "Authentication required"},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        return Response(readstate.unread_counts(jwt_user["user_id"]))
+
+    @action(detail=False, methods=["post"], url_path="stream-ticket")
+    def stream_ticket(self, request):
+        """Short-lived ?ticket= for opening an SSE stream (EventSource can't send headers)."""
+        jwt_user = getattr(request, "user_jwt", None)
+        if not jwt_user:
+            return Response(
+                {"detail": "Authentication required"},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        return Response({
+            "ticket": streaming.issue_ticket(jwt_user["user_id"]),
+            "expires_in": streaming.ticket_ttl(),
+        })
+
 
 # =====================================================
 # 👤 USER DROPDOWN (ADMIN ONLY)
@@ -102,9 +280,21 @@ class UserMinimalSerializer(ModelSerializer):
 
 
 class UserDropdownViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = User.objects.all().only("id", "username", "email", "role")
+    """
+    Recipient picker: ?search= typeahead matches in keyset pages (25 by
+    default), optionally narrowed by ?role= / ?blood_group=. A plain GET
+    stays the bare list the admin console expects, capped at 200 users.
+    """
+    queryset = User.objects.all().only("id", "username", "email", "role", "created_at").order_by("-created_at")
     serializer_class = UserMinimalSerializer
     permission_classes = [IsAdminRole]
+    pagination_class = UserDropdownPagination
+
+    def get_keyset_branches(self):
+        params = self.request.query_params
+        queryset = filter_users(self.get_queryset(), params)
+        term = search_term(params)
+        return search_branches(queryset, term) if term else [queryset]
 
 
 # =====================================================
@@ -145,16 +335,62 @@ class AdminNotificationViewSet(viewsets.ModelViewSet):
                 status=400
             )
 
-        recipient = User.objects.get(id=recipient_id)
+        try:
+            with transaction.atomic():
+                Notification.objects.create(
+                    title=title,
+                    message=message,
+                    notification_type=notif_type,
+                    is_banner=is_banner,
+                    is_broadcast=False,
+                    recipient_id=recipient_id
+                )
+        except (IntegrityError, ValueError):
+            # FK constraint does the existence check; no extra SELECT needed
+            return Response({"error": "recipient not found"}, status=400)
+
+        return Response({"status": "Personal notification sent"}, status=201)
 
-        Notification.objects.create(
+    # --- BULK / TARGETED SEND ---
+    # POST /admin/notifications/bulk/
+    # { title, message, notification_type, is_banner,
+    #   recipients: [ids]  OR  filter: {role, blood_group, city, state, district, pincode} }
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        title = request.data.get("title")
+        message = request.data.get("message")
+        if not title or not message:
+            return Response({"error": "title and message are required"}, status=400)
+
+        target, error = jobs.validate_target(request.data)
+        if error:
+            return Response({"error": error}, status=400)
+
+        jwt_user = getattr(request, "user_jwt", None) or {}
+        job = NotificationJob.objects.create(
+            created_by_id=jwt_user.get("user_id"),
             title=title,
             message=message,
-            notification_type=notif_type,
-            is_banner=is_banner,
-            is_broadcast=False,
-            recipient=recipient
+            notification_type=request.data.get("notification_type", "info"),
+            is_banner=request.data.get("is_banner", False),
+            target=target,
         )
+        jobs.enqueue(job)
 
-        return Response({"status": "Personal notification sent"}, status=201)
+        return Response(
+            {"job_id": job.id, "status": job.status},
+            status=status.HTTP_202_ACCEPTED
+        )
 
+    # GET /admin/notifications/cache_stats/
+    @action(detail=False, methods=["get"])
+    def cache_stats(self, request):
+        return Response({"banner": banner_cache.snapshot()})
+
+    # GET /admin/notifications/jobs/<id>/
+    @action(detail=False, methods=["get"], url_path=r"jobs/(?P<job_id>\d+)")
+    def job(self, request, job_id=None):
+        job = NotificationJob.objects.filter(pk=job_id).first()
+        if not job:
+            return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(NotificationJobSerializer(job).data)
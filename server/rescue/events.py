@@ -0,0 +1,201 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+
+from disaster_management.streaming import format_event
+
+
+class ChannelLog:
+    """Last `size` events of one channel plus the streams listening to it."""
+
+    __slots__ = ('events', 'next_id', 'subscribers')
+
+    def __init__(self, size):
+        self.events = deque(maxlen=size)  # (event, data_json, id), oldest first
+        # Ids start at the wall clock (µs), so a log rebuilt after a restart
+        # or eviction never reuses an id a client may still hold
+        self.next_id = time.time_ns() // 1000
+        self.subscribers = set()
+
+
+class Subscription:
+    __slots__ = ('channel_id', 'queue', 'loop', 'closed')
+
+    def __init__(self, channel_id, queue, loop):
+        self.channel_id = channel_id
+        self.queue = queue
+        self.loop = loop
+        self.closed = False
+
+
+class ChannelBus:
+    """
+    In-process pub/sub for rescue-channel events (join, leave, status,
+    message), bounded everywhere:
+
+    - each channel keeps a ring buffer of its last `buffer_size` events,
+      which is what a new stream replays and what a reconnecting client
+      (Last-Event-ID) resumes from;
+    - channels are spread over `shards`, each with its own lock and an LRU
+      of at most `max_channels / shards` logs (ones with open streams are
+      never evicted);
+    - every stream has a queue of `queue_size` events. A consumer that
+      falls that far behind is cut off instead of buffered for; it
+      reconnects and catches up from the ring.
+
+    Events are JSON-encoded and framed for SSE once at publish; subscriber
+    queues carry those bytes, so fan-out costs a queue put per stream.
+    Publishing is safe from any thread; delivery hops onto the event loop
+    that owns the streams with one call per event, not per subscriber.
+
+    Per process, like rescue.presence: with several ASGI workers, pin a
+    channel's streams and publishers to one worker or put a shared broker
+    (see notification.broker) behind this.
+    """
+
+    def __init__(self, shards=16, buffer_size=100, queue_size=256, max_channels=10000):
+        self.buffer_size = buffer_size
+        self.queue_size = queue_size
+        self.max_per_shard = max(1, max_channels // shards)
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+        self.stats = {'published': 0, 'delivered': 0, 'dropped_subscribers': 0}
+
+    def _shard(self, channel_id):
+        return self._shards[hash(channel_id) % len(self._shards)]
+
+    def _log(self, logs, channel_id):
+        log = logs.get(channel_id)
+        if log is None:
+            log = logs[channel_id] = ChannelLog(self.buffer_size)
+            if len(logs) > self.max_per_shard:
+                self._evict(logs)
+        else:
+            logs.move_to_end(channel_id)
+        return log
+
+    def _evict(self, logs):
+        for channel_id, log in logs.items():
+            if not log.subscribers:
+                del logs[channel_id]
+                return
+
+    # --- publish ---
+
+    def publish(self, channel_id, event, data):
+        """Append to the channel's ring and fan out. Returns the event id."""
+        payload = json.dumps(data, separators=(',', ':'), default=str)
+        lock, logs = self._shard(channel_id)
+        with lock:
+            log = self._log(logs, channel_id)
+            item = (event, payload, log.next_id)
+            log.next_id += 1
+            log.events.append(item)
+            subscribers = tuple(log.subscribers)
+        self.stats['published'] += 1
+        if subscribers:
+            self._dispatch(subscribers, format_event(payload, event, item[2]))
+        return item[2]
+
+    def _dispatch(self, subscribers, frame):
+        # Normally every stream lives on the one ASGI loop
+        by_loop = {}
+        for sub in subscribers:
+            by_loop.setdefault(sub.loop, []).append(sub)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for loop, subs in by_loop.items():
+            if loop is running:
+                self._deliver(subs, frame)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(self._deliver, subs, frame)
+
+    def _deliver(self, subscribers, frame):
+        """Runs on the subscribers' loop."""
+        delivered = 0
+        for sub in subscribers:
+            if sub.closed:
+                continue
+            try:
+                sub.queue.put_nowait(frame)
+                delivered += 1
+            except asyncio.QueueFull:
+                self._cut_off(sub)
+        self.stats['delivered'] += delivered
+
+    def _cut_off(self, sub):
+        self.stats['dropped_subscribers'] += 1
+        self.unsubscribe(sub)
+        queue = sub.queue
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)  # closes the stream; the client resumes via Last-Event-ID
+
+    # --- subscribe ---
+
+    def subscribe(self, channel_id, last_event_id=None, replay=None):
+        """
+        Open a stream on the running loop. Returns (subscription, backlog):
+        the events after `last_event_id` if the ring still covers them,
+        otherwise a `reset` marker followed by the last `replay` events.
+        Taken under the shard lock, so nothing is missed or sent twice.
+        """
+        sub = Subscription(channel_id, asyncio.Queue(maxsize=self.queue_size), asyncio.get_running_loop())
+        lock, logs = self._shard(channel_id)
+        with lock:
+            log = self._log(logs, channel_id)
+            backlog = self._backlog(log, last_event_id, replay)
+            log.subscribers.add(sub)
+        return sub, backlog
+
+    def unsubscribe(self, sub):
+        sub.closed = True
+        lock, logs = self._shard(sub.channel_id)
+        with lock:
+            log = logs.get(sub.channel_id)
+            if log is not None:
+                log.subscribers.discard(sub)
+
+    def history(self, channel_id, last_event_id=None, replay=None):
+        """Same backlog as subscribe() without opening a stream (REST polling)."""
+        lock, logs = self._shard(channel_id)
+        with lock:
+            log = logs.get(channel_id)
+            if log is None:
+                return [('reset', '{}', None)] if last_event_id is not None else []
+            return self._backlog(log, last_event_id, replay)
+
+    def _backlog(self, log, last_event_id, replay):
+        events = log.events
+        if last_event_id is not None:
+            first_kept = events[0][2] if events else log.next_id
+            if first_kept - 1 <= last_event_id < log.next_id:
+                # Ids are consecutive, so the missed events are the tail
+                missed = log.next_id - 1 - last_event_id
+                return list(events)[len(events) - missed:] if missed else []
+            # Fell off the ring (or from a previous process): start over
+            return [('reset', '{}', None)] + self._tail(events, replay)
+        return self._tail(events, replay)
+
+    def _tail(self, events, replay):
+        count = len(events) if replay is None else max(0, min(replay, len(events)))
+        return list(events)[len(events) - count:] if count else []
+
+    def subscriber_count(self, channel_id):
+        lock, logs = self._shard(channel_id)
+        with lock:
+            log = logs.get(channel_id)
+            return len(log.subscribers) if log else 0
+
+
+channel_bus = ChannelBus(
+    shards=getattr(settings, 'RESCUE_EVENTS_SHARDS', 16),
+    buffer_size=getattr(settings, 'RESCUE_EVENTS_BUFFER', 100),
+    queue_size=getattr(settings, 'RESCUE_EVENTS_QUEUE', 256),
+    max_channels=getattr(settings, 'RESCUE_EVENTS_MAX_CHANNELS', 10000),
+)
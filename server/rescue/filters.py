@@ -0,0 +1,92 @@
+from django.db.models import Q
+
+from navigation.geo import bounding_box, haversine_m
+
+from .models import RescueChannel
+from .ranking import ranking
+
+SECTORS = {value for value, _ in RescueChannel.SECTOR_CHOICES}
+SORTS = ('recent', 'popular', 'nearest')
+DEFAULT_RADIUS_M = 25000
+MAX_RADIUS_M = 100000
+
+ORDERINGS = {
+    'recent': ('-is_live', '-created_at', '-id'),
+    'popular': ('-is_live', '-popularity', '-id'),
+}
+
+
+def _bool(value):
+    value = value.lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise ValueError("is_live must be true or false")
+
+
+def _float(params, name, default=None):
+    value = params.get(name, default)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+
+
+def filter_channels(queryset, params):
+    """
+    Apply the listing's query params:
+
+        ?sector=Medical[,Fire]  ?is_live=true
+        ?lat=&lng=[&radius=<meters>]   only channels with a position, within radius
+        ?sort=recent|popular|nearest   (nearest is the default with lat/lng)
+
+    sector / is_live are equality filters on the (is_live, sector,
+    created_at) index. Proximity narrows to the bounding box in SQL and
+    measures the survivors in Python, so it returns a list of channels with
+    `distance_m` set rather than a queryset. Raises ValueError on bad input.
+    """
+    sectors = [s for s in params.get('sector', '').split(',') if s]
+    if sectors:
+        unknown = set(sectors) - SECTORS
+        if unknown:
+            raise ValueError(f"Unknown sector: {', '.join(sorted(unknown))}")
+        queryset = queryset.filter(sector__in=sectors)
+
+    if 'is_live' in params:
+        queryset = queryset.filter(is_live=_bool(params['is_live']))
+
+    near = 'lat' in params or 'lng' in params
+    sort = params.get('sort') or ('nearest' if near else 'recent')
+    if sort not in SORTS:
+        raise ValueError(f"sort must be one of {', '.join(SORTS)}")
+    if sort == 'nearest' and not near:
+        raise ValueError("sort=nearest needs lat and lng")
+
+    if sort == 'popular':
+        ranking.ensure_fresh()
+    queryset = queryset.order_by(*ORDERINGS.get(sort, ORDERINGS['recent']))
+    if not near:
+        return queryset
+
+    lat, lng = _float(params, 'lat'), _float(params, 'lng')
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("lat/lng out of range")
+    radius = min(max(_float(params, 'radius', DEFAULT_RADIUS_M), 0), MAX_RADIUS_M)
+
+    min_lat, min_lng, max_lat, max_lng = bounding_box(lat, lng, radius)
+    if min_lng < -180 or max_lng > 180:
+        # Box crosses the antimeridian: two longitude ranges
+        lng_filter = Q(longitude__gte=(min_lng + 540) % 360 - 180) | Q(longitude__lte=(max_lng + 540) % 360 - 180)
+    else:
+        lng_filter = Q(longitude__range=(min_lng, max_lng))
+    queryset = queryset.filter(lng_filter, latitude__range=(min_lat, max_lat))
+
+    channels = []
+    for channel in queryset:
+        channel.distance_m = haversine_m(lat, lng, channel.latitude, channel.longitude)
+        if channel.distance_m <= radius:
+            channels.append(channel)
+    if sort == 'nearest':
+        channels.sort(key=lambda c: c.distance_m)
+    return channels
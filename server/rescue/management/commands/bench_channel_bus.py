@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from rescue.events import ChannelBus
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks rescue-channel event fan-out (rescue.events) to many in-process subscribers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=1000)
+        parser.add_argument('--messages', type=int, default=2000)
+        parser.add_argument('--burst', type=int, default=64,
+                            help='Messages published between yields to the loop (keep below --queue)')
+        parser.add_argument('--queue', type=int, default=256, help='Per-subscriber queue size')
+        parser.add_argument('--slow', type=int, default=10, help='Subscribers that never read')
+        parser.add_argument('--from-thread', action='store_true',
+                            help='Publish from a worker thread, as sync Django views do')
+
+    def handle(self, *args, **opts):
+        asyncio.run(self._run(opts))
+
+    async def _run(self, opts):
+        bus = ChannelBus(queue_size=opts['queue'])
+        total = opts['messages']
+        channel_id = 1
+        done = asyncio.Event()
+        remaining = [opts['subscribers']]
+
+        async def consumer(sub):
+            received = 0
+            while received < total:
+                frame = await sub.queue.get()  # SSE bytes, ready for send()
+                if frame is None:
+                    return
+                received += 1
+            remaining[0] -= 1
+            if not remaining[0]:
+                done.set()
+
+        subs = [bus.subscribe(channel_id)[0] for _ in range(opts['subscribers'])]
+        slow = [bus.subscribe(channel_id)[0] for _ in range(opts['slow'])]
+        tasks = [asyncio.ensure_future(consumer(sub)) for sub in subs]
+        await asyncio.sleep(0)
+
+        payload = {'user_id': 42, 'text': 'Water rising near the north bridge, need a boat', 'sent_at': 0}
+        self.stdout.write(
+            f"Fanning out {total} messages to {opts['subscribers']} subscribers "
+            f"(+{opts['slow']} stalled) from {'a thread' if opts['from_thread'] else 'the loop'}..."
+        )
+
+        start = time.perf_counter()
+        if opts['from_thread']:
+            loop = asyncio.get_running_loop()
+            lag = threading.Semaphore(opts['burst'])
+
+            def release():
+                lag.release()
+
+            def publish_all():
+                for _ in range(total):
+                    lag.acquire()  # at most `burst` messages in flight
+                    bus.publish(channel_id, 'message', payload)
+                    loop.call_soon_threadsafe(release)
+
+            publisher = threading.Thread(target=publish_all)
+            publisher.start()
+            await done.wait()
+            publisher.join()
+        else:
+            for n in range(total):
+                bus.publish(channel_id, 'message', payload)
+                if n % opts['burst'] == opts['burst'] - 1:
+                    await asyncio.sleep(0)  # let the consumers drain
+            await done.wait()
+        elapsed = time.perf_counter() - start
+
+        await asyncio.gather(*tasks)
+        deliveries = total * opts['subscribers']
+        self.stdout.write(self.style.SUCCESS(
+            f"{total / elapsed:,.0f} messages/s  {deliveries / elapsed:,.0f} deliveries/s  "
+            f"({elapsed:.2f}s, {elapsed / deliveries * 1e6:.2f} µs per delivery)"
+        ))
+        cut = sum(1 for sub in slow if sub.closed)
+        self.stdout.write(
+            f"Stalled subscribers cut off: {cut}/{opts['slow']}  "
+            f"(stats: {bus.stats})"
+        )
@@ -0,0 +1,99 @@
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import RescueChannel
+
+Participant = RescueChannel.participants.through
+
+AVATAR_URL = "https://i.pravatar.cc/150?u={}"
+AVATAR_COUNT = 5
+EXISTS_TTL = 300
+
+
+def channel_exists(channel_id):
+    """
+    Whether the channel is real, remembered for EXISTS_TTL seconds so
+    heartbeats and messages don't each cost a lookup (cleared on delete).
+    """
+    key = f'rescue:channel:{channel_id}:exists'
+    if cache.get(key):
+        return True
+    exists = RescueChannel.objects.filter(pk=channel_id).exists()
+    if exists:
+        cache.set(key, True, EXISTS_TTL)
+    return exists
+
+
+def forget_channel(channel_id):
+    cache.delete(f'rescue:channel:{channel_id}:exists')
+
+
+def toggle(channel_id, user_id):
+    """
+    Join the channel if the user isn't in it, leave it if they are.
+    A keyed DELETE tells us which (rowcount), then at most one INSERT and
+    one F() counter update, so the cost doesn't grow with the channel.
+    Returns True when the user is now a participant.
+    """
+    with transaction.atomic():
+        left, _ = Participant.objects.filter(rescuechannel_id=channel_id, user_id=user_id).delete()
+        if left:
+            RescueChannel.objects.filter(pk=channel_id, participant_count__gt=0).update(
+                participant_count=F('participant_count') - 1
+            )
+            return False
+
+        try:
+            with transaction.atomic():
+                Participant.objects.create(rescuechannel_id=channel_id, user_id=user_id)
+        except IntegrityError:
+            # Either a concurrent request just joined them (already counted)
+            # or the user doesn't exist (FK); only the first is a join
+            if Participant.objects.filter(rescuechannel_id=channel_id, user_id=user_id).exists():
+                return True
+            raise
+        RescueChannel.objects.filter(pk=channel_id).update(participant_count=F('participant_count') + 1)
+        return True
+
+
+def participant_count(channel_id):
+    return RescueChannel.objects.filter(pk=channel_id).values_list('participant_count', flat=True).first() or 0
+
+
+def avatars(channel_id, limit=AVATAR_COUNT):
+    """First few participants' avatars, straight off the through table (no users join)."""
+    user_ids = (
+        Participant.objects.filter(rescuechannel_id=channel_id)
+        .order_by('id').values_list('user_id', flat=True)[:limit]
+    )
+    return [AVATAR_URL.format(user_id) for user_id in user_ids]
+
+
+def avatars_for(channel_ids, limit=AVATAR_COUNT):
+    """
+    {channel_id: [avatar urls]} for many channels in one windowed query:
+    ROW_NUMBER() per channel, keep the first `limit` of each.
+    """
+    avatars_by_channel = {channel_id: [] for channel_id in channel_ids}
+    if not avatars_by_channel:
+        return avatars_by_channel
+    rows = (
+        Participant.objects.filter(rescuechannel_id__in=list(avatars_by_channel))
+        .annotate(position=Window(RowNumber(), partition_by=F('rescuechannel_id'), order_by=F('id').asc()))
+        .filter(position__lte=limit)
+        .order_by('rescuechannel_id', 'position')
+        .values_list('rescuechannel_id', 'user_id')
+    )
+    for channel_id, user_id in rows:
+        avatars_by_channel[channel_id].append(AVATAR_URL.format(user_id))
+    return avatars_by_channel
+
+
+def recount(channel_ids):
+    """Resync the counter from the through table (after bulk m2m edits)."""
+    for channel_id in channel_ids:
+        RescueChannel.objects.filter(pk=channel_id).update(
+            participant_count=Participant.objects.filter(rescuechannel_id=channel_id).count()
+        )
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:32
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_participants(apps, schema_editor):
+    RescueChannel = apps.get_model('rescue', 'RescueChannel')
+    Through = RescueChannel.participants.through
+    counts = (
+        Through.objects.filter(rescuechannel_id=OuterRef('pk'))
+        .values('rescuechannel_id').annotate(n=Count('id')).values('n')
+    )
+    # Channels nobody joined get NULL from the subquery; the column is NOT NULL
+    RescueChannel.objects.update(participant_count=Coalesce(Subquery(counts, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rescue', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rescuechannel',
+            name='participant_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_participants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rescue', '0002_rescuechannel_participant_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rescuechannel',
+            name='online_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:38
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def score_channels(apps, schema_editor):
+    # Same formula as rescue.ranking.popularity (24h half-life); the
+    # background refresh keeps it current from here on
+    RescueChannel = apps.get_model('rescue', 'RescueChannel')
+    now = timezone.now()
+    channels = []
+    for channel in RescueChannel.objects.only('participant_count', 'online_count', 'created_at'):
+        age_hours = max(0.0, (now - channel.created_at).total_seconds() / 3600)
+        channel.popularity = round((channel.participant_count + 2.0 * channel.online_count) * 0.5 ** (age_hours / 24), 4)
+        channels.append(channel)
+    RescueChannel.objects.bulk_update(channels, ['popularity'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rescue', '0003_rescuechannel_online_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rescuechannel',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rescuechannel',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rescuechannel',
+            name='popularity',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='rescuechannel',
+            index=models.Index(fields=['is_live', 'sector', 'created_at'], name='rescue_live_sector_created'),
+        ),
+        migrations.AddIndex(
+            model_name='rescuechannel',
+            index=models.Index(fields=['is_live', 'popularity'], name='rescue_live_popularity'),
+        ),
+        migrations.RunPython(score_channels, migrations.RunPython.noop),
+    ]
@@ -21,16 +21,38 @@ class RescueChannel(models.Model):
         blank=True
     )
     
+    # Denormalized len(participants); kept in step by rescue.membership
+    # (F() updates) and the m2m_changed handler in rescue.signals
+    participant_count = models.PositiveIntegerField(default=0, editable=False)
+    # Last presence snapshot (rescue.presence flushes it periodically);
+    # the live number comes from GET .../presence/
+    online_count = models.PositiveIntegerField(default=0, editable=False)
+
+    # Optional position, for "channels near me" (?lat=&lng=&radius=)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Cached ranking score for ?sort=popular, recomputed in the background
+    # from the counts above by rescue.ranking
+    popularity = models.FloatField(default=0, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # sector / is_live filters with the default newest-first order
+            models.Index(fields=['is_live', 'sector', 'created_at'], name='rescue_live_sector_created'),
+            models.Index(fields=['is_live', 'popularity'], name='rescue_live_popularity'),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.sector})"
 
     @property
     def total_participants(self):
-        return self.participants.count()
+        return self.participant_count
 
     @property
     def participant_avatars(self):
         # Using a dummy avatar service based on user ID for now
-        return [f"https://i.pravatar.cc/150?u={user.id}" for user in self.participants.all()[:5]]
\ No newline at end of file
+        from .membership import avatars
+        return avatars(self.pk)
\ No newline at end of file
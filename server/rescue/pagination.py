@@ -0,0 +1,16 @@
+from rest_framework.pagination import LimitOffsetPagination
+
+
+class ChannelPagination(LimitOffsetPagination):
+    """
+    ?limit=&offset= paging for the channel listing. Existing clients expect
+    a bare list, so it only applies when the request asks for it.
+    """
+    default_limit = 20
+    max_limit = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.limit_query_param not in params and self.offset_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
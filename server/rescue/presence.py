@@ -0,0 +1,157 @@
+import heapq
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from disaster_management.background import BackgroundTask
+
+from .membership import AVATAR_URL
+from .models import RescueChannel
+
+logger = logging.getLogger(__name__)
+
+
+class Presence:
+    """
+    Who is online in each rescue channel, kept in memory.
+
+    A heartbeat marks (channel, user) alive for `ttl` seconds. Deadlines go
+    on a min-heap; expiry pops whatever is overdue and skips entries a later
+    heartbeat superseded (lazy deletion), so a heartbeat is O(log n) and
+    never touches the DB. Channels whose count changed are flushed to
+    RescueChannel.online_count every `flush_interval` seconds, on a
+    background thread: kicked by heartbeats and leaves, and by a timer so
+    counts still drop when everyone just stops calling in.
+
+    Per process: with several workers, route a channel's heartbeats to one
+    worker or swap this for a shared store (e.g. a Redis sorted set).
+    """
+
+    def __init__(self, ttl=45, flush_interval=30):
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._deadlines = {}              # (channel, user) -> deadline
+        self._online = defaultdict(dict)  # channel -> {user: came online at}, oldest first
+        self._heap = []
+        self._dirty = set()
+        self._last_flush = time.monotonic()
+        self._flusher = BackgroundTask(self.flush, 'presence-flush')
+        self._timer = None
+        self._stopped = threading.Event()
+
+    # --- writes ---
+
+    def heartbeat(self, channel_id, user_id, now=None):
+        """Returns True if the user just came online in this channel."""
+        now = time.monotonic() if now is None else now
+        key = (channel_id, user_id)
+        deadline = now + self.ttl
+        with self._lock:
+            self._expire(now)
+            is_new = key not in self._deadlines
+            self._deadlines[key] = deadline
+            heapq.heappush(self._heap, (deadline, channel_id, user_id))
+            if is_new:
+                self._online[channel_id][user_id] = time.time()
+                self._dirty.add(channel_id)
+        self._start_timer()
+        self._maybe_flush(now)
+        return is_new
+
+    def leave(self, channel_id, user_id, now=None):
+        with self._lock:
+            if self._deadlines.pop((channel_id, user_id), None) is not None:
+                self._drop(channel_id, user_id)
+        # its heap entry is skipped when it comes due
+        self._maybe_flush(time.monotonic() if now is None else now)
+
+    def stop(self):
+        """Stop the flush timer (tests, shutdown)."""
+        self._stopped.set()
+
+    # --- reads ---
+
+    def online_count(self, channel_id, now=None):
+        with self._lock:
+            self._expire(time.monotonic() if now is None else now)
+            return len(self._online.get(channel_id, ()))
+
+    def recent(self, channel_id, limit=5, now=None):
+        """Most recent arrivals first: [(user_id, online_since_epoch)]."""
+        with self._lock:
+            self._expire(time.monotonic() if now is None else now)
+            members = list(self._online.get(channel_id, {}).items())
+        return members[::-1][:limit]
+
+    def snapshot(self, channel_id, limit=5):
+        return {
+            'online': self.online_count(channel_id),
+            'recent': [
+                {'user_id': user_id, 'avatar': AVATAR_URL.format(user_id), 'since': round(since, 3)}
+                for user_id, since in self.recent(channel_id, limit)
+            ],
+        }
+
+    # --- internals ---
+
+    def _expire(self, now):
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, channel_id, user_id = heapq.heappop(heap)
+            if self._deadlines.get((channel_id, user_id)) == deadline:
+                del self._deadlines[(channel_id, user_id)]
+                self._drop(channel_id, user_id)
+
+    def _drop(self, channel_id, user_id):
+        members = self._online.get(channel_id)
+        if members is not None:
+            members.pop(user_id, None)
+            if not members:
+                del self._online[channel_id]
+        self._dirty.add(channel_id)
+
+    def _maybe_flush(self, now):
+        if now - self._last_flush >= self.flush_interval and self._flusher.start():
+            self._last_flush = now
+
+    def _start_timer(self):
+        # Started by the first heartbeat, so idle processes never run it
+        if self._timer is not None:
+            return
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Thread(target=self._tick, name='presence-timer', daemon=True)
+        self._timer.start()
+
+    def _tick(self):
+        while not self._stopped.wait(self.flush_interval):
+            self._maybe_flush(time.monotonic())
+
+    def flush(self, now=None):
+        """Write the live count of every changed channel to online_count."""
+        with self._lock:
+            self._expire(time.monotonic() if now is None else now)
+            dirty, self._dirty = self._dirty, set()
+            counts = {channel_id: len(self._online.get(channel_id, ())) for channel_id in dirty}
+
+        # One UPDATE per distinct count, not per channel
+        by_count = defaultdict(list)
+        for channel_id, count in counts.items():
+            by_count[count].append(channel_id)
+        try:
+            for count, channel_ids in by_count.items():
+                RescueChannel.objects.filter(pk__in=channel_ids).update(online_count=count)
+        except Exception:
+            logger.exception("Presence flush failed")
+            with self._lock:
+                self._dirty |= set(counts)
+
+
+presence = Presence(
+    ttl=getattr(settings, 'PRESENCE_TTL', 45),
+    flush_interval=getattr(settings, 'PRESENCE_FLUSH_INTERVAL', 30),
+)
@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from disaster_management.background import BackgroundTask
+
+from .models import RescueChannel
+
+# A user online right now says more about a channel than one who joined once
+ONLINE_WEIGHT = 2.0
+REFRESHED_KEY = 'rescue:popularity:refreshed'
+
+
+def popularity(participants, online, created_at, now, half_life_hours=24):
+    """Participants (+ weighted online users), halved every `half_life_hours` of age."""
+    age_hours = max(0.0, (now - created_at).total_seconds() / 3600)
+    return round((participants + ONLINE_WEIGHT * online) * 0.5 ** (age_hours / half_life_hours), 4)
+
+
+class PopularityRanking:
+    """
+    Keeps RescueChannel.popularity, the ?sort=popular key, roughly current.
+
+    The score decays with age, so it can't be maintained by the join/leave
+    F() updates; instead it is recomputed for every channel at most every
+    `interval` seconds (one narrow SELECT plus batched UPDATEs), on a
+    background thread kicked off by the listing that wants it. The last
+    refresh time lives in the Django cache, so with a shared cache one
+    process refreshes for all of them.
+    """
+
+    def __init__(self, interval=300, half_life_hours=24):
+        self.interval = interval
+        self.half_life_hours = half_life_hours
+        self._refresher = BackgroundTask(self._refresh_or_retry, 'popularity-refresh')
+
+    def ensure_fresh(self):
+        if self._refresher.running or cache.get(REFRESHED_KEY):
+            return
+        # Claim this round before the work, so other requests don't pile on
+        cache.set(REFRESHED_KEY, time.time(), self.interval)
+        self._refresher.start()
+
+    def _refresh_or_retry(self):
+        try:
+            self.refresh()
+        except Exception:
+            cache.delete(REFRESHED_KEY)  # let the next listing try again
+            raise
+
+    def refresh(self):
+        """Recompute every channel's score; returns how many changed."""
+        now = timezone.now()
+        changed = []
+        rows = RescueChannel.objects.values_list('id', 'participant_count', 'online_count', 'created_at', 'popularity')
+        for pk, participants, online, created_at, current in rows.iterator(chunk_size=2000):
+            score = popularity(participants, online, created_at, now, self.half_life_hours)
+            if score != current:
+                changed.append(RescueChannel(pk=pk, popularity=score))
+        RescueChannel.objects.bulk_update(changed, ['popularity'], batch_size=500)
+        cache.set(REFRESHED_KEY, time.time(), self.interval)
+        return len(changed)
+
+
+ranking = PopularityRanking(
+    interval=getattr(settings, 'RESCUE_POPULARITY_INTERVAL', 300),
+    half_life_hours=getattr(settings, 'RESCUE_POPULARITY_HALF_LIFE_HOURS', 24),
+)
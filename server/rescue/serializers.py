@@ -4,12 +4,26 @@ from .models import RescueChannel
 class RescueChannelSerializer(serializers.ModelSerializer):
     # Explicitly include the computed properties
     total_participants = serializers.ReadOnlyField()
-    participant_avatars = serializers.ReadOnlyField()
+    participant_avatars = serializers.SerializerMethodField()
+    # Only set when the listing is filtered by ?lat=&lng=
+    distance_m = serializers.SerializerMethodField()
 
     class Meta:
         model = RescueChannel
         fields = [
             'id', 'title', 'description', 'sector', 
             'is_live', 'created_at', 
-            'total_participants', 'participant_avatars'
-        ]
\ No newline at end of file
+            'total_participants', 'participant_avatars', 'online_count',
+            'latitude', 'longitude', 'distance_m',
+        ]
+
+    def get_participant_avatars(self, obj):
+        # Listings pass every channel's avatars in one batch (see RescueChannelViewSet.list)
+        avatars = self.context.get('avatars')
+        if avatars is not None and obj.pk in avatars:
+            return avatars[obj.pk]
+        return obj.participant_avatars
+
+    def get_distance_m(self, obj):
+        distance = getattr(obj, 'distance_m', None)
+        return round(distance, 1) if distance is not None else None
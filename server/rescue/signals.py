@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import membership
+from .events import channel_bus
+from .models import RescueChannel
+
+
+@receiver(m2m_changed, sender=RescueChannel.participants.through)
+def participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # channel.participants.add()/remove()/clear() (admin, shell, scripts)
+    # bypass membership.toggle; recount whatever they touched
+    if reverse and action == 'pre_clear':
+        # user.joined_channels.clear() doesn't say which channels it touched
+        instance._cleared_channels = list(instance.joined_channels.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        membership.recount([instance.pk])
+    elif action == 'post_clear':
+        membership.recount(getattr(instance, '_cleared_channels', []))
+    elif pk_set:
+        membership.recount(pk_set)
+
+
+@receiver(post_save, sender=RescueChannel)
+def channel_saved(sender, instance, created, **kwargs):
+    # Live streams learn about is_live / title changes once they're committed
+    if created:
+        return
+    data = {'is_live': instance.is_live, 'title': instance.title, 'sector': instance.sector}
+    transaction.on_commit(lambda: channel_bus.publish(instance.pk, 'status', data))
+
+
+@receiver(post_delete, sender=RescueChannel)
+def channel_deleted(sender, instance, **kwargs):
+    membership.forget_channel(instance.pk)
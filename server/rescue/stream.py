@@ -0,0 +1,61 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from disaster_management import streaming
+
+from . import membership
+from .events import channel_bus
+
+STREAM_PATH = "/api/v1/rescue-channels/stream/"
+MAX_REPLAY = 100
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def channel_stream(scope, receive, send):
+    """
+    GET /api/v1/rescue-channels/stream/?channel=<id>[&replay=N]  (text/event-stream)
+
+    Needs ?ticket= (POST notifications/stream-ticket/) or a bearer header.
+    Pushes the channel's join / leave / status / message events as they are
+    published. A new stream first replays the last N events (default 20);
+    a reconnecting EventSource sends Last-Event-ID and gets exactly what it
+    missed, or `event: reset` if that has already left the buffer.
+    """
+    if scope["method"] != "GET":
+        await streaming.send_json_error(send, 405, "Method not allowed")
+        return
+
+    try:
+        user_id = streaming.stream_user_id(scope)
+    except streaming.StreamAuthError as e:
+        await streaming.send_json_error(send, 401, str(e))
+        return
+    if user_id is None:
+        await streaming.send_json_error(send, 401, "Authentication required")
+        return
+
+    params = streaming.query_params(scope)
+    channel_id = _int_or_none(params.get("channel"))
+    if channel_id is None:
+        await streaming.send_json_error(send, 400, "channel must be an integer id")
+        return
+    if not await sync_to_async(membership.channel_exists)(channel_id):
+        await streaming.send_json_error(send, 404, "Channel not found")
+        return
+
+    last_event_id = _int_or_none(streaming.header(scope, "last-event-id") or params.get("last_event_id"))
+    replay = _int_or_none(params.get("replay"))
+    replay = 20 if replay is None else max(0, min(replay, MAX_REPLAY))
+
+    sub, backlog = channel_bus.subscribe(channel_id, last_event_id, replay)
+    try:
+        await streaming.stream(receive, send, sub.queue, initial=backlog,
+                               keepalive=getattr(settings, "NOTIFICATION_STREAM_KEEPALIVE", 25))
+    finally:
+        channel_bus.unsubscribe(sub)
@@ -1,3 +1,249 @@
-from django.test import TestCase
+import asyncio
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from disaster_management import streaming
+
+from . import membership
+from .events import ChannelBus
+from .models import RescueChannel
+from .presence import Presence
+from .ranking import ranking
+from .stream import channel_stream
+
+
+class RescueChannelListQueryTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.users = [
+            User.objects.create_user(email=f'user{n}@example.com', username=f'user{n}', full_name=f'User {n}')
+            for n in range(8)
+        ]
+
+    def make_channels(self, count):
+        for n in range(count):
+            channel = RescueChannel.objects.create(title=f'Channel {n}', description='test')
+            for user in self.users[:n % len(self.users) + 1]:
+                membership.toggle(channel.pk, user.pk)
+
+    def test_list_queries_do_not_grow_with_channels(self):
+        client = APIClient()
+        for count in (3, 12):
+            RescueChannel.objects.all().delete()
+            self.make_channels(count)
+            with self.assertNumQueries(2):
+                response = client.get('/api/v1/rescue-channels/')
+            self.assertEqual(len(response.json()), count)
+
+    def test_counts_and_avatars(self):
+        self.make_channels(8)
+        channels = {c['title']: c for c in APIClient().get('/api/v1/rescue-channels/').json()}
+        self.assertEqual(channels['Channel 7']['total_participants'], 8)
+        self.assertEqual(
+            channels['Channel 7']['participant_avatars'],
+            [f'https://i.pravatar.cc/150?u={user.pk}' for user in self.users[:5]],
+        )
+        self.assertEqual(len(channels['Channel 1']['participant_avatars']), 2)
+
+    def test_join_leave_toggles(self):
+        channel = RescueChannel.objects.create(title='Live', description='test')
+        user = self.users[0]
+        url = f'/api/v1/rescue-channels/{channel.pk}/join_leave/'
+        # No joining on someone else's behalf
+        anonymous = APIClient().post(url, {'user_id': user.pk}, format='json')
+        self.assertEqual(anonymous.status_code, 401)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        joined = client.post(url, {'user_id': self.users[1].pk}, format='json')
+        self.assertEqual(joined.json()['status'], 'joined')
+        self.assertEqual(joined.json()['totalParticipants'], 1)
+        self.assertEqual(list(channel.participants.values_list('pk', flat=True)), [user.pk])
+        left = client.post(url, format='json')
+        self.assertEqual(left.json()['status'], 'left')
+        self.assertEqual(left.json()['totalParticipants'], 0)
+
+
+class ChannelAuthTests(TestCase):
+    def setUp(self):
+        self.channel = RescueChannel.objects.create(title='Live', description='test')
+        self.user, self.other = self.make_users(2)
+        self.client = APIClient()
+
+    def make_users(self, count):
+        User = get_user_model()
+        return [
+            User.objects.create_user(email=f'a{n}@example.com', username=f'a{n}', full_name=f'A {n}')
+            for n in range(count)
+        ]
+
+    def test_presence_and_messages_are_the_callers_own(self):
+        url = f'/api/v1/rescue-channels/{self.channel.pk}'
+        spoofed = {'user_id': self.other.pk, 'text': 'hi'}
+        self.assertEqual(self.client.post(f'{url}/heartbeat/', spoofed, format='json').status_code, 401)
+        self.assertEqual(self.client.post(f'{url}/events/', spoofed, format='json').status_code, 401)
+
+        self.client.force_authenticate(self.user)
+        self.client.post(f'{url}/heartbeat/', spoofed, format='json')
+        self.assertEqual(self.client.get(f'{url}/presence/').json()['online'], 1)
+        sent = self.client.post(f'{url}/events/', spoofed, format='json').json()
+        self.assertEqual(sent['data']['user_id'], self.user.pk)
+
+    def test_unknown_channels_are_404(self):
+        self.client.force_authenticate(self.user)
+        for method, action in (('post', 'heartbeat'), ('get', 'events'), ('post', 'events'), ('get', 'presence')):
+            response = getattr(self.client, method)(f'/api/v1/rescue-channels/999/{action}/', {'text': 'hi'},
+                                                    format='json')
+            self.assertEqual(response.status_code, 404, action)
+
+
+class ChannelStreamAuthTests(TransactionTestCase):
+    # The stream checks the channel on a worker thread (sync_to_async),
+    # which needs committed rows
+
+    def test_stream_needs_credentials_and_a_real_channel(self):
+        def status(query):
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {'type': 'http', 'method': 'GET', 'query_string': query.encode(), 'headers': []}
+            asyncio.run(channel_stream(scope, None, send))
+            return sent[0]['status']
+
+        channel = RescueChannel.objects.create(title='Live', description='test')
+        ticket = streaming.issue_ticket(1)
+        self.assertEqual(status(f'channel={channel.pk}'), 401)
+        self.assertEqual(status(f'channel={channel.pk}&ticket=forged'), 401)
+        self.assertEqual(status(f'channel=999&ticket={ticket}'), 404)
+
+
+class PresenceTests(TestCase):
+    def setUp(self):
+        self.presence = Presence(ttl=10, flush_interval=30)
+        self.addCleanup(self.presence.stop)
+        self.channel = RescueChannel.objects.create(title='Live', description='test')
+
+    def test_users_expire_unless_they_keep_calling_in(self):
+        p, channel = self.presence, self.channel.pk
+        self.assertTrue(p.heartbeat(channel, 1, now=0))
+        self.assertTrue(p.heartbeat(channel, 2, now=2))
+        self.assertFalse(p.heartbeat(channel, 1, now=8))  # pushes 1 out to 18
+
+        self.assertEqual(p.online_count(channel, now=9), 2)
+        self.assertEqual(p.online_count(channel, now=12), 1)
+        self.assertEqual([user for user, _ in p.recent(channel, now=12)], [1])
+        self.assertEqual(p.online_count(channel, now=18), 0)
+
+        self.assertTrue(p.heartbeat(channel, 1, now=20))  # back online after expiring
+        p.leave(channel, 1, now=21)
+        self.assertEqual(p.online_count(channel, now=21), 0)
+
+    def test_flush_writes_changed_counts_including_expiries(self):
+        p, channel = self.presence, self.channel.pk
+        idle = RescueChannel.objects.create(title='Quiet', description='test', online_count=3)
+        p.heartbeat(channel, 1, now=0)
+        p.heartbeat(channel, 2, now=0)
+
+        with self.assertNumQueries(1):
+            p.flush(now=1)
+        self.channel.refresh_from_db()
+        idle.refresh_from_db()
+        self.assertEqual((self.channel.online_count, idle.online_count), (2, 3))
+
+        with self.assertNumQueries(0):  # nothing changed
+            p.flush(now=2)
+
+        p.flush(now=11)  # both expired without a word
+        self.channel.refresh_from_db()
+        self.assertEqual(self.channel.online_count, 0)
+
+    def test_leaves_and_the_timer_kick_the_flush(self):
+        p, channel = self.presence, self.channel.pk
+        with mock.patch.object(p._flusher, 'start', return_value=True) as start:
+            p.heartbeat(channel, 1, now=p._last_flush)
+            start.assert_not_called()
+            p.leave(channel, 1, now=p._last_flush + 30)
+            self.assertEqual(start.call_count, 1)
+
+        quick = Presence(ttl=10, flush_interval=0.01)
+        ticked = threading.Event()
+        with mock.patch.object(quick._flusher, 'start', side_effect=lambda: ticked.set() or True):
+            quick.heartbeat(channel, 1)
+            ticked.clear()
+            self.assertTrue(ticked.wait(2))  # nobody calling in, still flushed
+            quick.stop()
+
+
+class RescueChannelFilterTests(TestCase):
+    def setUp(self):
+        make = RescueChannel.objects.create
+        self.medical_near = make(title='Medical near', description='', sector='Medical', is_live=True,
+                                 latitude=23.8103, longitude=90.4125)
+        self.medical_far = make(title='Medical far', description='', sector='Medical', is_live=True,
+                                latitude=22.3569, longitude=91.7832)
+        self.fire_near = make(title='Fire near', description='', sector='Fire', is_live=True,
+                              latitude=23.8150, longitude=90.4200)
+        self.medical_off = make(title='Medical off air', description='', sector='Medical', is_live=False)
+
+    def titles(self, query):
+        response = APIClient().get('/api/v1/rescue-channels/' + query)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [c['title'] for c in response.json()]
+
+    def make_users(self, count):
+        User = get_user_model()
+        return [
+            User.objects.create_user(email=f'p{n}@example.com', username=f'p{n}', full_name=f'P {n}').pk
+            for n in range(count)
+        ]
+
+    def test_live_medical_near_me(self):
+        self.assertEqual(
+            self.titles('?sector=Medical&is_live=true&lat=23.8&lng=90.41&radius=5000'),
+            ['Medical near'],
+        )
+        self.assertEqual(self.titles('?lat=23.8103&lng=90.4125'), ['Medical near', 'Fire near'])
+        self.assertEqual(self.titles('?sector=Medical&is_live=false'), ['Medical off air'])
+
+    def test_popular_sort_uses_cached_score(self):
+        for user_id in self.make_users(3):
+            membership.toggle(self.medical_far.pk, user_id)
+        ranking.refresh()
+        self.assertEqual(self.titles('?sort=popular')[0], 'Medical far')
+
+    def test_opt_in_pagination_and_bad_input(self):
+        page = APIClient().get('/api/v1/rescue-channels/?limit=2').json()
+        self.assertEqual(page['count'], 4)
+        self.assertEqual(len(page['results']), 2)
+        self.assertEqual(APIClient().get('/api/v1/rescue-channels/?sector=Navy').status_code, 400)
+        self.assertEqual(APIClient().get('/api/v1/rescue-channels/?sort=nearest').status_code, 400)
+
+class ChannelBusTests(SimpleTestCase):
+    def test_resume_replays_only_missed_events(self):
+        bus = ChannelBus(buffer_size=3)
+        ids = [bus.publish(1, 'message', {'n': n}) for n in range(5)]
+        self.assertEqual([e[2] for e in bus.history(1, last_event_id=ids[2])], ids[3:])
+        self.assertEqual(bus.history(1, last_event_id=ids[-1]), [])
+        # ids[0] has left the ring: reset, then the tail
+        backlog = bus.history(1, last_event_id=ids[0], replay=1)
+        self.assertEqual([e[0] for e in backlog], ['reset', 'message'])
+        self.assertEqual(backlog[1][2], ids[-1])
+
+    def test_slow_subscriber_is_cut_off(self):
+        async def run():
+            bus = ChannelBus(queue_size=2)
+            sub, _ = bus.subscribe(1)
+            for n in range(3):
+                bus.publish(1, 'message', {'n': n})
+            return sub, bus
+
+        sub, bus = asyncio.run(run())
+        self.assertTrue(sub.closed)
+        self.assertIsNone(sub.queue.get_nowait())
+        self.assertEqual(bus.subscriber_count(1), 0)
@@ -1,53 +1,150 @@
+import json
+import time
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from django.contrib.auth import get_user_model # <--- FIX IMPORT
+from django.db import IntegrityError
 
+from . import membership
+from .events import channel_bus
+from .filters import filter_channels
 from .models import RescueChannel
+from .pagination import ChannelPagination
+from .presence import presence as channel_presence
 from .serializers import RescueChannelSerializer
 
-# Get the custom user model
-User = get_user_model()
+MAX_MESSAGE_LENGTH = 2000
+MAX_REPLAY = 100
 
 class RescueChannelViewSet(viewsets.ModelViewSet):
     queryset = RescueChannel.objects.all().order_by('-is_live', '-created_at')
     serializer_class = RescueChannelSerializer
+    pagination_class = ChannelPagination
     
     # Use IsAuthenticated if you want to use request.user
     # Use AllowAny if you are still testing with manual user_ids
     permission_classes = [AllowAny] 
 
+    def list(self, request, *args, **kwargs):
+        # 2 queries for any number of channels: the channels, then one
+        # windowed query for everyone's first avatars (counts are a column).
+        # ?limit=/&offset= adds a COUNT; see rescue.filters for the filters
+        try:
+            queryset = filter_channels(self.filter_queryset(self.get_queryset()), request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        page = self.paginate_queryset(queryset)
+        channels = list(page if page is not None else queryset)
+
+        context = self.get_serializer_context()
+        context['avatars'] = membership.avatars_for([channel.pk for channel in channels])
+        serializer = self.get_serializer(channels, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
     # --- CUSTOM ACTION: JOIN / LEAVE ---
+    # Constant query count however big the channel is (see rescue.membership)
     @action(detail=True, methods=['post'])
     def join_leave(self, request, pk=None):
         channel = self.get_object()
-        
-        # 1. Try to get user from Token (request.user)
-        if request.user.is_authenticated:
-            user = request.user
-        else:
-            # 2. Fallback for testing: Get 'user_id' from body
-            user_id = request.data.get('user_id')
-            if user_id:
-                try:
-                    user = User.objects.get(id=user_id)
-                except User.DoesNotExist:
-                    return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-            else:
-                 return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
-
-        # 3. Toggle Join/Leave Logic
-        if user in channel.participants.all():
-            channel.participants.remove(user)
-            status_msg = 'left'
-        else:
-            channel.participants.add(user)
-            status_msg = 'joined'
 
-        # 4. Return updated data
+        # 1. Only ever the caller's own membership (no body user_id fallback)
+        if not request.user.is_authenticated:
+            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+        user_id = request.user.pk
+
+        # 2. Toggle Join/Leave Logic
+        try:
+            joined = membership.toggle(channel.pk, user_id)
+        except IntegrityError:
+            # JWT for a user that no longer exists (FK check on insert)
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        # 3. Tell the channel's live streams, return updated data
+        total = membership.participant_count(channel.pk)
+        channel_bus.publish(channel.pk, 'join' if joined else 'leave', {
+            'user_id': user_id,
+            'totalParticipants': total,
+        })
         return Response({
-            'status': status_msg,
-            'totalParticipants': channel.total_participants,
-            'participants': channel.participant_avatars 
-        })
\ No newline at end of file
+            'status': 'joined' if joined else 'left',
+            'totalParticipants': total,
+            'participants': membership.avatars(channel.pk),
+        })
+
+    # --- PRESENCE (in memory, no DB per heartbeat; see rescue.presence) ---
+    # POST   /rescue-channels/<id>/heartbeat/  every ~15-30s while the channel is open
+    # DELETE /rescue-channels/<id>/heartbeat/  when the user closes it
+    @action(detail=True, methods=['post', 'delete'])
+    def heartbeat(self, request, pk=None):
+        try:
+            channel_id = int(pk)
+        except (TypeError, ValueError):
+            return Response({'error': 'Invalid channel'}, status=status.HTTP_404_NOT_FOUND)
+
+        # Only ever the caller's own presence (no body user_id fallback)
+        if not request.user.is_authenticated:
+            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+        user_id = request.user.id
+        if not membership.channel_exists(channel_id):
+            return Response({'error': 'Channel not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if request.method == 'DELETE':
+            channel_presence.leave(channel_id, user_id)
+        else:
+            channel_presence.heartbeat(channel_id, user_id)
+        return Response(channel_presence.snapshot(channel_id))
+
+    # GET /rescue-channels/<id>/presence/ -> {"online": n, "recent": [...]}
+    @action(detail=True, methods=['get'])
+    def presence(self, request, pk=None):
+        try:
+            channel_id = int(pk)
+        except (TypeError, ValueError):
+            return Response({'error': 'Invalid channel'}, status=status.HTTP_404_NOT_FOUND)
+        if not membership.channel_exists(channel_id):
+            return Response({'error': 'Channel not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(channel_presence.snapshot(channel_id))
+
+    # --- EVENTS (in-process bus; live stream at rescue.stream.STREAM_PATH) ---
+    # GET  /rescue-channels/<id>/events/?after=<event id>&replay=N -> buffered events
+    # POST /rescue-channels/<id>/events/ {"text": "..."}           -> post a message
+    @action(detail=True, methods=['get', 'post'])
+    def events(self, request, pk=None):
+        try:
+            channel_id = int(pk)
+        except (TypeError, ValueError):
+            return Response({'error': 'Invalid channel'}, status=status.HTTP_404_NOT_FOUND)
+        if not membership.channel_exists(channel_id):
+            return Response({'error': 'Channel not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if request.method == 'GET':
+            try:
+                after = request.query_params.get('after')
+                after = int(after) if after is not None else None
+                replay = max(0, min(int(request.query_params.get('replay', 20)), MAX_REPLAY))
+            except ValueError:
+                return Response({'error': 'after and replay must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response([
+                {'id': event_id, 'event': event, 'data': json.loads(data)}
+                for event, data, event_id in channel_bus.history(channel_id, after, replay)
+            ])
+
+        # Messages are always sent as the caller
+        if not request.user.is_authenticated:
+            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+        user_id = request.user.id
+
+        text = str(request.data.get('text') or '').strip()
+        if not text:
+            return Response({'error': 'text is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(text) > MAX_MESSAGE_LENGTH:
+            return Response({'error': f'text is limited to {MAX_MESSAGE_LENGTH} characters'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        data = {'user_id': user_id, 'text': text, 'sent_at': round(time.time(), 3)}
+        event_id = channel_bus.publish(channel_id, 'message', data)
+        return Response({'id': event_id, 'event': 'message', 'data': data}, status=status.HTTP_201_CREATED)
@@ -0,0 +1,106 @@
+import gzip
+import hashlib
+import threading
+from collections import namedtuple
+
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+# One pre-encoded JSON document in every encoding we can serve
+Payload = namedtuple('Payload', 'body gzip br etag')
+Built = namedtuple('Built', 'version sections')
+
+SECTIONS = ('disasters', 'first_aid', 'emergency_contacts', 'protocols')
+# What GET /safetyinfo/bundle/ returns (protocols are already nested in disasters)
+BUNDLE_SECTIONS = ('disasters', 'first_aid', 'emergency_contacts')
+
+
+def encode_payload(data):
+    body = JSONRenderer().render(data)
+    return Payload(
+        body=body,
+        gzip=gzip.compress(body, compresslevel=9, mtime=0),
+        br=brotli.compress(body) if brotli else None,
+        etag='"' + hashlib.sha1(body).hexdigest()[:20] + '"',
+    )
+
+
+def _serialize_sections():
+    from .models import ContactCategory, FirstAidGuide, SafetyProtocol
+    from .serializers import (
+        ContactCategorySerializer, DisasterSerializer, FirstAidGuideSerializer, SafetyProtocolSerializer,
+    )
+    from .views import DisasterViewSet
+
+    return {
+        'disasters': DisasterSerializer(DisasterViewSet.queryset.all(), many=True).data,
+        'first_aid': FirstAidGuideSerializer(FirstAidGuide.objects.all(), many=True).data,
+        'emergency_contacts': ContactCategorySerializer(
+            ContactCategory.objects.prefetch_related('contacts'), many=True
+        ).data,
+        'protocols': SafetyProtocolSerializer(SafetyProtocol.objects.all(), many=True).data,
+    }
+
+
+class SafetyBundle:
+    """
+    The whole safety-info dataset, serialized and compressed once per change.
+
+    The version is the change-log head (support.changelog.current_version,
+    a MAX(id) on the primary key), read on every request, so a write in any
+    process is picked up by every other one straight away. The built bytes
+    are shared through the cache under that version, so with Redis only one
+    process pays for the ORM/serializer work; each process also keeps the
+    current build in memory, so a read is one tiny query.
+    """
+
+    def __init__(self, shared_ttl=86400):
+        self.shared_ttl = shared_ttl
+        self._lock = threading.Lock()
+        self._local = None
+
+    @staticmethod
+    def build_key(version):
+        return f'safetyinfo:bundle:{version}'
+
+    def current(self):
+        from .changelog import current_version
+
+        version = current_version()
+        local = self._local
+        if local is None or local.version != version:
+            with self._lock:
+                local = self._local
+                if local is None or local.version != version:
+                    local = cache.get(self.build_key(version)) or self.build(version)
+                    self._local = local
+        return local
+
+    def build(self, version):
+        data = _serialize_sections()
+        sections = {name: encode_payload(data[name]) for name in SECTIONS}
+        bundle = {'version': version}
+        bundle.update((name, data[name]) for name in BUNDLE_SECTIONS)
+        sections['bundle'] = encode_payload(bundle)
+
+        built = Built(version, sections)
+        cache.set(self.build_key(version), built, self.shared_ttl)
+        return built
+
+    def section(self, name):
+        return self.current().sections[name]
+
+    def invalidate(self):
+        """Forget this process's copy and the shared one for the current version."""
+        from .changelog import current_version
+
+        cache.delete(self.build_key(current_version()))
+        self._local = None
+
+
+safety_bundle = SafetyBundle()
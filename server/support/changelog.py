@@ -0,0 +1,134 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Min
+
+from .models import ContactCategory, Disaster, EmergencyContact, FirstAidGuide, SafetyChangeLog, SafetyProtocol
+
+# Change-log kind -> section name in the sync pack
+SECTIONS = {
+    'disaster': 'disasters',
+    'first_aid': 'first_aid',
+    'contact_category': 'emergency_contacts',
+}
+FULL_PACK_TTL = 86400
+
+
+def record(kind, key, deleted=False):
+    """
+    Log a change to a top-level record once the surrounding transaction
+    commits, so stamps are handed out in visibility order and a rolled-back
+    write never shows up in a pack.
+    """
+    key = str(key)
+    transaction.on_commit(lambda: SafetyChangeLog.objects.create(kind=kind, key=key, deleted=deleted))
+
+
+def record_instance(instance, deleted=False):
+    if isinstance(instance, Disaster):
+        record('disaster', instance.pk, deleted)
+    elif isinstance(instance, FirstAidGuide):
+        record('first_aid', instance.pk, deleted)
+    elif isinstance(instance, ContactCategory):
+        record('contact_category', instance.pk, deleted)
+    elif isinstance(instance, SafetyProtocol):
+        record('disaster', instance.disaster_id)
+    elif isinstance(instance, EmergencyContact):
+        record('contact_category', instance.category_id)
+
+
+def current_version():
+    return SafetyChangeLog.objects.aggregate(v=Max('id'))['v'] or 0
+
+
+# =====================================================
+# 📦 SYNC PACKS
+# =====================================================
+
+def _serialize(kind, keys=None):
+    """{key: serialized record} for a kind, optionally only for `keys`."""
+    from .serializers import ContactCategorySerializer, DisasterSerializer, FirstAidGuideSerializer
+    from .views import DisasterViewSet
+
+    if kind == 'disaster':
+        qs, serializer = DisasterViewSet.queryset.all(), DisasterSerializer
+    elif kind == 'first_aid':
+        qs, serializer = FirstAidGuide.objects.all(), FirstAidGuideSerializer
+    else:
+        qs, serializer = ContactCategory.objects.prefetch_related('contacts'), ContactCategorySerializer
+    if keys is not None:
+        qs = qs.filter(pk__in=list(keys))
+    return {str(obj.pk): serializer(obj).data for obj in qs}
+
+
+def _latest_stamps(since):
+    """{(kind, key): (stamp, deleted)} for records changed after `since`."""
+    latest = (
+        SafetyChangeLog.objects.filter(id__gt=since)
+        .values('kind', 'key').annotate(stamp=Max('id'))
+    )
+    stamps = {(row['kind'], row['key']): row['stamp'] for row in latest}
+    deleted = set(
+        SafetyChangeLog.objects.filter(id__in=list(stamps.values()), deleted=True).values_list('id', flat=True)
+    )
+    return {k: (stamp, stamp in deleted) for k, stamp in stamps.items()}
+
+
+def _delta_base(since):
+    """
+    (since, version): `since` drops to 0, i.e. a full pack, when no delta
+    can be built from it: it's ahead of the log (a stamp from some other
+    database), or older than the log's first row (trimmed from the front,
+    so deletions in between are gone).
+    """
+    bounds = SafetyChangeLog.objects.aggregate(first=Min('id'), last=Max('id'))
+    first, version = bounds['first'] or 0, bounds['last'] or 0
+    if since > version or since < first - 1:
+        since = 0
+    return since, version
+
+
+def build_pack(since=0):
+    """
+    Sync pack: every record changed after version `since` (all of them when
+    since=0), each with its version stamp `_v` (0 when a trimmed log no
+    longer has one), plus tombstones for deleted ones. The client stores `version` and sends it back as `since`.
+    """
+    return _build(*_delta_base(since))
+
+
+def _build(since, version):
+    stamps = _latest_stamps(since) if since < version else {}
+
+    pack = {'version': version, 'since': since, 'full': since == 0, 'deleted': {}}
+    for kind, section in SECTIONS.items():
+        changed = {key: stamp for (k, key), (stamp, gone) in stamps.items() if k == kind and not gone}
+        if not since:
+            # Everything, whether or not the (possibly trimmed) log still stamps it
+            records = _serialize(kind)
+            pack[section] = [dict(data, _v=changed.get(key, 0)) for key, data in records.items()]
+            continue
+        records = _serialize(kind, changed) if changed else {}
+        pack[section] = [dict(data, _v=changed[key]) for key, data in records.items()]
+
+        # Logged as changed but no longer there -> deleted too
+        gone = [key for (k, key), (_, is_gone) in stamps.items() if k == kind and is_gone]
+        gone += [key for key in changed if key not in records]
+        if gone and since:
+            pack['deleted'][section] = sorted(gone)
+    return pack
+
+
+def pack_bytes(since=0):
+    """Compact JSON for a pack; full packs are cached per version."""
+    from .bundle import encode_payload
+
+    since, version = _delta_base(since)
+    if since:
+        return encode_payload(_build(since, version))
+
+    key = f'safetyinfo:sync:full:{version}'
+    payload = cache.get(key)
+    if payload is None:
+        payload = encode_payload(_build(0, version))
+        cache.set(key, payload, FULL_PACK_TTL)
+    return payload
@@ -0,0 +1,108 @@
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from support.bundle import safety_bundle
+from support.models import Disaster, SafetyChangeLog, SafetyProtocol
+from support.serializers import DisasterSerializer
+from support.views import DisasterViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class LegacyDisasterSerializer(DisasterSerializer):
+    """The pre-prefetch read path: three filtered queries per disaster."""
+
+    def get_phases_read(self, obj):
+        return {
+            "before": list(obj.protocols.filter(phase='before').values_list('content', flat=True)),
+            "during": list(obj.protocols.filter(phase='during').values_list('content', flat=True)),
+            "after": list(obj.protocols.filter(phase='after').values_list('content', flat=True)),
+        }
+
+
+class Command(BaseCommand):
+    help = ('Compares safety-info disaster list latency and query count: old (N+1 serializer), '
+            'prefetched serializer, and the pre-built bundle the list endpoint now serves')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='50,500,5000', help='Comma separated protocol counts')
+        parser.add_argument('--per-disaster', type=int, default=10, help='Protocols per disaster')
+        parser.add_argument('--requests', type=int, default=20)
+
+    def handle(self, *args, **opts):
+        request = APIRequestFactory().get('/api/v1/safetyinfo/disasters/')
+        bundle_view = DisasterViewSet.as_view({'get': 'list'})
+        # The serializer paths render the queryset directly; the view's list()
+        # now always answers from the bundle
+        paths = {
+            'old': lambda: JSONRenderer().render(LegacyDisasterSerializer(Disaster.objects.all(), many=True).data),
+            'prefetch': lambda: JSONRenderer().render(
+                DisasterSerializer(DisasterViewSet.queryset.all(), many=True).data
+            ),
+            'bundle': lambda: bundle_view(request).content,  # pre-encoded HttpResponse
+        }
+
+        for size in sorted(int(s) for s in opts['sizes'].split(',')):
+            # Seeded inside a transaction and rolled back; safe on a dev database
+            version = None
+            try:
+                with transaction.atomic():
+                    disasters = self._seed(size, opts['per_disaster'])
+                    # Moves the bundle version, as a real write would
+                    version = SafetyChangeLog.objects.create(kind='disaster', key='bench').pk
+                    line = [f'{size:>6} protocols / {disasters:>4} disasters:']
+                    for name, render in paths.items():
+                        ms, queries = self._measure(render, opts['requests'])
+                        line.append(f'{name} p50={ms:8.2f} ms ({queries} queries)')
+                    self.stdout.write('  '.join(line))
+                    raise Rollback()
+            except Rollback:
+                pass
+            finally:
+                # Don't leave a bundle of rolled-back data behind under a version id
+                if version is not None:
+                    cache.delete(safety_bundle.build_key(version))
+                safety_bundle._local = None
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (seed data rolled back).'))
+
+    def _seed(self, size, per_disaster):
+        disasters = Disaster.objects.bulk_create([
+            Disaster(slug=f'bench-{n}', title=f'Bench disaster {n}', icon_name='Droplets', color_theme='blue')
+            for n in range(max(1, size // per_disaster))
+        ])
+        phases = ('before', 'during', 'after')
+        SafetyProtocol.objects.bulk_create([
+            SafetyProtocol(
+                disaster=disasters[i % len(disasters)],
+                phase=phases[i % 3],
+                content=f'Benchmark safety instruction number {i}',
+                order=i // len(disasters),
+            )
+            for i in range(size)
+        ], batch_size=2000)
+        return len(disasters)
+
+    @staticmethod
+    def _measure(render, n):
+        render()  # warm up (builds the bundle once)
+        reset_queries()  # the query log is a bounded deque; start from empty
+        with CaptureQueriesContext(connection) as ctx:
+            render()
+        queries = len(ctx.captured_queries)
+
+        timings = []
+        for _ in range(n):
+            start = time.perf_counter()
+            render()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings), queries
@@ -0,0 +1,66 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from support.search import SearchIndex
+
+WORDS = (
+    'bleeding pressure bandage wound snake bite venom limb immobilize calm hospital flood water '
+    'evacuate higher ground electricity switch gas leak fire smoke exit crawl door heat burn cool '
+    'fracture splint breathing airway chest compression cpr pulse shock blanket warm drink dehydration '
+    'earthquake drop cover hold shelter debris landslide cyclone wind window storm radio battery torch '
+    'medicine kit documents family plan meeting point children elderly pets boil purify tablets'
+).split()
+FILLER = [f'w{n}' for n in range(20000)]
+QUERIES = ['bleeding', 'snake bite', 'blee', 'sn', 'evacuate higher', 'cpr chest', 'fire exit door',
+           'w123', 'burn cool water', 'fract', 'gas leak', 'purify water tablets']
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the in-process safety search index over a synthetic corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--docs', type=int, default=100000, help='Synthetic protocol steps')
+        parser.add_argument('--queries', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts['seed'])
+
+        def sentence():
+            words = rng.choices(WORDS, k=rng.randint(4, 12))
+            # Zipf-ish long tail of rare words
+            words += [FILLER[int(rng.paretovariate(1.2)) % len(FILLER)] for _ in range(rng.randint(2, 8))]
+            rng.shuffle(words)
+            return ' '.join(words)
+
+        index = SearchIndex()
+        start = time.perf_counter()
+        for n in range(opts['docs']):
+            index.add(('protocol', n), sentence(), {'type': 'protocol', 'id': n})
+        build = time.perf_counter() - start
+        self.stdout.write(
+            f"Indexed {len(index)} docs / {len(index.vocabulary)} terms in {build:.2f}s"
+        )
+
+        timings = {q: [] for q in QUERIES}
+        for _ in range(opts['queries']):
+            q = rng.choice(QUERIES)
+            start = time.perf_counter()
+            index.search(q, 10)
+            timings[q].append((time.perf_counter() - start) * 1000)
+
+        everything = sorted(t for ts in timings.values() for t in ts)
+        for q, ts in timings.items():
+            if ts:
+                self.stdout.write(f'  {q!r:<24} p50={statistics.median(ts):7.2f} ms  max={max(ts):7.2f} ms')
+        p99 = everything[min(len(everything) - 1, int(len(everything) * 0.99))]
+        self.stdout.write(f'all queries: p50={statistics.median(everything):.2f} ms  p99={p99:.2f} ms')
+
+        start = time.perf_counter()
+        for n in range(1000):
+            index.add(('protocol', n), sentence(), {'type': 'protocol', 'id': n})
+        self.stdout.write(f'incremental re-index: {(time.perf_counter() - start):.3f} ms/doc')
+        self.stdout.write(self.style.SUCCESS('Done.'))
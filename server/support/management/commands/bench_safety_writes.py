@@ -0,0 +1,80 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+
+from support.models import Disaster, SafetyProtocol
+from support.serializers import DisasterSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_update(instance, phases):
+    """The old write path: delete everything, then one INSERT per step, no transaction."""
+    instance.protocols.all().delete()
+    for phase_name, steps in phases.items():
+        for index, content in enumerate(steps):
+            if content.strip():
+                SafetyProtocol.objects.create(disaster=instance, phase=phase_name, content=content, order=index)
+
+
+def diff_update(instance, phases):
+    serializer = DisasterSerializer(instance, data={'phases': phases}, partial=True)
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks editing a large disaster guide: delete-and-recreate vs diff-based bulk upsert'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,500,2000', help='Comma separated steps per guide')
+        parser.add_argument('--edits', type=float, default=0.05, help='Fraction of steps changed per save')
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **opts):
+        for size in sorted(int(s) for s in opts['sizes'].split(',')):
+            line = [f'{size:>5} steps:']
+            for name, fn in (('old', legacy_update), ('new', diff_update)):
+                ms, queries = self._measure(fn, size, opts['edits'], opts['rounds'])
+                line.append(f'{name} p50={ms:8.2f} ms ({queries} queries)')
+            self.stdout.write('  '.join(line))
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (seed data rolled back).'))
+
+    def _measure(self, fn, size, edits, rounds):
+        timings, queries = [], 0
+        # Seeded inside a transaction and rolled back; safe on a dev database
+        try:
+            with transaction.atomic():
+                disaster = Disaster.objects.create(
+                    slug='bench-write', title='Bench', icon_name='Droplets', color_theme='blue'
+                )
+                phases = {
+                    phase: [f'{phase} instruction {i}' for i in range(size // 3)]
+                    for phase in ('before', 'during', 'after')
+                }
+                legacy_update(disaster, phases)
+
+                for n in range(rounds):
+                    # A typical admin save: reword a few steps, add one, drop one
+                    for steps in phases.values():
+                        for i in random.sample(range(len(steps)), max(1, int(len(steps) * edits))):
+                            steps[i] = f'{steps[i].split(" #")[0]} #{n}'
+                        steps.append(f'new step {n}')
+                        steps.pop(0)
+
+                    reset_queries()
+                    with CaptureQueriesContext(connection) as ctx:
+                        start = time.perf_counter()
+                        fn(Disaster.objects.get(pk='bench-write'), {k: list(v) for k, v in phases.items()})
+                        timings.append((time.perf_counter() - start) * 1000)
+                    queries = len(ctx.captured_queries)
+                raise Rollback()
+        except Rollback:
+            pass
+        return statistics.median(timings), queries
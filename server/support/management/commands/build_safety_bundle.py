@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from support.bundle import SECTIONS, safety_bundle
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the safety-info bundle for the current change-log version and reports its sizes. '
+            'Only warms other workers when CACHES is shared (e.g. Redis); with the default LocMemCache '
+            'the build is discarded when this command exits and workers build on first request.')
+
+    def handle(self, *args, **opts):
+        start = time.perf_counter()
+        safety_bundle.invalidate()
+        built = safety_bundle.current()
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.stdout.write(f'Bundle version {built.version} built in {elapsed:.1f} ms')
+        for name in ('bundle',) + SECTIONS:
+            payload = built.sections[name]
+            br = f'{len(payload.br):>9} br' if payload.br is not None else '   (no brotli)'
+            self.stdout.write(
+                f'  {name:<20} {len(payload.body):>9} raw  {len(payload.gzip):>9} gzip  {br}  {payload.etag}'
+            )
+        self.stdout.write(self.style.SUCCESS('Done.'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:26
+
+from django.db import migrations, models
+
+
+def stamp_existing_records(apps, schema_editor):
+    # Give every current record a version stamp so the first full pack has one
+    SafetyChangeLog = apps.get_model('support', 'SafetyChangeLog')
+    entries = [
+        SafetyChangeLog(kind=kind, key=str(pk))
+        for kind, model in (('disaster', 'Disaster'), ('first_aid', 'FirstAidGuide'), ('contact_category', 'ContactCategory'))
+        for pk in apps.get_model('support', model).objects.values_list('pk', flat=True)
+    ]
+    SafetyChangeLog.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0002_contactcategory_emergencycontact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SafetyChangeLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('disaster', 'Disaster'), ('first_aid', 'First Aid Guide'), ('contact_category', 'Contact Category')], max_length=20)),
+                ('key', models.CharField(max_length=50)),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(stamp_existing_records, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+
+def split_existing_steps(apps, schema_editor):
+    FirstAidGuide = apps.get_model('support', 'FirstAidGuide')
+    guides = list(FirstAidGuide.objects.all())
+    for guide in guides:
+        guide.steps = [step.strip() for step in (guide.steps_text or '').split('\n') if step.strip()]
+    FirstAidGuide.objects.bulk_update(guides, ['steps'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0003_safetychangelog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='firstaidguide',
+            name='steps',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(split_existing_steps, migrations.RunPython.noop),
+    ]
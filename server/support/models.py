@@ -46,9 +46,21 @@ class FirstAidGuide(models.Model):
     title = models.CharField(max_length=100)
     guide_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
     
-    # Store steps as a newline-separated string or use JSONField if using MySQL 5.7+
-    # Here we use TextField for broad compatibility; split by newline in serializer.
+    # Admins edit steps as newline-separated text...
     steps_text = models.TextField(help_text="Enter each step on a new line")
+    # ...and save() materializes the parsed list here, so reads never re-split it
+    steps = models.JSONField(default=list, editable=False, blank=True)
+
+    @staticmethod
+    def split_steps(text):
+        return [step.strip() for step in (text or '').split('\n') if step.strip()]
+
+    def save(self, *args, **kwargs):
+        self.steps = self.split_steps(self.steps_text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'steps_text' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'steps'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -79,4 +91,25 @@ class EmergencyContact(models.Model):
     color_theme = models.CharField(max_length=50)
 
     def __str__(self):
-        return f"{self.name} ({self.number})"
\ No newline at end of file
+        return f"{self.name} ({self.number})"
+
+class SafetyChangeLog(models.Model):
+    """
+    Append-only log of safety-content changes; the id is the version stamp
+    the offline sync pack hands out. One row per changed top-level record
+    (protocol edits log their disaster, contact edits their category).
+    """
+    KIND_CHOICES = [
+        ('disaster', 'Disaster'),
+        ('first_aid', 'First Aid Guide'),
+        ('contact_category', 'Contact Category'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    key = models.CharField(max_length=50)  # slug or pk of the record
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.kind}:{self.key}{' (deleted)' if self.deleted else ''}"
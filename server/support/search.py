@@ -0,0 +1,316 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOP_WORDS = frozenset('a an and are as at be by do for from if in is it of on or the to with you your'.split())
+
+# BM25
+K1 = 1.2
+B = 0.75
+# Score multiplier for a term only reached by prefix ("bleed" -> "bleeding")
+PREFIX_WEIGHT = 0.7
+MAX_PREFIX_EXPANSION = 50
+TITLE_BOOST = 3
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+class SearchIndex:
+    """
+    In-process inverted index with BM25 ranking and prefix matching.
+
+    Documents are keyed by any hashable id and carry a small `meta` dict
+    returned with results. Internally each gets a small int (cheap to hash
+    and intersect); postings are term -> {int: tf} and a sorted vocabulary
+    makes prefix expansion a bisect. No Django in here, so the benchmark can
+    drive it directly.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.vocabulary = []
+        self.doc_terms = {}   # int -> {term: tf}, needed for removal
+        self.doc_len = {}
+        self.meta = {}
+        self.total_len = 0
+        self._ids = {}        # external key -> int
+        self._keys = {}       # int -> external key
+        self._next_id = 0
+        self._sorted = {}     # term -> impact-ordered postings, see _impacts
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def add(self, key, text, meta, title=''):
+        self.remove(key)
+        doc = self._next_id
+        self._next_id += 1
+        self._ids[key] = doc
+        self._keys[doc] = key
+
+        terms = defaultdict(int)
+        for token in tokenize(text):
+            terms[token] += 1
+        for token in tokenize(title):
+            terms[token] += TITLE_BOOST
+        for term, tf in terms.items():
+            self._sorted.pop(term, None)
+            postings = self.postings[term]
+            if not postings:
+                bisect.insort(self.vocabulary, term)
+            postings[doc] = tf
+        length = sum(terms.values())
+        self.doc_terms[doc] = dict(terms)
+        self.doc_len[doc] = length
+        self.meta[doc] = meta
+        self.total_len += length
+
+    def remove(self, key):
+        doc = self._ids.pop(key, None)
+        if doc is None:
+            return
+        del self._keys[doc]
+        for term in self.doc_terms.pop(doc):
+            self._sorted.pop(term, None)
+            postings = self.postings[term]
+            postings.pop(doc, None)
+            if not postings:
+                del self.postings[term]
+                i = bisect.bisect_left(self.vocabulary, term)
+                if i < len(self.vocabulary) and self.vocabulary[i] == term:
+                    del self.vocabulary[i]
+        self.total_len -= self.doc_len.pop(doc)
+        self.meta.pop(doc, None)
+
+    def expand(self, token):
+        """[(term, weight)]: the token itself plus vocabulary terms it prefixes."""
+        found = [(token, 1.0)] if token in self.postings else []
+        if len(token) < 2:
+            return found
+        i = bisect.bisect_left(self.vocabulary, token)
+        while i < len(self.vocabulary) and len(found) < MAX_PREFIX_EXPANSION:
+            term = self.vocabulary[i]
+            if not term.startswith(token):
+                break
+            if term != token:
+                found.append((term, PREFIX_WEIGHT))
+            i += 1
+        return found
+
+    def _impacts(self, term):
+        """
+        ({doc: bm25 term weight}, [(doc, weight)] heaviest first) for a term,
+        cached until the term's postings change. Lengths are normalised
+        against the average at the time the list was (re)built.
+        """
+        entry = self._sorted.get(term)
+        if entry is None:
+            avg_len = self.total_len / len(self.doc_len)
+            weights = {
+                doc: tf * (K1 + 1) / (tf + K1 * (1 - B + B * self.doc_len[doc] / avg_len))
+                for doc, tf in self.postings[term].items()
+            }
+            entry = self._sorted[term] = (weights, sorted(weights.items(), key=lambda item: -item[1]))
+        return entry
+
+    def search(self, query, limit=10):
+        """
+        [(score, key, meta)] best first. Docs containing every query word
+        (or a word it prefixes) rank ahead of partial matches.
+
+        All-words matches come from intersecting the posting sets, smallest
+        first. Any remaining slots are filled with a threshold algorithm over
+        impact-ordered postings: walk each word's heaviest postings first,
+        score every doc seen in full, and stop once no unseen doc could beat
+        the current top. Common words cost a few hundred postings, not all.
+        """
+        if not self.doc_len:
+            return []
+        n = len(self.doc_len)
+
+        groups = []  # one per query word: [(idf * prefix weight, weights, ordered), ...]
+        for token in dict.fromkeys(tokenize(query)):
+            lists = []
+            for term, weight in self.expand(token):
+                weights, ordered = self._impacts(term)
+                factor = weight * math.log(1 + (n - len(weights) + 0.5) / (len(weights) + 0.5))
+                lists.append((factor, weights, ordered))
+            if lists:
+                groups.append(lists)
+        if not groups:
+            return []
+
+        def full_score_group(lists, doc):
+            return max(factor * weights.get(doc, 0.0) for factor, weights, _ in lists)
+
+        def full_score(doc):
+            return sum(full_score_group(lists, doc) for lists in groups)
+
+        top = []
+        if len(groups) > 1:
+            common = None
+            for lists in sorted(groups, key=lambda lists: sum(len(w) for _, w, _ in lists)):
+                if len(lists) == 1:
+                    docs = lists[0][1].keys()
+                else:
+                    docs = set().union(*(weights.keys() for _, weights, _ in lists))
+                common = set(docs) if common is None else common & docs
+                if not common:
+                    break
+            if common:
+                scores = dict.fromkeys(common, 0.0)
+                for lists in groups:
+                    if len(lists) == 1:
+                        factor, weights, _ = lists[0]
+                        for doc in common:
+                            scores[doc] += factor * weights[doc]
+                    else:
+                        for doc in common:
+                            scores[doc] += full_score_group(lists, doc)
+                top = heapq.nlargest(limit, ((score, doc) for doc, score in scores.items()))
+
+        if len(top) < limit:
+            skip = {doc for _, doc in top}
+            top += self._threshold_top(groups, full_score, limit - len(top), skip)
+        return [(score, self._keys[doc], self.meta[doc]) for score, doc in top]
+
+    @staticmethod
+    def _threshold_top(groups, full_score, limit, skip):
+        streams = [
+            heapq.merge(*(((-factor * w, doc) for doc, w in ordered) for factor, _, ordered in lists))
+            for lists in groups
+        ]
+        bounds = [float('inf')] * len(streams)
+        live = list(range(len(streams)))
+        seen, top = set(skip), []
+        while live:
+            for i in list(live):
+                item = next(streams[i], None)
+                if item is None:
+                    live.remove(i)
+                    bounds[i] = 0.0
+                    continue
+                bounds[i] = -item[0]
+                doc = item[1]
+                if doc in seen:
+                    continue
+                seen.add(doc)
+                entry = (full_score(doc), doc)
+                if len(top) < limit:
+                    heapq.heappush(top, entry)
+                elif entry > top[0]:
+                    heapq.heapreplace(top, entry)
+            if len(top) == limit and top[0][0] >= sum(bounds):
+                break
+        return sorted(top, reverse=True)
+
+
+# =====================================================
+# 🔎 SAFETY CONTENT INDEX (kept in step via the change log)
+# =====================================================
+
+class SafetySearch:
+    """
+    SearchIndex over every SafetyProtocol and FirstAidGuide, built on first
+    use. Updates are incremental: the index remembers the last change-log
+    version it applied and, at most every `check_interval` seconds (or right
+    away after a local write), reindexes only the records logged since.
+    That works the same for writes made by other processes.
+    """
+
+    def __init__(self, check_interval=2):
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._index = None
+        self._version = 0
+        self._checked_at = 0.0
+        self._protocol_docs = defaultdict(set)  # disaster slug -> protocol doc ids
+
+    def mark_stale(self):
+        self._checked_at = 0.0
+
+    def search(self, query, limit=10):
+        with self._lock:
+            self.refresh()
+            return self._index.search(query, limit)
+
+    def refresh(self):
+        from .changelog import current_version
+
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self._index is None:
+                self.rebuild()
+            else:
+                version = current_version()
+                if version != self._version:
+                    self._apply_changes(version)
+            self._checked_at = now
+
+    def rebuild(self):
+        from .changelog import current_version
+        from .models import Disaster, FirstAidGuide
+
+        version = current_version()
+        self._index = SearchIndex()
+        self._protocol_docs = defaultdict(set)
+        for disaster in Disaster.objects.prefetch_related('protocols'):
+            self._index_disaster(disaster)
+        for guide in FirstAidGuide.objects.all():
+            self._index_guide(guide)
+        self._version = version
+
+    def _apply_changes(self, version):
+        from .models import Disaster, FirstAidGuide, SafetyChangeLog
+
+        changed = set(
+            SafetyChangeLog.objects.filter(id__gt=self._version, id__lte=version).values_list('kind', 'key')
+        )
+        slugs = {key for kind, key in changed if kind == 'disaster'}
+        guide_ids = {int(key) for kind, key in changed if kind == 'first_aid'}
+
+        for slug in slugs:
+            for doc in self._protocol_docs.pop(slug, ()):
+                self._index.remove(doc)
+        for disaster in Disaster.objects.filter(slug__in=slugs).prefetch_related('protocols'):
+            self._index_disaster(disaster)
+
+        for guide_id in guide_ids:
+            self._index.remove(('first_aid', guide_id))
+        for guide in FirstAidGuide.objects.filter(id__in=guide_ids):
+            self._index_guide(guide)
+        self._version = version
+
+    def _index_disaster(self, disaster):
+        for protocol in disaster.protocols.all():
+            doc = ('protocol', protocol.id)
+            self._index.add(doc, protocol.content, {
+                'type': 'protocol',
+                'id': protocol.id,
+                'disaster': disaster.slug,
+                'disaster_title': disaster.title,
+                'phase': protocol.phase,
+                'text': protocol.content,
+            }, title=disaster.title)
+            self._protocol_docs[disaster.slug].add(doc)
+
+    def _index_guide(self, guide):
+        self._index.add(('first_aid', guide.id), guide.steps_text, {
+            'type': 'first_aid',
+            'id': guide.id,
+            'title': guide.title,
+            'guide_type': guide.guide_type,
+            'steps': guide.steps,
+        }, title=guide.title)
+
+
+safety_search = SafetySearch()
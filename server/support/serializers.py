@@ -1,7 +1,12 @@
 from rest_framework import serializers
 from .models import Disaster, FirstAidGuide, SafetyProtocol,ContactCategory, EmergencyContact
 
+from collections import defaultdict, deque
+
 from django.db import transaction
+from django.db.models import F
+
+from . import changelog
 
 class SafetyProtocolSerializer(serializers.ModelSerializer):
     class Meta:
@@ -18,11 +23,12 @@ class DisasterSerializer(serializers.ModelSerializer):
         fields = ['slug', 'title', 'icon_name', 'color_theme', 'phases', 'phases_read']
 
     def get_phases_read(self, obj):
-        return {
-            "before": obj.protocols.filter(phase='before').values_list('content', flat=True),
-            "during": obj.protocols.filter(phase='during').values_list('content', flat=True),
-            "after": obj.protocols.filter(phase='after').values_list('content', flat=True),
-        }
+        # Group in Python: with DisasterViewSet's prefetch this is zero extra
+        # queries, instead of three per disaster
+        phases = {"before": [], "during": [], "after": []}
+        for protocol in obj.protocols.all():
+            phases.setdefault(protocol.phase, []).append(protocol.content)
+        return phases
 
     def to_representation(self, instance):
         # Merge the read_only field into the main response for easier frontend handling
@@ -32,50 +38,93 @@ class DisasterSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         phases_data = validated_data.pop('phases', {})
-        disaster = Disaster.objects.create(**validated_data)
-        self._save_protocols(disaster, phases_data)
+        with transaction.atomic():
+            disaster = Disaster.objects.create(**validated_data)
+            self._save_protocols(disaster, phases_data)
         return disaster
 
     def update(self, instance, validated_data):
         phases_data = validated_data.pop('phases', None)
-        # Update standard fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-
-        if phases_data is not None:
-            # Clear old protocols and re-add new ones
-            instance.protocols.all().delete()
-            self._save_protocols(instance, phases_data)
-        
+        with transaction.atomic():
+            # Update standard fields
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+
+            if phases_data is not None:
+                self._save_protocols(instance, phases_data)
+
         return instance
 
     def _save_protocols(self, disaster, phases_data):
+        """
+        Diff the submitted steps against what's stored and write only the
+        difference, in a handful of bulk statements:
+
+        - a step whose text already exists in that phase keeps its row; if it
+          just moved, rows moved by the same amount share one UPDATE
+          (inserting a step at the top is a single `order = order + 1`)
+        - reworded steps reuse leftover rows (bulk_update)
+        - anything else is a bulk_create or a delete
+        """
+        existing = defaultdict(lambda: defaultdict(deque))
+        for protocol in disaster.protocols.all():
+            existing[protocol.phase][protocol.content].append(protocol)
+
+        moved = defaultdict(list)  # order delta -> pks
+        unmatched = []
         for phase_name, steps in phases_data.items():
             for index, content in enumerate(steps):
-                if content.strip(): # Skip empty lines
-                    SafetyProtocol.objects.create(
-                        disaster=disaster,
-                        phase=phase_name,
-                        content=content,
-                        order=index
-                    )
+                if not content.strip(): # Skip empty lines
+                    continue
+                same_text = existing[phase_name].get(content)
+                if same_text:
+                    protocol = same_text.popleft()
+                    if protocol.order != index:
+                        moved[index - protocol.order].append(protocol.pk)
+                else:
+                    unmatched.append((phase_name, index, content))
+
+        leftovers = defaultdict(list)
+        for phase_name, by_content in existing.items():
+            for rows in by_content.values():
+                leftovers[phase_name].extend(rows)
+        for rows in leftovers.values():
+            rows.sort(key=lambda p: p.order)
+
+        to_update, to_create = [], []
+        for phase_name, index, content in unmatched:
+            if leftovers[phase_name]:
+                protocol = leftovers[phase_name].pop(0)
+                protocol.content, protocol.order = content, index
+                to_update.append(protocol)
+            else:
+                to_create.append(SafetyProtocol(disaster=disaster, phase=phase_name, content=content, order=index))
+        to_delete = [p.pk for rows in leftovers.values() for p in rows]
+
+        if to_delete:
+            SafetyProtocol.objects.filter(pk__in=to_delete).delete()
+        for delta, pks in moved.items():
+            SafetyProtocol.objects.filter(pk__in=pks).update(order=F('order') + delta)
+        if to_update:
+            SafetyProtocol.objects.bulk_update(to_update, ['content', 'order'], batch_size=500)
+        if to_create:
+            SafetyProtocol.objects.bulk_create(to_create, batch_size=500)
+        if to_delete or moved or to_update or to_create:
+            # Bulk operations don't send model signals; log the change so the
+            # bundle, sync packs and search pick it up
+            changelog.record('disaster', disaster.pk)
 
 # ... Keep FirstAidGuideSerializer as is ...
 class FirstAidGuideSerializer(serializers.ModelSerializer):
-
-
-
-    steps = serializers.SerializerMethodField()
+    # Parsed once on save (FirstAidGuide.steps); reading is just the stored list
+    steps = serializers.ListField(child=serializers.CharField(), read_only=True)
     steps_text = serializers.CharField(write_only=True)
 
     class Meta:
         model = FirstAidGuide
         fields = ['id', 'title', 'guide_type', 'steps', 'steps_text']
 
-    def get_steps(self, obj):
-        if not obj.steps_text: return []
-        return [step.strip() for step in obj.steps_text.split('\n') if step.strip()]
 class EmergencyContactSerializer(serializers.ModelSerializer):
     color = serializers.CharField(source='color_theme')
     icon = serializers.CharField(source='icon_name')
@@ -94,25 +143,54 @@ class ContactCategorySerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         contacts_data = validated_data.pop('contacts')
-        # Create Category
-        category = ContactCategory.objects.create(**validated_data)
-        # Create nested Contacts
-        for contact in contacts_data:
-            EmergencyContact.objects.create(category=category, **contact)
+        with transaction.atomic():
+            # Create Category
+            category = ContactCategory.objects.create(**validated_data)
+            # Create nested Contacts
+            EmergencyContact.objects.bulk_create([
+                EmergencyContact(category=category, **contact) for contact in contacts_data
+            ])
         return category
 
     def update(self, instance, validated_data):
         contacts_data = validated_data.pop('contacts', None)
-        
-        # Update Category fields
-        instance.title = validated_data.get('title', instance.title)
-        instance.order = validated_data.get('order', instance.order)
-        instance.save()
-
-        # Update Contacts (Strategy: Delete old, create new)
-        if contacts_data is not None:
-            instance.contacts.all().delete()
-            for contact in contacts_data:
-                EmergencyContact.objects.create(category=instance, **contact)
-        
-        return instance
\ No newline at end of file
+
+        with transaction.atomic():
+            # Update Category fields
+            instance.title = validated_data.get('title', instance.title)
+            instance.order = validated_data.get('order', instance.order)
+            instance.save()
+
+            if contacts_data is not None:
+                self._save_contacts(instance, contacts_data)
+
+        return instance
+
+    def _save_contacts(self, category, contacts_data):
+        """
+        Contacts have no client-side id, so match them by position (they're
+        listed in id order): rewrite changed rows in place, append extras,
+        drop the tail. Unchanged contacts aren't touched at all.
+        """
+        existing = list(category.contacts.order_by('id'))
+        fields = ['name', 'number', 'icon_name', 'color_theme']
+
+        to_update = []
+        for contact, data in zip(existing, contacts_data):
+            changed = [f for f in fields if f in data and getattr(contact, f) != data[f]]
+            if changed:
+                for f in changed:
+                    setattr(contact, f, data[f])
+                to_update.append(contact)
+        to_create = [EmergencyContact(category=category, **data) for data in contacts_data[len(existing):]]
+        to_delete = [contact.pk for contact in existing[len(contacts_data):]]
+
+        if to_delete:
+            EmergencyContact.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            EmergencyContact.objects.bulk_update(to_update, fields, batch_size=500)
+        if to_create:
+            EmergencyContact.objects.bulk_create(to_create, batch_size=500)
+        if to_delete or to_update or to_create:
+            # Bulk operations don't send model signals
+            changelog.record('contact_category', category.pk)
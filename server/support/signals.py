@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from . import changelog
+from .search import safety_search
+from .models import ContactCategory, Disaster, EmergencyContact, FirstAidGuide, SafetyProtocol
+
+
+def safety_info_saved(sender, instance, **kwargs):
+    # The change-log row (written on commit) is what moves the bundle version
+    changelog.record_instance(instance)
+    transaction.on_commit(safety_search.mark_stale)
+
+
+def safety_info_deleted(sender, instance, **kwargs):
+    changelog.record_instance(instance, deleted=True)
+    transaction.on_commit(safety_search.mark_stale)
+
+
+for model in (Disaster, SafetyProtocol, FirstAidGuide, ContactCategory, EmergencyContact):
+    post_save.connect(safety_info_saved, sender=model, dispatch_uid=f'safety_info_save_{model.__name__}')
+    post_delete.connect(safety_info_deleted, sender=model, dispatch_uid=f'safety_info_delete_{model.__name__}')
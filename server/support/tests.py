@@ -1,3 +1,406 @@
-from django.test import TestCase
+import math
+import random
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from .bundle import safety_bundle
+from .search import SafetySearch, SearchIndex, tokenize
+from .models import ContactCategory, Disaster, EmergencyContact, FirstAidGuide, SafetyChangeLog, SafetyProtocol
+from .serializers import ContactCategorySerializer, DisasterSerializer
+from .views import DisasterViewSet
+
+
+class DisasterListQueryTests(TestCase):
+    def setUp(self):
+        # Rolled-back tests reuse change-log ids, i.e. bundle versions
+        cache.clear()
+        # Run the bundle invalidation hooks that would fire on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            for n in range(5):
+                disaster = Disaster.objects.create(
+                    slug=f'disaster-{n}', title=f'Disaster {n}', icon_name='Droplets', color_theme='blue'
+                )
+                SafetyProtocol.objects.bulk_create([
+                    SafetyProtocol(disaster=disaster, phase=phase, content=f'{phase} step {i}', order=i)
+                    for phase in ('before', 'during', 'after')
+                    for i in range(3)
+                ])
+
+    def test_serializing_disasters_is_constant_queries(self):
+        # One query for disasters + one prefetch for all their protocols
+        with self.assertNumQueries(2):
+            data = DisasterSerializer(DisasterViewSet.queryset.all(), many=True).data
+        self.assertEqual(len(data), 5)
+
+    def test_phases_grouped_in_order(self):
+        response = APIClient().get('/api/v1/safetyinfo/disasters/disaster-0/')
+        self.assertEqual(response.json()['phases'], {
+            'before': ['before step 0', 'before step 1', 'before step 2'],
+            'during': ['during step 0', 'during step 1', 'during step 2'],
+            'after': ['after step 0', 'after step 1', 'after step 2'],
+        })
+
+    def test_list_is_served_from_the_bundle(self):
+        client = APIClient()
+        first = client.get('/api/v1/safetyinfo/disasters/')
+        self.assertEqual(len(first.json()), 5)
+
+        with self.assertNumQueries(1):  # just the change-log version check
+            second = client.get('/api/v1/safetyinfo/disasters/')
+        self.assertEqual(second.content, first.content)
+
+        not_modified = client.get('/api/v1/safetyinfo/disasters/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_only_versioned_urls_are_long_lived(self):
+        client = APIClient()
+        for url in ('/api/v1/safetyinfo/disasters/', '/api/v1/safetyinfo/first-aid/',
+                    '/api/v1/safetyinfo/emergency-contacts/', '/api/v1/safetyinfo/bundle/'):
+            response = client.get(url)
+            self.assertEqual(response['Cache-Control'], 'no-cache', url)
+            self.assertTrue(response['ETag'], url)
+
+        version = client.get('/api/v1/safetyinfo/bundle/').json()['version']
+        pinned = client.get('/api/v1/safetyinfo/disasters/', {'v': version})
+        self.assertIn('immutable', pinned['Cache-Control'])
+        stale = client.get('/api/v1/safetyinfo/disasters/', {'v': version - 1})
+        self.assertEqual(stale['Cache-Control'], 'no-cache')
+
+    def test_write_invalidates_the_bundle(self):
+        client = APIClient()
+        client.get('/api/v1/safetyinfo/disasters/')
+        before = safety_bundle.current().version
+        with self.captureOnCommitCallbacks(execute=True):
+            Disaster.objects.create(slug='new', title='New', icon_name='Flame', color_theme='orange')
+        self.assertGreater(safety_bundle.current().version, before)
+        self.assertEqual(len(client.get('/api/v1/safetyinfo/disasters/').json()), 6)
+
+    def test_write_from_another_process_is_seen(self):
+        client = APIClient()
+        client.get('/api/v1/safetyinfo/disasters/')
+        # Another worker's write: no signal ran here, only the change-log row is shared
+        Disaster.objects.filter(slug='disaster-0').update(title='Renamed elsewhere')
+        SafetyChangeLog.objects.create(kind='disaster', key='disaster-0')
+        titles = [d['title'] for d in client.get('/api/v1/safetyinfo/disasters/').json()]
+        self.assertIn('Renamed elsewhere', titles)
+
+
+class DiffWriteTests(TestCase):
+    def setUp(self):
+        self.disaster = Disaster.objects.create(slug='flood', title='Flood', icon_name='Droplets', color_theme='blue')
+        DisasterSerializer()._save_protocols(self.disaster, {
+            'before': ['Pack a bag', 'Charge phones', 'Move uphill'],
+            'during': ['Stay off bridges'],
+        })
+        self.category = ContactCategory.objects.create(title='Police', order=1)
+        EmergencyContact.objects.bulk_create([
+            EmergencyContact(category=self.category, name=f'Station {n}', number=f'10{n}',
+                             icon_name='ShieldAlert', color_theme='blue')
+            for n in range(3)
+        ])
+
+    def save_steps(self, phases, queries):
+        rows = {p.content: p.pk for p in self.disaster.protocols.all()}
+        with self.assertNumQueries(queries):
+            DisasterSerializer()._save_protocols(self.disaster, phases)
+        self.assertEqual(DisasterSerializer(self.disaster).data['phases'],
+                         {'before': [], 'during': [], 'after': [], **phases})
+        return rows, {p.content: p.pk for p in self.disaster.protocols.all()}
+
+    def test_unchanged_steps_are_one_read(self):
+        self.save_steps({'before': ['Pack a bag', 'Charge phones', 'Move uphill'],
+                         'during': ['Stay off bridges']}, queries=1)
+
+    def test_inserting_at_the_top_shifts_the_rest_in_one_update(self):
+        # read + one `order = order + 1` + one insert
+        before, after = self.save_steps({'before': ['Listen to the radio', 'Pack a bag', 'Charge phones',
+                                                    'Move uphill'],
+                                         'during': ['Stay off bridges']}, queries=3)
+        self.assertEqual({k: after[k] for k in before}, before)
+
+    def test_reorder_moves_rows_without_rewriting_them(self):
+        # read + one UPDATE per distinct shift (+1, -1)
+        before, after = self.save_steps({'before': ['Pack a bag', 'Move uphill', 'Charge phones'],
+                                         'during': ['Stay off bridges']}, queries=3)
+        self.assertEqual(after, before)
+
+    def test_rewording_reuses_the_row(self):
+        # read + one bulk UPDATE
+        before, after = self.save_steps({'before': ['Pack a go-bag', 'Charge phones', 'Move uphill'],
+                                         'during': ['Stay off bridges']}, queries=2)
+        self.assertEqual(after['Pack a go-bag'], before['Pack a bag'])
+
+    def test_removing_steps_deletes_only_them(self):
+        # read + delete (collect, DELETE: rows have delete signals) + shift the step after it
+        before, after = self.save_steps({'before': ['Pack a bag', 'Move uphill'], 'during': []}, queries=4)
+        self.assertEqual(after, {k: before[k] for k in ('Pack a bag', 'Move uphill')})
+
+    def test_api_update_logs_one_change(self):
+        client = APIClient()
+        logged = SafetyChangeLog.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch('/api/v1/safetyinfo/disasters/flood/', {
+                'phases': {'before': ['Pack a bag', 'Charge phones', 'Move uphill', 'Lock the door'],
+                           'during': ['Stay off bridges']},
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['phases']['before'][-1], 'Lock the door')
+        self.assertEqual(
+            list(SafetyChangeLog.objects.filter(id__gt=logged).values_list('kind', 'key').distinct()),
+            [('disaster', 'flood')],
+        )
+
+    def save_contacts(self, contacts, queries):
+        pks = list(self.category.contacts.order_by('id').values_list('pk', flat=True))
+        with self.assertNumQueries(queries):
+            ContactCategorySerializer()._save_contacts(self.category, contacts)
+        stored = list(self.category.contacts.order_by('id').values('pk', 'name', 'number'))
+        self.assertEqual([(c['name'], c['number']) for c in stored], [(c['name'], c['number']) for c in contacts])
+        return pks, [c['pk'] for c in stored]
+
+    def contacts(self, *names):
+        return [{'name': name, 'number': f'10{n}', 'icon_name': 'ShieldAlert', 'color_theme': 'blue'}
+                for n, name in enumerate(names)]
+
+    def test_contacts_are_diffed_by_position(self):
+        # unchanged: just the read
+        self.save_contacts(self.contacts('Station 0', 'Station 1', 'Station 2'), queries=1)
+        # edit in place: read + one bulk UPDATE, same rows
+        before, after = self.save_contacts(self.contacts('Station 0', 'HQ', 'Station 2'), queries=2)
+        self.assertEqual(after, before)
+        # append: read + one INSERT
+        before, after = self.save_contacts(self.contacts('Station 0', 'HQ', 'Station 2', 'Airport'), queries=2)
+        self.assertEqual(after[:3], before)
+        # drop the tail: read + delete (collect, DELETE)
+        before, after = self.save_contacts(self.contacts('Station 0', 'HQ'), queries=3)
+        self.assertEqual(after, before[:2])
+
+
+class SyncPackTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.flood = Disaster.objects.create(slug='flood', title='Flood', icon_name='Droplets', color_theme='blue')
+            Disaster.objects.create(slug='fire', title='Fire', icon_name='Flame', color_theme='orange')
+            self.burns = FirstAidGuide.objects.create(title='Burns', guide_type='critical', steps_text='Cool it')
+            self.police = ContactCategory.objects.create(title='Police', order=1)
+            EmergencyContact.objects.create(category=self.police, name='HQ', number='100',
+                                            icon_name='ShieldAlert', color_theme='blue')
+
+    def sync(self, since=None):
+        response = self.client.get('/api/v1/safetyinfo/sync/', {} if since is None else {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_pack_has_everything_stamped(self):
+        pack = self.sync()
+        self.assertEqual((pack['since'], pack['full'], pack['deleted']), (0, True, {}))
+        self.assertEqual(pack['version'], SafetyChangeLog.objects.latest('id').id)
+        self.assertEqual(sorted(d['slug'] for d in pack['disasters']), ['fire', 'flood'])
+        self.assertEqual([g['steps'] for g in pack['first_aid']], [['Cool it']])
+        self.assertEqual([c['items'][0]['number'] for c in pack['emergency_contacts']], ['100'])
+        for section in ('disasters', 'first_aid', 'emergency_contacts'):
+            self.assertTrue(all(0 < record['_v'] <= pack['version'] for record in pack[section]), section)
+        self.assertEqual(self.sync(0), pack)
+
+    def test_delta_carries_only_what_changed_since(self):
+        version = self.sync()['version']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.flood.title = 'Flash flood'
+            self.flood.save()
+            FirstAidGuide.objects.create(title='Snake bite', guide_type='critical', steps_text='Keep still')
+            police_pk = self.police.pk
+            self.police.delete()
+
+        delta = self.sync(version)
+        self.assertEqual((delta['since'], delta['full']), (version, False))
+        self.assertGreater(delta['version'], version)
+        self.assertEqual([d['title'] for d in delta['disasters']], ['Flash flood'])
+        self.assertEqual([g['title'] for g in delta['first_aid']], ['Snake bite'])
+        self.assertEqual(delta['emergency_contacts'], [])
+        self.assertEqual(delta['deleted'], {'emergency_contacts': [str(police_pk)]})
+
+        nothing = self.sync(delta['version'])
+        self.assertEqual((nothing['disasters'], nothing['first_aid'], nothing['deleted']), ([], [], {}))
+
+    def test_unusable_versions_fall_back_to_the_full_pack(self):
+        head = self.sync()['version']
+        # A stamp from some other database
+        self.assertTrue(self.sync(head + 50)['full'])
+
+        # Log trimmed from the front: deletions before the cut are unknown
+        with self.captureOnCommitCallbacks(execute=True):
+            Disaster.objects.create(slug='quake', title='Quake', icon_name='Activity', color_theme='red')
+        SafetyChangeLog.objects.filter(id__lte=head).delete()
+        too_old = self.sync(1)
+        self.assertEqual((too_old['since'], too_old['full']), (0, True))
+        self.assertEqual(sorted(d['slug'] for d in too_old['disasters']), ['fire', 'flood', 'quake'])
+        self.assertEqual({d['slug']: d['_v'] > 0 for d in too_old['disasters']},
+                         {'fire': False, 'flood': False, 'quake': True})
+        self.assertFalse(self.sync(head)['full'])  # right at the cut is still a delta
+
+
+def idf(index, term):
+    n, df = len(index.doc_len), len(index.postings[term])
+    return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+
+class SearchIndexTests(SimpleTestCase):
+    def index(self, docs):
+        index = SearchIndex()
+        for key, text in docs.items():
+            index.add(key, text, {'key': key})
+        return index
+
+    def keys(self, index, query, limit=10):
+        return [key for _, key, _ in index.search(query, limit)]
+
+    def test_tokenize_drops_case_punctuation_and_stop_words(self):
+        self.assertEqual(tokenize("Stop the BLEEDING, then call 999!"), ['stop', 'bleeding', 'then', 'call', '999'])
+        self.assertEqual(tokenize('to the and'), [])
+
+    def test_all_words_beat_partial_matches(self):
+        index = self.index({
+            'both': 'snake bite keep still',
+            'snake': 'snake snake snake seen near the river',
+            'bite': 'dog bite wash the wound',
+        })
+        self.assertEqual(self.keys(index, 'snake bite')[0], 'both')
+        self.assertEqual(set(self.keys(index, 'snake bite')), {'both', 'snake', 'bite'})
+
+    def test_frequency_length_and_title_weigh_in(self):
+        index = self.index({
+            'twice': 'burn cool burn water',
+            'once': 'burn cool the water',
+            'long': 'burn ' + ' '.join(f'filler{n}' for n in range(30)),
+        })
+        index.add('titled', 'cool the skin under water', {}, title='Burns and burn care')
+        self.assertEqual(self.keys(index, 'burn'), ['titled', 'twice', 'once', 'long'])
+
+    def test_prefixes_match_below_exact_words(self):
+        index = self.index({'exact': 'bleed', 'longer': 'bleeding', 'other': 'blanket'})
+        self.assertEqual(self.keys(index, 'bleed'), ['exact', 'longer'])
+        self.assertEqual(set(self.keys(index, 'bl')), {'exact', 'longer', 'other'})
+        self.assertEqual(self.keys(index, 'b'), [])  # single letters don't expand
+
+    def test_remove_and_replace(self):
+        index = self.index({'a': 'flood water rising', 'b': 'fire smoke'})
+        index.add('a', 'earthquake drop cover', {})
+        self.assertEqual(self.keys(index, 'flood'), [])
+        self.assertEqual(self.keys(index, 'earthquake'), ['a'])
+        index.remove('b')
+        self.assertEqual((len(index), self.keys(index, 'smoke')), (1, []))
+        self.assertNotIn('smoke', index.vocabulary)
+
+    def test_threshold_search_matches_scoring_every_doc(self):
+        rng = random.Random(7)
+        words = ['water', 'wound', 'warm', 'fire', 'flood', 'fever', 'call', 'calm', 'cover', 'drop']
+        index = self.index({n: ' '.join(rng.choices(words, k=rng.randint(3, 12))) for n in range(300)})
+
+        for query in ('water', 'fire calm', 'wa fl', 'co dr fe', 'warm wound water'):
+            groups = [
+                [(w * idf(index, t), index._impacts(t)[0]) for t, w in index.expand(tok)]
+                for tok in dict.fromkeys(tokenize(query))
+            ]
+            scores = {}
+            for doc in index.doc_len:
+                per_group = [max(f * weights.get(doc, 0.0) for f, weights in g) for g in groups]
+                if any(per_group):
+                    scores[doc] = (all(per_group), sum(per_group))
+            expected = sorted(scores, key=lambda d: scores[d], reverse=True)[:10]
+            found = index.search(query, 10)
+            self.assertEqual([round(score, 9) for score, _, _ in found],
+                             [round(scores[d][1], 9) for d in expected], query)
+
+
+class SafetySearchTests(TestCase):
+    def setUp(self):
+        self.search = SafetySearch(check_interval=60)
+        for where in ('support.views.safety_search', 'support.signals.safety_search'):
+            patcher = mock.patch(where, self.search)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.flood = Disaster.objects.create(slug='flood', title='Flood', icon_name='Droplets', color_theme='blue')
+            DisasterSerializer()._save_protocols(self.flood, {'during': ['Move to higher ground', 'Avoid walking water']})
+            self.burns = FirstAidGuide.objects.create(title='Burns', guide_type='critical',
+                                                      steps_text='Cool under running water\nCover loosely')
+
+    def query(self, q):
+        return APIClient().get('/api/v1/safetyinfo/search/', {'q': q}).json()
+
+    def test_results_cover_protocols_and_guides(self):
+        results = self.query('water')
+        self.assertEqual({r['type'] for r in results}, {'protocol', 'first_aid'})
+        guide = next(r for r in results if r['type'] == 'first_aid')
+        self.assertEqual((guide['title'], guide['match']), ('Burns', 'Cool under running water'))
+        protocol = next(r for r in results if r['type'] == 'protocol')
+        self.assertEqual((protocol['disaster'], protocol['phase']), ('flood', 'during'))
+        self.assertEqual(self.query('   '), [])
+
+    def test_edits_are_reindexed(self):
+        self.assertEqual(len(self.query('ground')), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            DisasterSerializer()._save_protocols(self.flood, {'during': ['Climb to the roof']})
+            self.burns.steps_text = 'Cool under a tap'
+            self.burns.save()
+        self.assertEqual(self.query('ground'), [])
+        self.assertEqual([r['disaster'] for r in self.query('roof')], ['flood'])
+        self.assertEqual([r['type'] for r in self.query('tap')], ['first_aid'])
+
+    def test_other_processes_writes_show_up_after_the_check_interval(self):
+        self.query('water')
+        # No signals here: only the shared change-log row
+        FirstAidGuide.objects.filter(pk=self.burns.pk).update(steps_text='Sip water slowly')
+        SafetyChangeLog.objects.create(kind='first_aid', key=str(self.burns.pk))
+        self.assertEqual(self.query('sip'), [])  # still inside check_interval
+        self.search.mark_stale()
+        self.assertEqual([r['id'] for r in self.query('sip')], [self.burns.pk])
+
+
+class FirstAidStepsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def stored_steps(self, pk):
+        return FirstAidGuide.objects.values_list('steps', flat=True).get(pk=pk)
+
+    def listed(self):
+        return {g['id']: g['steps'] for g in self.client.get('/api/v1/safetyinfo/first-aid/').json()}
+
+    def test_steps_follow_create_update_and_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.client.post('/api/v1/safetyinfo/first-aid/', {
+                'title': 'Choking', 'guide_type': 'critical', 'steps_text': '  Ask them to cough\n\nGive back blows \n',
+            }, format='json')
+        self.assertEqual(created.status_code, 201)
+        guide_id = created.json()['id']
+        self.assertEqual(created.json()['steps'], ['Ask them to cough', 'Give back blows'])
+        self.assertEqual(self.stored_steps(guide_id), ['Ask them to cough', 'Give back blows'])
+        self.assertEqual(self.listed()[guide_id], ['Ask them to cough', 'Give back blows'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            updated = self.client.patch(f'/api/v1/safetyinfo/first-aid/{guide_id}/',
+                                        {'steps_text': 'Call 999\nGive abdominal thrusts'}, format='json')
+        self.assertEqual(updated.json()['steps'], ['Call 999', 'Give abdominal thrusts'])
+        self.assertEqual(self.listed()[guide_id], ['Call 999', 'Give abdominal thrusts'])
+
+        # Title-only edits leave the steps alone
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/v1/safetyinfo/first-aid/{guide_id}/', {'title': 'Choking adult'}, format='json')
+        self.assertEqual(self.stored_steps(guide_id), ['Call 999', 'Give abdominal thrusts'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f'/api/v1/safetyinfo/first-aid/{guide_id}/').status_code, 204)
+        self.assertNotIn(guide_id, self.listed())
+
+    def test_update_fields_saves_carry_the_steps(self):
+        guide = FirstAidGuide.objects.create(title='Burns', guide_type='critical', steps_text='Cool it')
+        guide.steps_text = 'Cool it\nCover it'
+        guide.save(update_fields=['steps_text'])
+        self.assertEqual(self.stored_steps(guide.pk), ['Cool it', 'Cover it'])
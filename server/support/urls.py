@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DisasterViewSet, FirstAidViewSet, ProtocolViewSet, EmergencyContactViewSet
+from .views import DisasterViewSet, FirstAidViewSet, ProtocolViewSet, EmergencyContactViewSet, safety_bundle_view, safety_search_view, safety_sync_view
 
 router = DefaultRouter()
 router.register(r'disasters', DisasterViewSet)
@@ -8,6 +8,9 @@ router.register(r'first-aid', FirstAidViewSet)
 router.register(r'protocols', ProtocolViewSet)
 router.register(r'emergency-contacts', EmergencyContactViewSet, basename='emergency-contacts')
 urlpatterns = [
+    path('safetyinfo/bundle/', safety_bundle_view, name='safety-bundle'),
+    path('safetyinfo/sync/', safety_sync_view, name='safety-sync'),
+    path('safetyinfo/search/', safety_search_view, name='safety-search'),
     path('safetyinfo/', include(router.urls)),
    
 ]
\ No newline at end of file
@@ -1,28 +1,160 @@
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.utils.http import parse_etags
 from rest_framework import viewsets
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from . import changelog
+from .bundle import safety_bundle
+from .search import safety_search, tokenize
 from .models import Disaster, FirstAidGuide, SafetyProtocol
 from .serializers import DisasterSerializer, FirstAidGuideSerializer, SafetyProtocolSerializer
 
+# Plain URLs revalidate every time (a cheap 304 via the ETag), so an edit is
+# seen on the next request; only ?v=<version> URLs can be kept for long
+BUNDLE_CACHE_CONTROL = 'no-cache'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+SYNC_CACHE_CONTROL = 'public, max-age=60'
+MAX_SEARCH_RESULTS = 50
+
+
+def bundle_response(request, section):
+    """
+    Serve a pre-built section of the safety bundle straight from memory,
+    picking brotli/gzip from Accept-Encoding. No ORM, no serializer.
+    """
+    built = safety_bundle.current()
+    version = request.query_params.get('v')
+    if version and version == str(built.version):
+        # Versioned URL: the content behind it can never change
+        return encoded_response(request, built.sections[section], IMMUTABLE_CACHE_CONTROL)
+    return encoded_response(request, built.sections[section], BUNDLE_CACHE_CONTROL)
+
+
+def encoded_response(request, payload, cache_control):
+    """Response for a pre-encoded Payload (see support.bundle), honouring If-None-Match."""
+    # Each encoding gets its own strong tag; any of them means "unchanged"
+    tags_by_encoding = {
+        '': payload.etag,
+        'gzip': payload.etag[:-1] + '-gzip"',
+        'br': payload.etag[:-1] + '-br"',
+    }
+
+    header = request.headers.get('If-None-Match')
+    if header:
+        tags = parse_etags(header)
+        if '*' in tags or set(tags) & set(tags_by_encoding.values()):
+            response = HttpResponse(status=304)
+            response['ETag'] = payload.etag
+            response['Cache-Control'] = cache_control
+            return response
+
+    accept = request.headers.get('Accept-Encoding', '')
+    if payload.br is not None and 'br' in accept:
+        encoding, body = 'br', payload.br
+    elif 'gzip' in accept:
+        encoding, body = 'gzip', payload.gzip
+    else:
+        encoding, body = '', payload.body
+
+    response = HttpResponse(body, content_type='application/json')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['ETag'] = tags_by_encoding[encoding]
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = cache_control
+    return response
+
+
+# GET /safetyinfo/bundle/[?v=<version>] -> everything in one document
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def safety_bundle_view(request):
+    return bundle_response(request, 'bundle')
+
+
+# GET /safetyinfo/sync/?since=<version> -> offline sync pack (full when since is 0/absent)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def safety_sync_view(request):
+    try:
+        since = max(0, int(request.query_params.get('since', 0)))
+    except ValueError:
+        return Response({'error': 'since must be an integer version'}, status=400)
+    return encoded_response(request, changelog.pack_bytes(since), SYNC_CACHE_CONTROL)
+
+
+# GET /safetyinfo/search/?q=snake bite&limit=10 -> ranked protocols + first-aid guides
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def safety_search_view(request):
+    query = request.query_params.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 10)), MAX_SEARCH_RESULTS))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=400)
+    if not query:
+        return Response([])
+
+    tokens = tokenize(query)
+    results = []
+    for score, _, meta in safety_search.search(query, limit):
+        result = dict(meta, score=round(score, 3))
+        if meta['type'] == 'first_aid':
+            result['match'] = _matching_step(meta['steps'], tokens)
+        results.append(result)
+    return Response(results)
+
+
+def _matching_step(steps, tokens):
+    """First step of a guide containing a query word (prefix), for display."""
+    for step in steps:
+        if any(w.startswith(t) for t in tokens for w in tokenize(step)):
+            return step
+    return None
+
+
 class DisasterViewSet(viewsets.ModelViewSet):
     """
     API endpoint that allows Disasters to be viewed or edited.
     GET /api/disasters/ returns the full nested structure needed for the frontend.
+    Protocols come from one prefetch query for the whole page (2 queries total).
     """
-    queryset = Disaster.objects.all()
+    queryset = Disaster.objects.prefetch_related(
+        Prefetch(
+            'protocols',
+            queryset=SafetyProtocol.objects.only('id', 'disaster_id', 'phase', 'content', 'order').order_by('order', 'id'),
+        )
+    )
     serializer_class = DisasterSerializer
     lookup_field = 'slug'
 
+    def list(self, request, *args, **kwargs):
+        return bundle_response(request, 'disasters')
+
 class FirstAidViewSet(viewsets.ModelViewSet):
     queryset = FirstAidGuide.objects.all()
     serializer_class = FirstAidGuideSerializer
 
+    def list(self, request, *args, **kwargs):
+        return bundle_response(request, 'first_aid')
+
 # Optional: If you need to edit specific lines individually
 class ProtocolViewSet(viewsets.ModelViewSet):
     queryset = SafetyProtocol.objects.all()
     serializer_class = SafetyProtocolSerializer
 
+    def list(self, request, *args, **kwargs):
+        return bundle_response(request, 'protocols')
+
 from .models import ContactCategory
 from .serializers import ContactCategorySerializer
 
 class EmergencyContactViewSet(viewsets.ModelViewSet): # Changed to ModelViewSet
     queryset = ContactCategory.objects.all().prefetch_related('contacts')
-    serializer_class = ContactCategorySerializer
\ No newline at end of file
+    serializer_class = ContactCategorySerializer
+
+    def list(self, request, *args, **kwargs):
+        return bundle_response(request, 'emergency_contacts')
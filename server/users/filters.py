@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from rest_framework.exceptions import ParseError
+
+User = get_user_model()
+
+ROLES = {value for value, _ in User.ROLE_CHOICES}
+SEARCH_FIELDS = ('username', 'email', 'full_name')
+MAX_SEARCH_LENGTH = 100
+
+
+def filter_users(queryset, params):
+    """
+    ?role=admin[,manager]  ?blood_group=O+[,O-]
+
+    role rides the (role, created_at) index together with the keyset order.
+    Raises ParseError (400) on values that can't match anything.
+    """
+    roles = [r for r in params.get('role', '').split(',') if r]
+    if roles:
+        unknown = set(roles) - ROLES
+        if unknown:
+            raise ParseError(f"Unknown role: {', '.join(sorted(unknown))}")
+        queryset = queryset.filter(role__in=roles)
+
+    # "O+" arrives as "O " when the client forgets to encode the plus
+    groups = [g.replace(' ', '+').upper() for g in params.get('blood_group', '').split(',') if g.strip()]
+    if groups:
+        queryset = queryset.filter(blood_group__in=groups)
+    return queryset
+
+
+def search_term(params):
+    term = params.get('search', '').strip()
+    if not term:
+        return None
+    if len(term) > MAX_SEARCH_LENGTH:
+        raise ParseError(f"search is limited to {MAX_SEARCH_LENGTH} characters")
+    return term
+
+
+def search_branches(queryset, term):
+    """
+    Typeahead: one prefix query per searchable column. Each is a range scan
+    on that column's index (unique keys for username/email, the full_name
+    index), which the keyset paginator seeks separately and merges, instead
+    of an OR that MySQL would index-merge and filesort.
+    """
+    return [queryset.filter(**{f'{field}__istartswith': term}) for field in SEARCH_FIELDS]
+
+
+def search_users(queryset, term):
+    """Same matches as search_branches, as one queryset (unpaginated lists)."""
+    branches = search_branches(queryset, term)
+    combined = branches[0]
+    for branch in branches[1:]:
+        combined = combined | branch
+    return combined
+
+
+def sparse_fields(params, serializer_class):
+    """
+    ?fields=id,username,email -> ['id', 'username', 'email'], validated
+    against the serializer; None when the client wants everything.
+    """
+    raw = params.get('fields')
+    if not raw:
+        return None
+    allowed = serializer_class.Meta.fields
+    fields = [f for f in dict.fromkeys(f.strip() for f in raw.split(',')) if f]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ParseError(f"Unknown field: {', '.join(unknown)}; choose from {', '.join(allowed)}")
+    return fields or None
+
+
+def only_columns(queryset, fields):
+    """Load just what the fieldset renders (+ the keyset columns)."""
+    if not fields:
+        return queryset
+    return queryset.only(*dict.fromkeys(['id', 'created_at', *fields]))
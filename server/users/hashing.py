@@ -0,0 +1,132 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+
+from disaster_management.background import with_own_connection
+
+
+class Overloaded(Exception):
+    """Raised when the hashing queue is full; the view answers 429."""
+
+    def __init__(self, retry_after):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+class HashingPool:
+    """
+    Bounded pool for bcrypt/PBKDF2 work.
+
+    At most `workers` hashes run at once and at most `max_queue` more may
+    wait; anything beyond that is refused straight away (Overloaded) so a
+    sign-up storm can't tie up every request thread on password hashing.
+    bcrypt releases the GIL, so threads really do use multiple cores.
+    """
+
+    def __init__(self, workers, max_queue, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._capacity = workers + max_queue
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._avg_seconds = 0.25  # moving average, seeds Retry-After
+
+    def run(self, fn, *args):
+        """Run `fn(*args)` on the pool and wait for the result."""
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise Overloaded(self.retry_after())
+
+    def run_in_background(self, fn, *args):
+        """Fire-and-forget; silently skipped when the pool is saturated."""
+        try:
+            self._submit(fn, *args)
+        except Overloaded:
+            pass
+
+    def retry_after(self):
+        backlog = max(self._in_flight, self.workers)
+        return max(1, math.ceil(backlog * self._avg_seconds / self.workers))
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded(self.retry_after())
+        with self._lock:
+            self._in_flight += 1
+        return self._executor.submit(self._timed, fn, *args)
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._in_flight -= 1
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+            self._slots.release()
+
+
+_workers = getattr(settings, "AUTH_HASH_WORKERS", None) or os.cpu_count() or 2
+pool = HashingPool(
+    workers=_workers,
+    max_queue=getattr(settings, "AUTH_HASH_QUEUE", None) or _workers * 4,
+    timeout=getattr(settings, "AUTH_HASH_TIMEOUT", 10),
+)
+
+
+# =====================================================
+# 🔐 LOGIN / REGISTER HELPERS
+# =====================================================
+
+def hash_password(raw_password):
+    return pool.run(make_password, raw_password)
+
+
+def _needs_rehash(encoded):
+    try:
+        current = identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = get_hasher("default")
+    return current.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def _rehash(user_id, raw_password):
+    get_user_model().objects.filter(pk=user_id).update(password=make_password(raw_password))
+
+
+def authenticate_credentials(email, raw_password):
+    """
+    Same outcome as ModelBackend.authenticate, but the expensive hash check
+    runs on the bounded pool and an upgrade to the preferred hasher (e.g. the
+    bcrypt -> PBKDF2 move in PASSWORD_HASHERS) happens in the background
+    instead of on the request thread. Raises Overloaded.
+    """
+    User = get_user_model()
+    user = User._default_manager.filter(**{User.USERNAME_FIELD: email}).first()
+
+    if user is None:
+        # Hash anyway so "no such user" and "wrong password" take equally long
+        pool.run(make_password, raw_password)
+        return None
+
+    if not pool.run(check_password, raw_password, user.password):
+        return None
+    if not user.is_active:
+        return None
+
+    if _needs_rehash(user.password):
+        pool.run_in_background(with_own_connection, _rehash, user.pk, raw_password)
+    return user
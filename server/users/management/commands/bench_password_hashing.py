@@ -0,0 +1,39 @@
+import os
+import time
+from concurrent.futures import wait
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand
+
+from users.hashing import HashingPool
+
+
+class Command(BaseCommand):
+    help = 'Measures password-check throughput (logins/sec and logins/sec/core) on the bounded hashing pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=64, help='Password checks per run')
+        parser.add_argument('--workers', default='', help='Comma separated pool sizes (default: 1 and CPU count)')
+
+    def handle(self, *args, **opts):
+        cores = os.cpu_count() or 1
+        sizes = [int(w) for w in opts['workers'].split(',') if w] or sorted({1, cores})
+        encoded = make_password('correct horse battery staple')
+        self.stdout.write(f'Hasher: {encoded.split("$", 1)[0]}   CPU cores: {cores}')
+
+        for workers in sizes:
+            pool = HashingPool(workers=workers, max_queue=opts['logins'], timeout=600)
+            start = time.perf_counter()
+            futures = [
+                pool._submit(check_password, 'correct horse battery staple', encoded)
+                for _ in range(opts['logins'])
+            ]
+            wait(futures)
+            elapsed = time.perf_counter() - start
+            rate = opts['logins'] / elapsed
+            self.stdout.write(
+                f'workers={workers:<3} {rate:8.1f} logins/s   {rate / min(workers, cores):8.1f} logins/s/core'
+            )
+            pool._executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS('Done.'))
@@ -3,12 +3,16 @@ from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, Permis
 
 # --- CUSTOM USER MANAGER ---
 class UserManager(BaseUserManager):
-    def create_user(self, email, username, full_name, password=None, **extra_fields):
+    def create_user(self, email, username, full_name, password=None, encoded_password=None, **extra_fields):
         if not email:
             raise ValueError('Users must have an email address')
         email = self.normalize_email(email)
         user = self.model(email=email, username=username, full_name=full_name, **extra_fields)
-        user.set_password(password)
+        # encoded_password: already hashed (e.g. on the bounded hashing pool)
+        if encoded_password:
+            user.password = encoded_password
+        else:
+            user.set_password(password)
         user.save(using=self._db)
         return user
 
@@ -59,4 +63,11 @@ class User(AbstractBaseUser, PermissionsMixin):
     REQUIRED_FIELDS = ['username', 'full_name']
 
     class Meta:
-        db_table = 'users' # Connects to your existing table
\ No newline at end of file
+        db_table = 'users' # Connects to your existing table
+        indexes = [
+            # Keyset pages of the admin list, newest first (InnoDB appends id)
+            models.Index(fields=['created_at'], name='users_created_idx'),
+            models.Index(fields=['role', 'created_at'], name='users_role_created_idx'),
+            # ?search= prefix match; username and email are already unique
+            models.Index(fields=['full_name'], name='users_full_name_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,18 @@
+from notification.pagination import KeysetPagination
+
+
+class UserPagination(KeysetPagination):
+    """Admin user list: ?limit=/&cursor= pages, bare list of the newest 200 without them."""
+    page_size = 50
+    max_page_size = 200
+    unpaged_limit = 200
+
+
+class UserDropdownPagination(KeysetPagination):
+    """
+    Recipient picker: ?search= typeahead pages, or the bare list the admin
+    console loads, capped at the newest 200.
+    """
+    page_size = 25
+    max_page_size = 50
+    unpaged_limit = 200
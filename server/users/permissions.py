@@ -6,7 +6,8 @@ class IsSuperAdmin(BasePermission):
     Allows access only to Super Admins.
     """
     def has_permission(self, request, view):
-        return bool(request.user and request.user.is_authenticated and request.user.role == 'super_admin')
+        return bool(request.user and request.user.is_authenticated and request.user.is_active
+                    and request.user.role == 'super_admin')
 
 # --- 2. ADMIN & SUPER ADMIN ---
 class IsAdmin(BasePermission):
@@ -15,7 +16,7 @@ class IsAdmin(BasePermission):
     """
     def has_permission(self, request, view):
         # Check if logged in first
-        if not request.user or not request.user.is_authenticated:
+        if not request.user or not request.user.is_authenticated or not request.user.is_active:
             return False
         # Check role
         return request.user.role in ['super_admin', 'admin']
@@ -26,7 +27,7 @@ class IsManager(BasePermission):
     Allows access to Managers, Admins, and Super Admins.
     """
     def has_permission(self, request, view):
-        if not request.user or not request.user.is_authenticated:
+        if not request.user or not request.user.is_authenticated or not request.user.is_active:
             return False
         return request.user.role in ['super_admin', 'admin', 'manager']
 
@@ -38,7 +39,7 @@ def HasRole(allowed_roles):
     """
     class RolePermission(BasePermission):
         def has_permission(self, request, view):
-            if not request.user or not request.user.is_authenticated:
+            if not request.user or not request.user.is_authenticated or not request.user.is_active:
                 return False
             
             # Super Admin always gets a pass (Optional logic)
@@ -0,0 +1,61 @@
+from rest_framework.exceptions import AuthenticationFailed
+
+from .cache import hot_users
+
+
+class JWTPrincipal:
+    """
+    `request.user` for JWT-authenticated requests.
+
+    Answers id/email straight from the verified token claims. role,
+    is_active and every other attribute come from the User row in the
+    per-process hot-user cache, not the claims, so a demotion or
+    deactivation beats tokens issued before it. Saving or deleting a user
+    evicts it in the worker that wrote; other workers pick the change up
+    within the cache's TTL (30 s), and a warm role check costs no query.
+
+    The loaded row may be that old; code that writes to the user should
+    fetch it fresh instead of saving this object.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, claims):
+        self.claims = claims
+        self.id = self.pk = int(claims["user_id"])
+        self._user = None
+
+    @property
+    def email(self):
+        return self.claims.get("email") or self.load().email
+
+    @property
+    def role(self):
+        return self.load().role
+
+    @property
+    def is_active(self):
+        return self.load().is_active
+
+    def load(self):
+        if self._user is None:
+            self._user = hot_users.get(self.id)
+            if self._user is None:
+                raise AuthenticationFailed("User not found")
+        return self._user
+
+    def __getattr__(self, name):
+        # Only called for attributes not answered by the claims above
+        if name.startswith("__") or name in ("claims", "_user"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __eq__(self, other):
+        return getattr(other, "pk", None) == self.pk and hasattr(other, "role")
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return self.claims.get("email") or f"user {self.pk}"
@@ -2,6 +2,8 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .hashing import hash_password
+
 User = get_user_model()
 
 class UserSerializer(serializers.ModelSerializer):
@@ -14,6 +16,14 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'full_name', 'phone_number', 'role', 'blood_group', 'location', 'profile', 'created_at']
         read_only_fields = ['id', 'created_at']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldset (?fields=, validated by users.filters.sparse_fields)
+        wanted = self.context.get('fields')
+        if wanted:
+            for name in set(self.fields) - set(wanted):
+                self.fields.pop(name)
+
 class RegisterSerializer(serializers.ModelSerializer):
     """
     Handles Registration Input.
@@ -29,13 +39,14 @@ class RegisterSerializer(serializers.ModelSerializer):
         email = validated_data['email']
         username = email.split('@')[0]
         
-        # 2. Create User (Django handles password hashing automatically here)
+        # 2. Create User (password is hashed on the bounded hashing pool;
+        #    raises hashing.Overloaded when that pool is full)
         user = User.objects.create_user(
             username=username,
             email=email,
             full_name=validated_data.get('full_name', ''),
             phone_number=validated_data.get('phone_number', ''),
-            password=validated_data['password'], 
+            encoded_password=hash_password(validated_data['password']),
             role=validated_data.get('role', 'people'),
             blood_group=validated_data.get('blood_group', '')
         )
@@ -1,3 +1,242 @@
-from django.test import TestCase
+import threading
+import time
+from unittest.mock import patch
 
-# Create your tests here.
+import jwt
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from middleware.jwt_auth import TokenCache, token_cache, verify_token
+
+from .cache import hot_users
+from .hashing import HashingPool, Overloaded
+from .principal import JWTPrincipal
+
+User = get_user_model()
+
+
+class UserListTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email='admin@example.com', username='admin', full_name='Admin',
+                                              role='admin')
+        for n in range(30):
+            User.objects.create_user(
+                email=f'user{n}@example.com', username=f'user{n}', full_name=f'Person {n}',
+                role='agent' if n % 3 == 0 else 'people', blood_group='O+' if n % 2 else 'A-',
+            )
+        User.objects.create_user(email='zed@example.com', username='zed', full_name='Rahim Uddin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_plain_list_is_unchanged(self):
+        response = self.client.get('/api/v1/users/')
+        self.assertEqual(len(response.json()), 32)
+        self.assertIn('location', response.json()[0])
+
+    def test_keyset_pages_cover_everyone_once(self):
+        seen, url = [], '/api/v1/users/?limit=7'
+        while url:
+            page = self.client.get(url).json()
+            seen += [u['id'] for u in page['results']]
+            url = page['next']
+        self.assertEqual(len(seen), 32)
+        self.assertEqual(len(set(seen)), 32)
+
+    def test_search_filters_and_fields(self):
+        found = self.client.get('/api/v1/users/?search=rah&fields=id,full_name').json()
+        self.assertEqual(found, [{'id': User.objects.get(username='zed').pk, 'full_name': 'Rahim Uddin'}])
+
+        page = self.client.get('/api/v1/users/?search=user1&limit=5').json()
+        self.assertEqual(len(page['results']), 5)  # user1, user10..user19
+        agents = self.client.get('/api/v1/users/?role=agent&blood_group=O ').json()
+        self.assertTrue(agents and all(u['role'] == 'agent' and u['blood_group'] == 'O+' for u in agents))
+
+        self.assertEqual(self.client.get('/api/v1/users/?fields=password').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/users/?role=pilot').status_code, 400)
+
+    def test_dropdown_pages_on_request_and_stays_a_list_for_the_console(self):
+        with self.assertNumQueries(1):
+            page = self.client.get('/api/v1/admin/users/?limit=10').json()
+        self.assertEqual(len(page['results']), 10)
+        self.assertIsNotNone(page['next_cursor'])
+        self.assertEqual(len(self.client.get('/api/v1/admin/users/?limit=1000').json()['results']), 32)
+        self.assertEqual(
+            [u['username'] for u in self.client.get('/api/v1/admin/users/?search=zed@').json()],
+            ['zed'],
+        )
+        # NotificationAdmin.jsx does users.find / users.map on the bare response
+        everyone = self.client.get('/api/v1/admin/users/').json()
+        self.assertIsInstance(everyone, list)
+        self.assertEqual(len(everyone), 32)
+
+    def test_plain_lists_are_capped(self):
+        with patch('users.pagination.UserPagination.unpaged_limit', 5), \
+                patch('users.pagination.UserDropdownPagination.unpaged_limit', 5):
+            users = self.client.get('/api/v1/users/').json()
+            dropdown = self.client.get('/api/v1/admin/users/').json()
+        self.assertEqual([u['id'] for u in users], [u['id'] for u in dropdown])
+        self.assertEqual(users[0]['username'], 'zed')
+        self.assertEqual(len(users), 5)
+
+
+class PrincipalAccessTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email='boss@example.com', username='boss', full_name='Boss',
+                                              role='admin')
+        token = jwt.encode(
+            {'user_id': self.admin.pk, 'email': self.admin.email, 'role': 'admin', 'exp': int(time.time()) + 3600},
+            settings.JWT_SECRET,
+            algorithm=settings.JWT_ALGORITHM,
+        )
+        self.client = APIClient(HTTP_AUTHORIZATION=f'Bearer {token}')
+        hot_users.clear()
+
+    def test_demotion_and_deactivation_beat_the_token_claims(self):
+        self.assertEqual(self.client.get('/api/v1/admin/users/').status_code, 200)
+
+        # Saved through the model: the signal evicts the cached row at once
+        self.admin.role = 'people'
+        self.admin.save()
+        self.assertEqual(self.client.get('/api/v1/admin/users/').status_code, 403)
+
+        self.admin.role, self.admin.is_active = 'admin', False
+        self.admin.save()
+        self.assertEqual(self.client.get('/api/v1/admin/users/').status_code, 403)
+
+    def test_other_workers_writes_apply_within_the_ttl(self):
+        self.assertEqual(self.client.get('/api/v1/admin/users/').status_code, 200)
+
+        # Written straight to the DB, as another worker would: no signal here
+        User.objects.filter(pk=self.admin.pk).update(role='people')
+        self.assertEqual(self.client.get('/api/v1/admin/users/').status_code, 200)
+        with patch('users.cache.time.monotonic', return_value=time.monotonic() + hot_users.ttl + 1):
+            self.assertEqual(self.client.get('/api/v1/admin/users/').status_code, 403)
+
+    def test_warm_role_checks_cost_no_queries(self):
+        principal = JWTPrincipal({'user_id': self.admin.pk})
+        self.assertEqual(principal.role, 'admin')
+        again = JWTPrincipal({'user_id': self.admin.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual((again.role, again.is_active), ('admin', True))
+
+
+def sign(claims, key=None):
+    return jwt.encode(claims, key or settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        hot_users.clear()
+        self.admin = User.objects.create_user(email='root@example.com', username='root', full_name='Root',
+                                              role='admin')
+        self.exp = int(time.time()) + 3600
+
+    def test_entries_expire_at_exp_or_ttl_and_evict_lru(self):
+        cache = TokenCache(maxsize=2, ttl=60)
+        now = time.time()
+        cache.set('soon', {'user_id': 1, 'exp': now + 5})
+        cache.set('later', {'user_id': 2, 'exp': now + 3600})
+        self.assertEqual(cache.get('soon'), {'user_id': 1, 'exp': now + 5})
+        with patch('middleware.jwt_auth.time.time', return_value=now + 10):
+            self.assertIsNone(cache.get('soon'))              # its own exp
+            self.assertEqual(cache.get('later')['user_id'], 2)
+        with patch('middleware.jwt_auth.time.time', return_value=now + 61):
+            self.assertIsNone(cache.get('later'))             # capped at ttl
+
+        cache.set('a', {}), cache.set('b', {})
+        cache.get('a')
+        cache.set('c', {})
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), ({}, None, {}))
+
+    def test_a_cached_token_is_decoded_once(self):
+        token = sign({'user_id': self.admin.pk, 'exp': self.exp})
+        with patch('middleware.jwt_auth.jwt.decode', wraps=jwt.decode) as decode:
+            self.assertEqual(verify_token(token)['user_id'], self.admin.pk)
+            self.assertEqual(verify_token(token)['user_id'], self.admin.pk)
+        self.assertEqual(decode.call_count, 1)
+
+    def test_claims_from_either_issuer(self):
+        express = verify_token(sign({'id': self.admin.pk, 'exp': self.exp}))
+        self.assertEqual(express['user_id'], self.admin.pk)
+        django = verify_token(sign({'user_id': self.admin.pk, 'token_type': 'access', 'exp': self.exp},
+                                   settings.SECRET_KEY))
+        self.assertEqual(django['user_id'], self.admin.pk)
+        with self.assertRaises(jwt.InvalidTokenError):
+            verify_token(sign({'user_id': self.admin.pk, 'exp': self.exp}, 'some-other-secret-of-32-bytes!!'))
+        with self.assertRaises(jwt.ExpiredSignatureError):
+            verify_token(sign({'user_id': self.admin.pk, 'exp': int(time.time()) - 10}))
+
+    def test_refresh_tokens_are_rejected_and_never_cached(self):
+        token = sign({'user_id': self.admin.pk, 'token_type': 'refresh', 'exp': self.exp})
+        for _ in range(2):
+            with self.assertRaises(jwt.InvalidTokenError):
+                verify_token(token)
+        response = APIClient(HTTP_AUTHORIZATION=f'Bearer {token}').get('/api/v1/admin/users/')
+        self.assertEqual((response.status_code, response.json()), (401, {'message': 'Invalid token'}))
+
+    def test_drf_requests_authenticate_through_the_cache(self):
+        client = APIClient(HTTP_AUTHORIZATION=f'Bearer {sign({"user_id": self.admin.pk, "exp": self.exp})}')
+        with patch('middleware.jwt_auth.jwt.decode', wraps=jwt.decode) as decode:
+            self.assertEqual(client.get('/api/v1/admin/users/').status_code, 200)
+            self.assertEqual(client.get('/api/v1/admin/users/').status_code, 200)
+        self.assertEqual(decode.call_count, 1)
+
+        self.assertEqual(APIClient().get('/api/v1/admin/users/').status_code, 401)
+        garbage = APIClient(HTTP_AUTHORIZATION='Bearer not.a.token').get('/api/v1/admin/users/')
+        self.assertEqual(garbage.status_code, 401)
+
+
+class HashingPoolTests(TransactionTestCase):
+    def setUp(self):
+        self.pool = HashingPool(workers=1, max_queue=1, timeout=5)
+        patcher = patch('users.hashing.pool', self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(email='old@example.com', username='old', full_name='Old Hash',
+                                             encoded_password=make_password('s3cret!', hasher='pbkdf2_sha1'))
+
+    def login(self, password='s3cret!'):
+        return APIClient().post('/api/v1/auth/login/', {'email': 'old@example.com', 'password': password})
+
+    def wait_for_pool(self):
+        # One worker, so anything queued earlier has finished once this returns
+        self.pool.run(lambda: None)
+
+    def test_a_full_pool_answers_429_with_retry_after(self):
+        gate = threading.Event()
+        self.addCleanup(gate.set)
+        self.pool.run_in_background(gate.wait)   # running
+        self.pool.run_in_background(gate.wait)   # queued
+
+        with self.assertRaises(Overloaded):
+            self.pool.run(make_password, 'x')
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        register = APIClient().post('/api/v1/auth/register/', {
+            'email': 'new@example.com', 'full_name': 'New', 'password': 'pw123456'})
+        self.assertEqual(register.status_code, 429)
+        self.assertIn('Retry-After', register)
+
+        gate.set()
+        deadline = time.monotonic() + 5
+        while (response := self.login()).status_code == 429 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(response.status_code, 200)
+
+    def test_outdated_hashes_are_upgraded_in_the_background(self):
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.wait_for_pool()
+        self.user.refresh_from_db()
+        self.assertEqual(identify_hasher(self.user.password).algorithm, 'pbkdf2_sha1')
+
+        self.assertEqual(self.login().status_code, 200)
+        self.wait_for_pool()
+        self.user.refresh_from_db()
+        self.assertEqual(identify_hasher(self.user.password).algorithm, 'bcrypt_sha256')
+        self.assertTrue(check_password('s3cret!', self.user.password))
+        self.assertEqual(self.login().status_code, 200)
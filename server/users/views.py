@@ -2,15 +2,26 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import UserSerializer, RegisterSerializer
+from .hashing import Overloaded, authenticate_credentials
+from .filters import filter_users, only_columns, search_branches, search_term, search_users, sparse_fields
+from .pagination import UserPagination
 
 # Import custom permission
 from notification.permissions import IsAdminRole 
 
 User = get_user_model()
 
+
+def _overloaded(e):
+    return Response(
+        {"message": "Too many sign-in attempts right now, please retry shortly"},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
 # ================== AUTH VIEWSET (Register, Login, Profile) ===================
 class AuthViewSet(viewsets.ViewSet):
     """
@@ -38,6 +49,8 @@ class AuthViewSet(viewsets.ViewSet):
                     "token": str(refresh.access_token),
                     "user": UserSerializer(user).data
                 }, status=status.HTTP_201_CREATED)
+            except Overloaded as e:
+                return _overloaded(e)
             except Exception as e:
                 return Response({"message": "Internal Server Error", "error": str(e)}, status=500)
         
@@ -55,7 +68,11 @@ class AuthViewSet(viewsets.ViewSet):
 
         # Authenticate (Checks DB hash vs Input password)
         # Note: Works with BCrypt hashes imported from Express
-        user = authenticate(username=email, password=password)
+        # Hashing runs on the bounded pool; outdated hashes are upgraded in the background
+        try:
+            user = authenticate_credentials(email, password)
+        except Overloaded as e:
+            return _overloaded(e)
 
         if not user:
             return Response({"message": "Invalid credentials"}, status=401)
@@ -74,7 +91,8 @@ class AuthViewSet(viewsets.ViewSet):
     # --- UPDATE PROFILE ---
     @action(detail=False, methods=['put'], permission_classes=[IsAuthenticated])
     def update_profile(self, request):
-        user = request.user # Django gets this from the Token
+        # request.user is the token principal; edit a fresh row, not a cached one
+        user = User.objects.get(pk=request.user.pk)
         data = request.data
 
         try:
@@ -110,11 +128,43 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all().order_by('-created_at')
     serializer_class = UserSerializer
     permission_classes = [IsAdminRole] # Uses your custom permission
+    # Opt-in keyset pages (?limit=&cursor=); plain GET is capped at the newest 200
+    pagination_class = UserPagination
+
+    # --- LIST: ?search= ?role= ?blood_group= ?fields= (see users.filters) ---
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'list':
+            return queryset
+        params = self.request.query_params
+        queryset = only_columns(filter_users(queryset, params), self.sparse_fields())
+        term = search_term(params)
+        return search_users(queryset, term) if term else queryset
+
+    def get_keyset_branches(self):
+        # Paginated typeahead: each search column is seeked on its own index
+        queryset = only_columns(
+            filter_users(self.get_queryset(), self.request.query_params), self.sparse_fields()
+        )
+        term = search_term(self.request.query_params)
+        return search_branches(queryset, term) if term else [queryset]
+
+    def sparse_fields(self):
+        return sparse_fields(self.request.query_params, self.serializer_class)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            context['fields'] = self.sparse_fields()
+        return context
 
     # create() method overrides standard behavior to handle password hashing
     def create(self, request, *args, **kwargs):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
+            try:
+                user = serializer.save()
+            except Overloaded as e:
+                return _overloaded(e)
             return Response(UserSerializer(user).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file